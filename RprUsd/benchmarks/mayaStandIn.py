@@ -0,0 +1,303 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Recording stand-in for maya.cmds, maya.mel, maya.utils and ufe.
+
+It lets the browsers run headless for benchmarking. Every command is counted
+and timed, and widgets are kept in a tree so that parents, deleteUI and the
+exists/query flags behave the way the browsers rely on. Queries return what
+was set on the widget or a default from QUERY_DEFAULTS. Nothing is drawn, so
+timings cover the Python side of the UI code and the command count stands in
+for the cost inside Maya.
+
+    recorder = mayaStandIn.install()
+    import rprMaterialXBrowser
+"""
+
+import os
+import sys
+import time
+import types
+from collections import defaultdict
+
+# Values returned for query flags that were never set on a widget.
+QUERY_DEFAULTS = {
+    'width': 600,
+    'height': 700,
+    'select': 1,
+    'value': 2,
+    'text': '',
+    'rsv': 1.0,
+    'scrollAreaValue': [0, 0, 0, 0],
+    'itemListLong': None,
+    'numberOfChildren': None,
+    'childArray': None,
+}
+
+# Flags that only select the query or edit mode.
+MODE_FLAGS = ('q', 'query', 'e', 'edit')
+
+
+class Widget:
+
+    __slots__ = ('name', 'command', 'parent', 'children', 'flags')
+
+    def __init__(self, name, command, parent):
+        self.name = name
+        self.command = command
+        self.parent = parent
+        self.children = []
+        self.flags = dict()
+
+
+class Recorder:
+    """ Widget tree and per-command call counts and times. """
+
+    def __init__(self):
+        self.widgets = dict()
+        self.optionVars = dict()
+        self.current = None
+        self.deferred = []
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.created = 0
+        self.batch = False
+        self._counter = 0
+
+    # Statistics.
+    # -----------------------------------------------------------------------------
+    def reset_stats(self):
+        self.calls.clear()
+        self.seconds.clear()
+        self.created = 0
+
+    def get_stats(self):
+        return {
+            'calls': sum(self.calls.values()),
+            'created': self.created,
+            'live': len(self.widgets),
+            'byCommand': dict(self.calls),
+        }
+
+    # Deferred calls.
+    # -----------------------------------------------------------------------------
+    def execute_deferred(self, callback, *args):
+        self.calls['executeDeferred'] += 1
+        self.deferred.append((callback, args))
+
+    def run_deferred(self, timeout: float = 10.0):
+        """ Run deferred calls, including those they defer, like Maya does on idle. """
+        deadline = time.monotonic() + timeout
+        while self.deferred and time.monotonic() < deadline:
+            pending, self.deferred = self.deferred, []
+            for callback, args in pending:
+                callback(*args)
+
+    # Commands.
+    # -----------------------------------------------------------------------------
+    def call(self, command, args, flags):
+        start = time.perf_counter()
+        try:
+            handler = getattr(self, '_cmd_' + command, None)
+            if handler is not None:
+                return handler(args, flags)
+            return self._widget_command(command, args, flags)
+        finally:
+            self.calls[command] += 1
+            self.seconds[command] += time.perf_counter() - start
+
+    def set_value(self, name, flag, value):
+        """ Set what a later query of `flag` on a widget returns, i.e. text typed into a field. """
+        self.widgets[self._short(name)].flags[flag] = value
+
+    def _widget_command(self, command, args, flags):
+        name = args[0] if args else None
+        query = flags.get('q') or flags.get('query')
+        edit = flags.get('e') or flags.get('edit')
+        exists = flags.pop('exists', flags.pop('ex', False))
+
+        if exists:
+            return name is not None and self._short(name) in self.widgets
+
+        if query:
+            widget = self.widgets.get(self._short(name))
+            if widget is None:
+                raise RuntimeError("Object '{}' not found.".format(name))
+            return self._query(widget, flags)
+
+        if edit:
+            widget = self.widgets.get(self._short(name))
+            if widget is None:
+                raise RuntimeError("Object '{}' not found.".format(name))
+            widget.flags.update((k, v) for k, v in flags.items() if k not in MODE_FLAGS)
+            return None
+
+        return self._create(command, name, flags)
+
+    def _create(self, command, name, flags):
+        if name is None:
+            self._counter += 1
+            name = command + str(self._counter)
+        if name in self.widgets:
+            self._delete(self.widgets[name])
+
+        parent = self.widgets.get(flags.get('p') or flags.get('parent')) or self.current
+        if command == 'window':
+            parent = None
+
+        widget = Widget(name, command, parent)
+        widget.flags.update(flags)
+        self.widgets[name] = widget
+        self.created += 1
+        if parent is not None:
+            parent.children.append(widget)
+
+        if command == 'window' or command.endswith('Layout'):
+            self.current = widget
+        return name
+
+    def _query(self, widget, flags):
+        for flag in flags:
+            if flag in MODE_FLAGS:
+                continue
+            if flag in ('itemListLong', 'childArray'):
+                return [child.name for child in widget.children] or None
+            if flag == 'numberOfChildren':
+                return len(widget.children)
+            if flag in widget.flags:
+                return widget.flags[flag]
+            return QUERY_DEFAULTS.get(flag)
+        return None
+
+    def _delete(self, widget):
+        stack = [widget]
+        while stack:
+            item = stack.pop()
+            self.widgets.pop(item.name, None)
+            stack.extend(item.children)
+        if widget.parent is not None and widget in widget.parent.children:
+            widget.parent.children.remove(widget)
+
+        current = self.current
+        while current is not None and current.name not in self.widgets:
+            current = current.parent
+        self.current = current
+
+    @staticmethod
+    def _short(name):
+        return name.rsplit('|', 1)[-1] if isinstance(name, str) else name
+
+    def _cmd_setParent(self, args, flags):
+        target = args[0] if args else None
+        if target == '..':
+            if self.current is not None:
+                self.current = self.current.parent
+        elif target is not None:
+            self.current = self.widgets.get(self._short(target), self.current)
+        return self.current.name if self.current is not None else None
+
+    def _cmd_deleteUI(self, args, flags):
+        names = []
+        for arg in args:
+            names.extend(arg if isinstance(arg, (list, tuple)) else [arg])
+        for name in names:
+            widget = self.widgets.get(self._short(name))
+            if widget is not None:
+                self._delete(widget)
+
+    def _cmd_optionVar(self, args, flags):
+        if 'exists' in flags:
+            return flags['exists'] in self.optionVars
+        if 'query' in flags or 'q' in flags:
+            return self.optionVars.get(flags.get('query', flags.get('q')))
+        for flag in ('intValue', 'iv', 'stringValue', 'sv', 'floatValue', 'fv'):
+            if flag in flags:
+                key, value = flags[flag]
+                self.optionVars[key] = value
+        for flag in ('stringValueAppend', 'sva'):
+            if flag in flags:
+                key, value = flags[flag]
+                self.optionVars.setdefault(key, []).append(value)
+        for flag in ('clearArray', 'ca'):
+            if flag in flags:
+                self.optionVars[flags[flag]] = []
+        if 'remove' in flags:
+            self.optionVars.pop(flags['remove'], None)
+        return None
+
+    def _cmd_about(self, args, flags):
+        if flags.get('batch') or flags.get('b'):
+            return self.batch
+        return False
+
+    def _cmd_mayaDpiSetting(self, args, flags):
+        return QUERY_DEFAULTS['rsv']
+
+    def _cmd_scriptJob(self, args, flags):
+        if flags.get('exists') is not None:
+            return False
+        self._counter += 1
+        return self._counter
+
+    def _cmd_workspace(self, args, flags):
+        # The project root, where project settings files are looked up.
+        if flags.get('rootDirectory') or flags.get('rd'):
+            return os.getcwd()
+        return None
+
+    def _cmd_progressWindow(self, args, flags):
+        return None
+
+    def _cmd_showWindow(self, args, flags):
+        return None
+
+
+class _CommandModule(types.ModuleType):
+    """ Module turning any attribute into a recorded command. """
+
+    def __init__(self, name, recorder, prefix=''):
+        super().__init__(name)
+        self._recorder = recorder
+        self._prefix = prefix
+
+    def __getattr__(self, command):
+        if command.startswith('__'):
+            raise AttributeError(command)
+        recorder = self._recorder
+        name = self._prefix + command
+
+        def run(*args, **flags):
+            return recorder.call(name, args, flags)
+
+        run.__name__ = command
+        setattr(self, command, run)
+        return run
+
+
+def install():
+    """ Register the stand-in modules in sys.modules and return the recorder. """
+    recorder = Recorder()
+
+    maya = types.ModuleType('maya')
+    cmds = _CommandModule('maya.cmds', recorder)
+    mel = _CommandModule('maya.mel', recorder, 'mel.')
+    utils = types.ModuleType('maya.utils')
+    utils.executeDeferred = recorder.execute_deferred
+    maya.cmds, maya.mel, maya.utils = cmds, mel, utils
+
+    ufe = types.ModuleType('ufe')
+    selection = types.SimpleNamespace(get=lambda: [])
+    ufe.GlobalSelection = selection
+
+    sys.modules.update({'maya': maya, 'maya.cmds': cmds, 'maya.mel': mel, 'maya.utils': utils, 'ufe': ufe})
+    return recorder
@@ -0,0 +1,224 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Import-time and plugin-load benchmark for the RprUsd Python layer.
+
+Every module is imported in a fresh interpreter with -X importtime, so the
+numbers include everything the module drags in at import. Menu registration
+is run against mayaStandIn in batch and interactive mode, and the run fails if
+it imports anything from PLUGIN_LOAD_FORBIDDEN. Run it with mayapy to measure
+the modules which depend on Maya:
+
+    mayapy startupBenchmark.py
+    mayapy startupBenchmark.py --plugin --json startup.json
+    python startupBenchmark.py --baseline startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+BENCHMARKS_DIR = os.path.abspath(os.path.dirname(__file__))
+
+MODULES = [
+    "menu",
+    "webServerUrlHelper",
+    "client",
+    "rprMaterialXBrowser",
+    "rprLightBrowser",
+    "deviceConfigRunner",
+]
+
+# Modules plugin load must leave alone: the catalog and browser stack, and what it pulls in.
+# Interactive sessions import them on the first idle, batch sessions never.
+PLUGIN_LOAD_FORBIDDEN = [
+    "catalogService",
+    "client",
+    "jsonStream",
+    "sharedCache",
+    "concurrent.futures",
+    "urllib.request",
+    "hashlib",
+    "unicodedata",
+    "locale",
+]
+
+
+def run_python(code: str, extra_args=None):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SCRIPTS_DIR, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    args = [sys.executable] + (extra_args or []) + ["-c", code]
+    return subprocess.run(args, env=env, capture_output=True, text=True)
+
+
+def parse_importtime(stderr: str):
+    """ Parse -X importtime output into {module: (self_us, cumulative_us)}. """
+    result = dict()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfTime, cumulative, name = line[len("import time:"):].split("|")
+        result[name.strip()] = (int(selfTime), int(cumulative))
+    return result
+
+
+def measure_module(module: str, repeat: int):
+    """ Return the best cumulative import time of a module and the modules it pulled in. """
+    best = None
+    imported = dict()
+    for _ in range(repeat):
+        completed = run_python("import " + module, ["-X", "importtime"])
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()
+            return {"error": error[-1] if error else "failed"}
+
+        times = parse_importtime(completed.stderr)
+        if module not in times:
+            return {"error": "module not reported"}
+
+        cumulative = times[module][1]
+        if best is None or cumulative < best:
+            best = cumulative
+            imported = times
+
+    heaviest = sorted(((v[1], k) for k, v in imported.items() if k != module), reverse=True)[:5]
+    return {
+        "cumulative_ms": best / 1000.0,
+        "module_count": len(imported),
+        "heaviest": [(name, us / 1000.0) for us, name in heaviest],
+    }
+
+
+def check_menu_registration(batch: bool):
+    """ Modules menu.createRprUsdMenu imports, run against mayaStandIn without running deferred calls. """
+    code = (
+        "import sys\n"
+        "sys.path.insert(0, {!r})\n"
+        "import mayaStandIn\n"
+        "recorder = mayaStandIn.install()\n"
+        "recorder.batch = {!r}\n"
+        "before = set(sys.modules)\n"
+        "import menu\n"
+        "menu.createRprUsdMenu()\n"
+        "print('IMPORTED', ' '.join(sorted(set(sys.modules) - before - {{'menu'}})))\n"
+        "print('DEFERRED', len(recorder.deferred))\n"
+    ).format(BENCHMARKS_DIR, batch)
+
+    completed = run_python(code)
+    output = dict(line.partition(" ")[::2] for line in completed.stdout.splitlines())
+    if "DEFERRED" not in output:
+        error = completed.stderr.strip().splitlines()
+        return {"error": error[-1] if error else "failed"}
+
+    imported = output["IMPORTED"].split()
+    result = {"module_count": len(imported), "imported": imported, "deferred": int(output["DEFERRED"])}
+    forbidden = [name for name in PLUGIN_LOAD_FORBIDDEN if name in imported]
+    if forbidden:
+        result["error"] = "imports " + ", ".join(forbidden)
+    elif batch and result["deferred"]:
+        result["error"] = "defers work in batch mode"
+    return result
+
+
+def measure_plugin_load(plugin: str, repeat: int):
+    """ Time loadPlugin in maya.standalone. Only available under mayapy. """
+    code = (
+        "import time, maya.standalone\n"
+        "maya.standalone.initialize()\n"
+        "import maya.cmds as cmds\n"
+        "start = time.perf_counter()\n"
+        "cmds.loadPlugin('{}')\n"
+        "print('PLUGIN_LOAD_MS', (time.perf_counter() - start) * 1000.0)\n"
+        "maya.standalone.uninitialize()\n"
+    ).format(plugin)
+
+    best = None
+    for _ in range(repeat):
+        completed = run_python(code)
+        for line in completed.stdout.splitlines():
+            if line.startswith("PLUGIN_LOAD_MS"):
+                value = float(line.split()[1])
+                best = value if best is None else min(best, value)
+        if best is None:
+            error = completed.stderr.strip().splitlines()
+            return {"error": error[-1] if error else "failed"}
+    return {"cumulative_ms": best}
+
+
+def print_report(results: dict, baseline: dict):
+    print("{:<24} {:>12} {:>10} {:>9}".format("module", "import [ms]", "delta", "modules"))
+    for name, result in results.items():
+        if "error" in result:
+            print("{:<24} {}".format(name, "unavailable: " + result["error"]))
+            continue
+
+        delta = ""
+        previous = baseline.get(name, {})
+        if "cumulative_ms" in previous:
+            delta = "{:+.1f}".format(result["cumulative_ms"] - previous["cumulative_ms"])
+
+        print("{:<24} {:>12.1f} {:>10} {:>9}".format(
+            name, result["cumulative_ms"], delta, result.get("module_count", "")))
+        for heavy, ms in result.get("heaviest", []):
+            print("    {:<40} {:>8.1f}".format(heavy, ms))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import and plugin load cost of the RprUsd Python layer")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module, the best one is reported")
+    parser.add_argument("--plugin", action="store_true", help="also time loadPlugin (requires mayapy)")
+    parser.add_argument("--plugin-name", default="RprUsd")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against results previously written with --json")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args(argv)
+
+    results = dict()
+    start = time.perf_counter()
+    for module in args.modules:
+        results[module] = measure_module(module, args.repeat)
+
+    if args.plugin:
+        results["loadPlugin(" + args.plugin_name + ")"] = measure_plugin_load(args.plugin_name, args.repeat)
+
+    registration = {"createRprUsdMenu (" + mode + ")": check_menu_registration(mode == "batch")
+                    for mode in ("batch", "interactive")}
+
+    baseline = dict()
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+    print_report(results, baseline)
+    failed = False
+    for name, result in registration.items():
+        if "error" in result:
+            failed = True
+            print("{:<24} FAILED: {}".format(name, result["error"]))
+        else:
+            print("{:<24} ok, {} modules imported".format(name, result["module_count"]))
+    print("total benchmark time: {:.1f}s".format(time.perf_counter() - start))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,242 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Headless benchmark of the material and light browser UI code.
+
+The browsers run against mayaStandIn and a synthetic catalog served from
+memory, so no Maya or network is needed. Each operation reports the best wall
+time, the Maya commands it issued, the widgets it created and the memory it
+allocated:
+
+    python uiBenchmark.py
+    python uiBenchmark.py --sizes 100 1000 50000 --json ui.json
+    python uiBenchmark.py --baseline ui.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import mayaStandIn
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+
+SIZES = [100, 1000, 10000, 50000]
+MATERIALS_PER_CATEGORY = 250
+WORDS = ["Oak", "Marble", "Brushed", "Steel", "Velvet", "Rusty", "Ceramic", "Tile", "Leather", "Glass",
+         "Concrete", "Walnut", "Copper", "Fabric", "Émail", "Granite", "Painted", "Plaster", "Brick", "Gold"]
+LICENSES = ["CC0", "CC BY 4.0", "MIT"]
+TYPES = ["Static", "Procedural"]
+PNG_BYTES = b"\x89PNG\r\n\x1a\n"
+
+
+def make_catalog(count: int, seed: int = 1):
+    """ Synthetic categories, tags and materials shaped like the Matlib listings. """
+    rng = random.Random(seed)
+    categoryCount = max(1, count // MATERIALS_PER_CATEGORY)
+    categories = [{"id": "cat%d" % i, "title": "Category %d" % i} for i in range(categoryCount)]
+    tags = [{"id": "tag%d" % i, "title": word.lower()} for i, word in enumerate(WORDS)]
+
+    materials = []
+    for i in range(count):
+        title = " ".join(rng.sample(WORDS, 2)) + " " + str(i)
+        materials.append({
+            "id": "mat%d" % i,
+            "title": title,
+            "category": categories[i % categoryCount]["id"],
+            "tags": ["tag%d" % rng.randrange(len(WORDS))],
+            "renders_order": ["render%d" % i],
+            "material_type": rng.choice(TYPES),
+            "license": rng.choice(LICENSES),
+            "mtlx_material_name": "Mat_%d" % i,
+        })
+    return categories, tags, materials
+
+
+class SyntheticClient:
+    """ In-memory replacement of MatlibClient for the calls the browsers make. """
+
+    host = "https://benchmark.invalid"
+
+    def __init__(self):
+        from client import ThroughputMeter
+
+        self.packages = self
+        self.renders = self
+        # In-memory meter, the package dropdown estimates download times from it.
+        self.session = types.SimpleNamespace(throughput=ThroughputMeter())
+
+    def get_list(self, limit=None, offset=None, params=None):
+        materialId = (params or {}).get("material", "")
+        return [{"id": materialId + "_" + label, "label": label, "size": size, "file": materialId + ".zip"}
+                for label, size in (("1k", "2.1 MB"), ("2k", "8.4 MB"))]
+
+    def download(self, render_id, callback, target_dir, filename):
+        with open(os.path.join(target_dir, filename), "wb") as file:
+            file.write(PNG_BYTES)
+
+    download_thumbnail = download
+
+
+def measure(operation, recorder, repeat: int):
+    """ Best wall time of `repeat` runs, then one traced run for commands, widgets and allocations. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        recorder.run_deferred()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    recorder.reset_stats()
+    tracemalloc.start()
+    operation()
+    recorder.run_deferred()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = recorder.get_stats()
+    return {
+        "ms": best * 1000.0,
+        "calls": stats["calls"],
+        "created": stats["created"],
+        "live": stats["live"],
+        "alloc_kb": peak / 1024.0,
+        "top": sorted(stats["byCommand"].items(), key=lambda item: -item[1])[:3],
+    }
+
+
+def benchmark_material_browser(count: int, repeat: int, cache_dir: str, recorder):
+    import catalogService
+    import rprMaterialXBrowser
+
+    categories, tags, materials = make_catalog(count)
+    for material in materials:
+        with open(os.path.join(cache_dir, material["renders_order"][0] + ".png"), "wb") as file:
+            file.write(PNG_BYTES)
+
+    service = catalogService.CatalogService(SyntheticClient, cache_dir)
+    service.set_catalog(catalogService.MatlibCatalog(categories, tags, materials))
+    catalogService.g_CatalogService = service
+
+    browser = rprMaterialXBrowser.RPRMaterialBrowser()
+    results = dict()
+
+    results["show"] = measure(browser.show, recorder, repeat)
+    largest = max(range(len(categories)), key=lambda i: len(browser.materialByCategory[categories[i]["id"]]))
+    results["selectCategory"] = measure(lambda: browser.selectCategory(largest), recorder, repeat)
+
+    def search():
+        recorder.set_value(browser.searchField, "text", "oak")
+        browser.searchMaterials()
+    results["searchMaterials"] = measure(search, recorder, repeat)
+
+    for mode, (label, key, reverse) in enumerate(rprMaterialXBrowser.SORT_MODES, 1):
+        if key == "size":
+            continue
+        def sort(mode=mode):
+            recorder.set_value(browser.sortDropdown, "select", mode)
+            browser.onSortModeChanged(None)
+        results["sort: " + label] = measure(sort, recorder, repeat)
+    recorder.set_value(browser.sortDropdown, "select", 1)
+
+    results["updateMaterialsLayout"] = measure(browser.updateMaterialsLayout, recorder, repeat)
+
+    iconSizes = [1, 4]
+    def resize():
+        # Alternate the slider between the smallest and the largest icons, each run rebuilds the grid.
+        iconSizes.reverse()
+        recorder.set_value(browser.iconSizeSlider, "value", iconSizes[0])
+        browser.uiScheduler.request("rebuild")
+    results["iconSize rebuild"] = measure(resize, recorder, repeat)
+
+    titles = [material["title"] for material in browser.materials]
+    results["getTruncatedText"] = measure(lambda: [browser.getTruncatedText(t, 90) for t in titles], recorder, repeat)
+    return results
+
+
+def benchmark_light_browser(count: int, repeat: int, cache_dir: str, recorder):
+    import catalogService
+    import rprLightBrowser
+
+    lights = [{"id": "light%d" % i, "name": "Light %d" % i} for i in range(count)]
+    service = catalogService.g_CatalogService
+    for light in lights:
+        with open(os.path.join(service.cache_dir, light["id"] + ".png"), "wb") as file:
+            file.write(PNG_BYTES)
+
+    browser = rprLightBrowser.RPRLightBrowser()
+    service.set_listing("https://renderstudio.luxoft.com/storage/api/lights/?limit=50&type=environment", lights)
+    return {"show": measure(browser.show, recorder, repeat)}
+
+
+def print_report(results: dict, baseline: dict):
+    print("{:<44} {:>10} {:>8} {:>8} {:>9} {:>11}".format("operation", "time [ms]", "delta", "cmds", "widgets", "alloc [KB]"))
+    for name, result in results.items():
+        delta = ""
+        previous = baseline.get(name, {})
+        if "ms" in previous:
+            delta = "{:+.1f}".format(result["ms"] - previous["ms"])
+        print("{:<44} {:>10.2f} {:>8} {:>8} {:>9} {:>11.1f}".format(
+            name, result["ms"], delta, result["calls"], result["created"], result["alloc_kb"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the material and light browser UI code without Maya")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="synthetic catalog sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per operation, the best one is reported")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against results previously written with --json")
+    args = parser.parse_args(argv)
+
+    recorder = mayaStandIn.install()
+    sys.path.insert(0, SCRIPTS_DIR)
+
+    workDir = tempfile.mkdtemp(prefix="RprUsdUiBenchmark")
+    os.environ["USERPROFILE"] = workDir
+
+    results = dict()
+    start = time.perf_counter()
+    try:
+        for size in args.sizes:
+            cacheDir = os.path.join(workDir, "cache%d" % size)
+            os.makedirs(cacheDir)
+            for name, result in benchmark_material_browser(size, args.repeat, cacheDir, recorder).items():
+                results["materials {:>6}: {}".format(size, name)] = result
+            for name, result in benchmark_light_browser(min(size, 1000), args.repeat, cacheDir, recorder).items():
+                results["lights {:>6}: {}".format(min(size, 1000), name)] = result
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    baseline = dict()
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+    print_report(results, baseline)
+    print("total benchmark time: {:.1f}s".format(time.perf_counter() - start))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Ordered cache tiers for the catalog snapshot and thumbnails.
+
+A lookup tries the per-user cache first, then the shared studio directories
+in order, then the network. A file found in a shared tier is copied into the
+tiers above it, a file fetched from the network is also published to the
+writable shared tiers, so new users and freshly imaged farm nodes start warm
+instead of downloading everything from the library. Tiers are configured with
+environment variables, i.e. in Maya.env:
+
+    RPRUSD_MATLIB_CACHE=D:/MatlibCache                              per-user tier
+    RPRUSD_MATLIB_CACHE_TIERS=rw=//studio/matlib;ro=//archive/matlib  shared tiers, os.pathsep separated
+
+Shared tiers are read-only unless prefixed with "rw=". Files keep their
+modification time when copied between tiers, so a catalog snapshot ages the
+same everywhere.
+"""
+
+import os
+import shutil
+import threading
+from typing import Callable, Dict, List
+
+import sharedCache
+
+TIER_LOCAL = "local"
+TIER_NETWORK = "network"
+
+g_TieredCache = None
+
+
+def getUserDirectory():
+    """ Per-user RprUsd directory for settings, queues and caches. """
+    home = os.environ.get("USERPROFILE") or os.path.expanduser("~")
+    return home + "/Documents/Maya/RprUsd"
+
+
+class CacheTier:
+
+    def __init__(self, name: str, path: str, writable: bool):
+        self.name = name
+        self.path = path
+        self.writable = writable
+
+    def get_path(self, name: str):
+        return os.path.join(self.path, name)
+
+
+class TieredCache:
+    """ Files looked up through the tiers, always handed out from the first (local) one. """
+
+    def __init__(self, tiers: List[CacheTier]):
+        """
+        :param tiers: tiers in lookup order, the first one must be writable
+        """
+        if not tiers or not tiers[0].writable:
+            raise ValueError("the first cache tier must be writable")
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self._lookups = {tier.name: 0 for tier in tiers}
+        self._hits = {tier.name: 0 for tier in tiers}
+        self._lookups[TIER_NETWORK] = self._hits[TIER_NETWORK] = 0
+
+    @property
+    def path(self):
+        """ Directory of the local tier. """
+        return self.tiers[0].path
+
+    def get(self, name: str, fetch: Callable, max_age: float = None, wait: bool = True):
+        """ Make sure the file `name` is in the local tier.
+
+        :param name: file name, relative to the tier directories
+        :param fetch: callable downloading the file to the path it is given, see sharedCache.single_flight
+        :param max_age: seconds after which a file is stale in every tier, None keeps files forever
+        :param wait: see sharedCache.single_flight
+        :return: path in the local tier, or None if wait is False and another process is fetching it
+        """
+        for index, tier in enumerate(self.tiers):
+            self._count(tier.name, False)
+            source = tier.get_path(name)
+            if not sharedCache.is_fresh(source, max_age):
+                continue
+
+            self._count(tier.name, True)
+            if index == 0:
+                return source
+            return self._promote(name, source, self.tiers[:index], max_age, wait)
+
+        self._count(TIER_NETWORK, False)
+        localPath = self.tiers[0].get_path(name)
+        os.makedirs(self.path, exist_ok=True)
+        path = sharedCache.single_flight(localPath, fetch, max_age, wait)
+        if path is not None:
+            self._count(TIER_NETWORK, True)
+            self._publish(localPath, name, [tier for tier in self.tiers[1:] if tier.writable])
+        return path
+
+    def get_stats(self) -> List[Dict]:
+        """ Lookups reaching each tier and the share of them it answered, in lookup order. """
+        with self._lock:
+            stats = []
+            for tier in self.tiers + [CacheTier(TIER_NETWORK, None, False)]:
+                lookups, hits = self._lookups[tier.name], self._hits[tier.name]
+                stats.append({'tier': tier.name, 'path': tier.path, 'lookups': lookups, 'hits': hits,
+                              'hit_rate': hits / lookups if lookups else 0.0})
+            return stats
+
+    def _promote(self, name: str, source: str, tiers: List[CacheTier], max_age: float, wait: bool):
+        # Copy into every writable tier above the one that had it, the local tier last so it is returned.
+        self._publish(source, name, [tier for tier in tiers[1:] if tier.writable])
+        os.makedirs(self.path, exist_ok=True)
+        return sharedCache.single_flight(tiers[0].get_path(name), lambda partPath: shutil.copy2(source, partPath),
+                                         max_age, wait)
+
+    @staticmethod
+    def _publish(source: str, name: str, tiers: List[CacheTier]):
+        for tier in tiers:
+            # A shared directory going away must not break the lookup, the file is in the local tier anyway.
+            try:
+                os.makedirs(tier.path, exist_ok=True)
+                sharedCache.single_flight(tier.get_path(name), lambda partPath: shutil.copy2(source, partPath),
+                                          0, wait=False)
+            except OSError as e:
+                print("ML Log: WARNING: couldn't write " + name + " to the " + tier.name + " cache tier: " + str(e))
+
+    def _count(self, tier: str, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits[tier] += 1
+            else:
+                self._lookups[tier] += 1
+
+
+def parse_tiers(value: str) -> List[CacheTier]:
+    """ Shared tiers from an os.pathsep separated list of directories, each optionally prefixed "ro=" or "rw=". """
+    tiers = []
+    for entry in (value or '').split(os.pathsep):
+        entry = entry.strip()
+        if not entry:
+            continue
+        writable = False
+        mode, separator, path = entry.partition('=')
+        if separator and mode.lower() in ('ro', 'rw'):
+            entry, writable = path, mode.lower() == 'rw'
+        tiers.append(CacheTier("shared {}".format(len(tiers) + 1), entry, writable))
+    return tiers
+
+
+def format_stats(stats: List[Dict]):
+    lines = ["{:<10} {:>8} {:>8} {:>9}  {}".format("tier", "lookups", "hits", "hit rate", "path")]
+    for item in stats:
+        lines.append("{:<10} {:>8} {:>8} {:>8.1f}%  {}".format(
+            item['tier'], item['lookups'], item['hits'], 100.0 * item['hit_rate'], item['path'] or ''))
+    return "\n".join(lines)
+
+
+def getTieredCache():
+    """ Tiers of the Web Material Library cache configured by RPRUSD_MATLIB_CACHE and RPRUSD_MATLIB_CACHE_TIERS. """
+    global g_TieredCache
+
+    if g_TieredCache is None:
+        localDirectory = os.environ.get("RPRUSD_MATLIB_CACHE") or getUserDirectory() + "/WebMatlibCache"
+        os.makedirs(localDirectory, exist_ok=True)
+        tiers = [CacheTier(TIER_LOCAL, localDirectory, True)]
+        tiers += parse_tiers(os.environ.get("RPRUSD_MATLIB_CACHE_TIERS"))
+        g_TieredCache = TieredCache(tiers)
+    return g_TieredCache
+
+
+def printReport():
+    """ Print the hit rates of the cache tiers, i.e. from the Script Editor. """
+    print(format_stats(getTieredCache().get_stats()))
@@ -0,0 +1,422 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Web Material Library catalog shared by everything in the Maya session.
+
+The service owns one MatlibClient, the loaded catalog with its indexes and the
+package list, preview and thumbnail atlas caches. It lives as long as the Maya session, so
+closing and reopening a browser window costs nothing, and the bind command's
+name lookups reuse the same client and records. Loading starts on the first
+idle after the plugin is loaded, see warmUp. The catalog is kept as a
+snapshot in the cache directory shared by all Maya and mayapy processes, and
+looked up through the cache tiers (see cacheTiers) before it is downloaded.
+"""
+
+import hashlib
+import locale
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+import jsonStream
+import sharedCache
+
+CATALOG_LIMIT = 10000
+
+# Keys accepted by MatlibCatalog.get_sort_order.
+SORT_KEYS = ("title", "type", "license", "size")
+
+# Number of sorted result sets (categories, searches) kept per catalog.
+PERMUTATION_CACHE_SIZE = 64
+
+# Seconds a catalog snapshot written by any process is reused before it is downloaded again.
+CATALOG_SNAPSHOT_MAX_AGE = 6 * 3600
+
+g_CatalogService = None
+
+
+class MatlibCatalog:
+    """ Categories, tags and materials of the library with lookup indexes. Treat as read-only. """
+
+    def __init__(self, categories: List[Dict], tags: List[Dict], materials: List[Dict]):
+        self.categories = categories
+        self.categoryDict = {category["id"]: category for category in categories}
+
+        self.tags = tags
+        self.tagDict = {tag["id"]: tag["title"] for tag in tags}
+
+        self.materials = materials
+        self.materialDict = dict()
+        self.materialByCategory = dict()
+
+        for material in materials:
+            self.materialDict[material["id"]] = material
+            self.materialByCategory.setdefault(material["category"], []).append(material)
+
+        # Categories without materials still get an (empty) entry.
+        for category in categories:
+            self.materialByCategory.setdefault(category["id"], [])
+
+        self._lock = threading.Lock()
+        self._orders = dict()
+        self._permutations = OrderedDict()
+        self._packageSizes = dict()
+
+    def set_package_size(self, material_id: str, size):
+        """ Record the smallest package size of a material in bytes, None if it has no packages. """
+        with self._lock:
+            self._packageSizes[material_id] = float('inf') if size is None else size
+
+    def has_package_size(self, material_id: str):
+        with self._lock:
+            return material_id in self._packageSizes
+
+    def get_sort_order(self, key: str) -> List[Dict]:
+        """ All materials ordered by a sort key, computed once per key.
+
+        :param key: one of SORT_KEYS; "size" orders by the recorded package sizes
+            and is recomputed as more sizes become known, the rest go last
+        """
+        with self._lock:
+            version = self._get_version(key)
+            cached = self._orders.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            sizes = dict(self._packageSizes)
+
+        useLocale = locale.getlocale(locale.LC_COLLATE)[0] not in (None, 'C', 'POSIX')
+        titleKeys = {m["id"]: collation_key(m.get("title") or '', useLocale) for m in self.materials}
+        if key == "title":
+            sortKey = lambda m: titleKeys[m["id"]]
+        elif key == "type":
+            sortKey = lambda m: (collation_key(m.get("material_type") or '', useLocale), titleKeys[m["id"]])
+        elif key == "license":
+            sortKey = lambda m: (collation_key(m.get("license") or '', useLocale), titleKeys[m["id"]])
+        elif key == "size":
+            unknown = float('inf')
+            sortKey = lambda m: (sizes.get(m["id"], unknown), titleKeys[m["id"]])
+        else:
+            raise ValueError("Unknown sort key: " + key)
+
+        order = sorted(self.materials, key=sortKey)
+        with self._lock:
+            self._orders[key] = (version, order)
+            # Permutations derived from an outdated order are dropped.
+            for permutationKey in [k for k in self._permutations if k[0] == key and k[2] != version]:
+                del self._permutations[permutationKey]
+        return order
+
+    def get_sorted(self, materials: List[Dict], key: str, scope=None, reverse: bool = False) -> Sequence:
+        """ A result set in sort order without comparing its materials again.
+
+        :param materials: result set, i.e. a category or search result
+        :param key: one of SORT_KEYS
+        :param scope: hashable name of the result set (i.e. ("category", id) or ("search", text))
+            under which its permutation is kept; None doesn't keep it
+        :param reverse: return a reversed view of the same permutation
+        """
+        with self._lock:
+            permutationKey = (key, scope, self._get_version(key))
+            permutation = self._permutations.get(permutationKey) if scope is not None else None
+            if permutation is not None:
+                self._permutations.move_to_end(permutationKey)
+
+        if permutation is None:
+            # One pass over the catalog-wide order picks the members of the set.
+            members = set(m["id"] for m in materials)
+            permutation = [m for m in self.get_sort_order(key) if m["id"] in members]
+            if scope is not None:
+                with self._lock:
+                    self._permutations[permutationKey] = permutation
+                    while len(self._permutations) > PERMUTATION_CACHE_SIZE:
+                        self._permutations.popitem(last=False)
+
+        return ReversedView(permutation) if reverse else permutation
+
+    def get_sort_caches(self):
+        """ Cached sort orders and result set permutations, for memory accounting. """
+        with self._lock:
+            return [order for version, order in self._orders.values()], list(self._permutations.values())
+
+    def _get_version(self, key: str):
+        return len(self._packageSizes) if key == "size" else 0
+
+
+class ReversedView(Sequence):
+    """ Read-only reversed view of a list. """
+
+    def __init__(self, items: List):
+        self._items = items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError(index)
+        return self._items[len(self._items) - 1 - index]
+
+    def __iter__(self):
+        return reversed(self._items)
+
+    def copy(self):
+        return list(self)
+
+
+def collation_key(text: str, use_locale: bool = False):
+    """ Case- and accent-insensitive sort key, collated by the current LC_COLLATE locale if use_locale is set. """
+    folded = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c)).casefold()
+    if use_locale:
+        return (locale.strxfrm(folded), text)
+    return (folded, text)
+
+
+class CatalogService:
+    """ Loads the catalog once per session in the background and hands it to every caller.
+
+    A failed or empty load is not kept, the next call to load() tries again.
+    """
+
+    def __init__(self, client_factory, cache_dir: str, tiers=None):
+        """
+        :param client_factory: callable returning a MatlibClient
+        :param cache_dir: directory of the thumbnail cache; full previews go to <cache_dir>/Previews
+        :param tiers: cacheTiers.TieredCache whose local tier is cache_dir, a cache with only that tier if None
+        """
+        self._client_factory = client_factory
+        self.cache_dir = cache_dir
+        if tiers is None:
+            from cacheTiers import CacheTier, TieredCache, TIER_LOCAL
+            tiers = TieredCache([CacheTier(TIER_LOCAL, cache_dir, True)])
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='RprUsdCatalog')
+        self._future = None
+        self._client = None
+        self._packageCache = None
+        self._previewCache = None
+        self._atlasStore = None
+        self._records = dict()
+        self._listings = dict()
+        self._refresh = False
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    @property
+    def packageCache(self):
+        client = self.client
+        with self._lock:
+            if self._packageCache is None:
+                from packageListCache import PackageListCache
+                self._packageCache = PackageListCache(client)
+            return self._packageCache
+
+    @property
+    def previewCache(self):
+        client = self.client
+        with self._lock:
+            if self._previewCache is None:
+                from previewCache import PreviewCache
+                self._previewCache = PreviewCache(client, os.path.join(self.cache_dir, "Previews"))
+            return self._previewCache
+
+    @property
+    def atlasStore(self):
+        with self._lock:
+            if self._atlasStore is None:
+                from thumbnailAtlas import AtlasStore
+                self._atlasStore = AtlasStore(self.cache_dir)
+            return self._atlasStore
+
+    def get_package_cache(self):
+        """ Package list cache or None if nothing used it yet, never creates it. """
+        with self._lock:
+            return self._packageCache
+
+    def get_atlas_store(self):
+        """ Atlas store or None if nothing used it yet, never creates it. """
+        with self._lock:
+            return self._atlasStore
+
+    def load_async(self):
+        """ Start loading the catalog unless it is loaded or loading, return the future. """
+        with self._lock:
+            if self._future is None or (self._future.done() and self._future.exception() is not None):
+                self._future = self._executor.submit(self._load)
+            return self._future
+
+    def load(self, timeout: float = None) -> MatlibCatalog:
+        """ Return the catalog, waiting for a load in progress. Raises if loading failed. """
+        return self.load_async().result(timeout)
+
+    def get_catalog(self):
+        """ Loaded catalog or None, never waits. """
+        with self._lock:
+            future = self._future
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def set_catalog(self, catalog: MatlibCatalog):
+        """ Use `catalog` instead of loading one, i.e. a catalog built by a benchmark or a test. """
+        future = Future()
+        future.set_result(catalog)
+        with self._lock:
+            self._future = future
+
+    def get_material(self, material_id: str):
+        """ Material record from the catalog, or from the server when the catalog isn't loaded yet.
+
+        Listing records may lack the detail fields, e.g. mtlx_material_name, those are fetched from the server.
+        """
+        catalog = self.get_catalog()
+        if catalog is not None:
+            record = catalog.materialDict.get(material_id)
+            if record is not None and "mtlx_material_name" in record:
+                return record
+
+        with self._lock:
+            record = self._records.get(material_id)
+        if record is None:
+            record = self.client.materials.get(material_id)
+            with self._lock:
+                self._records[material_id] = record
+        return record
+
+    def get_listing(self, url: str, key: str = 'results'):
+        """ Records of a listing outside the Matlib API (i.e. the light storage), fetched once per session. """
+        with self._lock:
+            if url in self._listings:
+                return self._listings[url]
+
+        import urllib.request
+        import client
+
+        request = urllib.request.Request(url, headers={'Accept-Encoding': client.get_accept_encoding()})
+        with client.MatlibResponse(urllib.request.urlopen(request)) as response:
+            records = list(jsonStream.iter_array_items(response, key))
+
+        with self._lock:
+            self._listings[url] = records
+        return records
+
+    def set_listing(self, url: str, records: List[Dict]):
+        """ Records get_listing returns for `url` instead of fetching them. """
+        with self._lock:
+            self._listings[url] = records
+
+    def reload(self):
+        """ Drop the catalog and start loading it again, bypassing the shared snapshot. """
+        with self._lock:
+            self._future = None
+            self._refresh = True
+            self._records.clear()
+            self._listings.clear()
+            if self._packageCache is not None:
+                self._packageCache.clear()
+        return self.load_async()
+
+    def get_snapshot_name(self):
+        # One snapshot per host, a mirror or staging server must not share it.
+        hostHash = hashlib.sha1(self.client.host.encode("utf-8")).hexdigest()[:8]
+        return "catalog_" + hostHash + ".json"
+
+    def get_snapshot_path(self):
+        return os.path.join(self.cache_dir, self.get_snapshot_name())
+
+    def _load(self):
+        snapshotPath = self.get_snapshot_path()
+        with self._lock:
+            maxAge = 0 if self._refresh else CATALOG_SNAPSHOT_MAX_AGE
+            self._refresh = False
+
+        # Only one Maya or mayapy process downloads the catalog, the others read its snapshot
+        # or take it from a shared studio tier.
+        try:
+            self.tiers.get(self.get_snapshot_name(), self._fetch_snapshot, maxAge)
+        except Exception as e:
+            if not os.path.isfile(snapshotPath):
+                raise
+            print("ML Log: WARNING: couldn't refresh the material library, using the cached catalog: " + str(e))
+
+        try:
+            data = sharedCache.read_snapshot(snapshotPath, ('categories', 'tags', 'materials'))
+        except (OSError, ValueError, KeyError) as e:
+            print("ML Log: WARNING: ignoring damaged catalog snapshot: " + str(e))
+            data = self._fetch_catalog()
+
+        if not data['categories']:
+            raise OSError("the library returned no categories")
+        return MatlibCatalog(data['categories'], data['tags'], data['materials'])
+
+    def _fetch_catalog(self):
+        client = self.client
+        categories = client.categories.get_list(CATALOG_LIMIT, 0)
+        if not categories:
+            raise OSError("the library returned no categories")
+
+        tags = client.tags.get_list(CATALOG_LIMIT, 0)
+        materials = list(client.materials.iter_list(CATALOG_LIMIT, 0))
+        return {'categories': categories, 'tags': tags, 'materials': materials}
+
+    def _fetch_snapshot(self, path: str):
+        sharedCache.write_snapshot(path, self._fetch_catalog(), {'host': self.client.host})
+
+
+def getCatalogService():
+    global g_CatalogService
+
+    if g_CatalogService is None:
+        import cacheTiers
+        import webServerUrlHelper
+
+        tiers = cacheTiers.getTieredCache()
+        g_CatalogService = CatalogService(webServerUrlHelper.createMatlibClient, tiers.path, tiers)
+    return g_CatalogService
+
+
+def warmUp():
+    """ Start loading the catalog in the background.
+
+    menu.createRprUsdMenu defers this to the first idle of interactive sessions,
+    so plugin load doesn't import this module and batch renders never do.
+    """
+    future = getCatalogService().load_async()
+    future.add_done_callback(_reportWarmUp)
+
+
+def _reportWarmUp(future):
+    if future.exception() is not None:
+        print("ML Log: WARNING: couldn't preload the material library: " + str(future.exception()))
+        return
+
+    import maya.utils
+    maya.utils.executeDeferred(_startThumbnailPrefetch)
+
+
+def _startThumbnailPrefetch():
+    import thumbnailPrefetcher
+    thumbnailPrefetcher.start(getCatalogService())
@@ -10,19 +10,311 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import urllib.request
+import functools
+import hashlib
 import json
 import os
+import threading
+import time
+import jsonStream
 from enum import Enum
 from typing import Dict
 from urllib.parse import (
-    urlencode, unquote, urlparse, parse_qsl, urlunparse, urljoin
+    urlencode, unquote, urlparse, parse_qsl, urlunparse, urljoin, quote
 )
 
 
-class MatlibSession:
-    def __init__(self, *args, **kwargs):
+@functools.lru_cache(maxsize=None)
+def _get_brotli():
+    """ brotli or brotlicffi module, None if neither is installed; looked up once. """
+    try:
+        import brotli
+        return brotli
+    except ImportError:
         pass
+    try:
+        import brotlicffi
+        return brotlicffi
+    except ImportError:
+        return None
+
+
+def get_accept_encoding():
+    """ Value of the Accept-Encoding header, brotli is offered only when a brotli module is installed. """
+    encodings = ['gzip', 'deflate']
+    if _get_brotli() is not None:
+        encodings.append('br')
+    return ', '.join(encodings)
+
+
+def _urlopen(url: str):
+    # urllib.request pulls in http.client, ssl and email, so it is only
+    # imported once a request is actually made.
+    import urllib.request
+    return urllib.request.urlopen(urllib.request.Request(url, headers={'Accept-Encoding': get_accept_encoding()}))
+
+
+class _Decompressor:
+    """ Streaming decoder for one Content-Encoding value. """
+
+    def __init__(self, encoding: str):
+        import zlib
+        self._zlib = zlib
+        self.encoding = encoding
+        if encoding in ('gzip', 'x-gzip'):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            # Servers disagree whether deflate means zlib-wrapped or raw, the first bytes tell.
+            self._obj = None
+        elif encoding == 'br':
+            brotli = _get_brotli()
+            if brotli is None:
+                raise OSError("Response is brotli-compressed but no brotli module is installed")
+            self._obj = brotli.Decompressor()
+        else:
+            raise OSError("Unsupported Content-Encoding: " + encoding)
+
+    def decompress(self, data: bytes):
+        if self._obj is None:
+            try:
+                self._obj = self._zlib.decompressobj()
+                return self._obj.decompress(data)
+            except self._zlib.error:
+                self._obj = self._zlib.decompressobj(-self._zlib.MAX_WBITS)
+        if self.encoding == 'br':
+            process = getattr(self._obj, 'process', None) or self._obj.decompress
+            return process(data)
+        return self._obj.decompress(data)
+
+    def flush(self):
+        if self.encoding == 'br' or self._obj is None:
+            return b''
+        return self._obj.flush()
+
+
+class MatlibResponse:
+    """ File-like wrapper of an HTTP response which decodes Content-Encoding while reading.
+
+    wire_bytes counts bytes as received from the server, decoded_bytes the bytes
+    returned to the reader; both are also added to the session totals.
+    from_mirror tells whether the studio mirror served the response.
+    """
+
+    WIRE_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, response, session=None, from_mirror: bool = False):
+        self._response = response
+        self._session = session
+        self.from_mirror = from_mirror
+        self.headers = response.headers
+        self.url = response.url
+        self.encoding = (response.headers.get('content-encoding') or 'identity').strip().lower()
+        self._decompressor = None if self.encoding == 'identity' else _Decompressor(self.encoding)
+        self._buffer = b''
+        self._eof = False
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    @property
+    def is_encoded(self):
+        return self._decompressor is not None
+
+    def _read_wire(self, size: int):
+        data = self._response.read(size)
+        self.wire_bytes += len(data)
+        if self._session is not None:
+            self._session._count_bytes(wire=len(data))
+        return data
+
+    def read(self, size: int = -1):
+        if self._decompressor is None:
+            # HTTPResponse.read(-1) on a chunked body returns the raw stream, chunk sizes included.
+            data = self._read_wire(None if size is None or size < 0 else size)
+            self._count_decoded(len(data))
+            return data
+
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            data = self._read_wire(self.WIRE_CHUNK_SIZE)
+            if data:
+                self._buffer += self._decompressor.decompress(data)
+            else:
+                self._buffer += self._decompressor.flush()
+                self._eof = True
+
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._count_decoded(len(data))
+        return data
+
+    def _count_decoded(self, size: int):
+        self.decoded_bytes += size
+        if self._session is not None:
+            self._session._count_bytes(decoded=size)
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Downloads smaller than this are dominated by latency and don't say much about bandwidth.
+THROUGHPUT_MIN_SAMPLE_BYTES = 256 * 1024
+THROUGHPUT_SAMPLES = 16
+THROUGHPUT_MAX_AGE = 3 * 24 * 3600
+
+
+class ThroughputMeter:
+    """ Throughput of the most recent downloads.
+
+    With a state file the samples are shared by every process using the same
+    file, so a headless download benefits from what the browser measured.
+    """
+
+    def __init__(self, path: str = None, samples: int = THROUGHPUT_SAMPLES):
+        """
+        :param path: optional JSON file keeping the samples between sessions
+        :param samples: number of recent downloads averaged
+        """
+        self.path = path
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._samples = []
+        self._mtime = None
+
+    def record(self, size: int, seconds: float):
+        """ Add a finished download of `size` bytes received in `seconds`. """
+        if size < THROUGHPUT_MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+
+        with self._lock:
+            self._reload()
+            self._samples.append([time.time(), size, seconds])
+            del self._samples[:-self.samples]
+            self._save()
+
+    def get_bytes_per_second(self):
+        """ Bytes per second over the recent downloads, None before any was measured. """
+        with self._lock:
+            self._reload()
+            oldest = time.time() - THROUGHPUT_MAX_AGE
+            recent = [sample for sample in self._samples if sample[0] >= oldest]
+
+        seconds = sum(sample[2] for sample in recent)
+        if not seconds:
+            return None
+        return sum(sample[1] for sample in recent) / seconds
+
+    def _reload(self):
+        # Called with the lock held; picks up samples written by other processes.
+        if not self.path:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'r') as file:
+                self._samples = json.load(file)['samples'][-self.samples:]
+            self._mtime = mtime
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save(self):
+        if not self.path:
+            return
+        partPath = "{}.{}.part".format(self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(partPath, 'w') as file:
+                json.dump({'samples': self._samples}, file)
+            os.replace(partPath, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except OSError:
+            # Another process holding the file must not fail the download.
+            pass
+
+
+class MatlibSession:
+    def __init__(self, mirror: str = None, throughput_file: str = None, *args, **kwargs):
+        """
+        :param mirror (str): optional base URL of a studio mirror (http(s):// or file://)
+            which is tried before the upstream server
+        :param throughput_file (str): optional file sharing measured download throughput between processes
+        """
+        self.mirror = mirror
+        self.throughput = ThroughputMeter(throughput_file)
+        self.mirror_hits = 0
+        self.mirror_misses = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self._lock = threading.Lock()
+
+    def _count_bytes(self, wire: int = 0, decoded: int = 0):
+        with self._lock:
+            self.wire_bytes += wire
+            self.decoded_bytes += decoded
+
+    def _count_mirror(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.mirror_hits += 1
+            else:
+                self.mirror_misses += 1
+
+    def get_compression_ratio(self):
+        """ Decoded bytes per byte received, 1.0 before anything was read. """
+        with self._lock:
+            return self.decoded_bytes / self.wire_bytes if self.wire_bytes else 1.0
+
+    @staticmethod
+    def get_mirror_path(url: str):
+        """ Relative path of an upstream URL inside a mirror tree.
+
+        The path is <host>/<url path>, with 'index' appended to directory-like paths
+        and a hash of the sorted query appended when the URL has GET params, so any
+        static file server can serve the tree.
+
+        :param url: string of upstream URL
+        :return: string with relative path using forward slashes
+        """
+        parsed_url = urlparse(url)
+        path = parsed_url.path.lstrip('/')
+        if not path or path.endswith('/'):
+            path += 'index'
+        if parsed_url.query:
+            query = urlencode(sorted(parse_qsl(parsed_url.query)))
+            path += '_' + hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+        return parsed_url.netloc.replace(':', '_') + '/' + path
+
+    def get_mirror_url(self, url: str):
+        return urljoin(self.mirror.rstrip('/') + '/', quote(self.get_mirror_path(url)))
+
+    def open(self, url: str):
+        """ Open URL from the mirror if one is configured, falling back to upstream on a miss.
+
+        :return: MatlibResponse decoding gzip, deflate or brotli content while it is read
+        """
+        if self.mirror:
+            try:
+                response = _urlopen(self.get_mirror_url(url))
+                self._count_mirror(True)
+                return MatlibResponse(response, self, from_mirror=True)
+            except OSError:
+                # URLError and HTTPError are both OSError: missing file or mirror unreachable.
+                self._count_mirror(False)
+        return self.open_upstream(url)
+
+    def open_upstream(self, url: str):
+        """ Open URL on the upstream server, bypassing the mirror.
+
+        :return: MatlibResponse decoding gzip, deflate or brotli content while it is read
+        """
+        return MatlibResponse(_urlopen(url), self)
 
     @staticmethod
     def add_url_params(url: str, params: Dict):
@@ -85,27 +377,38 @@ class MatlibEntityClient:
     def base_url(self):
         return urljoin(self.base, '/{}/{}/'.format(MatlibEndpoint.PREFIX.value, self.endpoint.value))
 
-    def _get_list(self, url: str = None, limit: int = None, offset: int = None, params: dict = None):
+    def _get_list_url(self, url: str = None, limit: int = None, offset: int = None, params: dict = None):
         url = urljoin(base=self.base_url, url=url)
         if params is not None:
             url = self.session.add_url_params(url, params)
-        url = self.session.add_url_params(url, {'limit': limit, 'offset': offset})
-        request = urllib.request.Request(url)
-        response = urllib.request.urlopen(request)
-        response_content = json.loads(response.read().decode("utf-8"))
-        return response_content['results']
+        return self.session.add_url_params(url, {'limit': limit, 'offset': offset})
 
-    def _get_by_id(self, item_id: str, url: str = None):
+    def _get_by_id_url(self, item_id: str, url: str = None):
         url = urljoin(base=self.base_url, url=url)
-        url = urljoin(base=url, url='{}/'.format(item_id))
-        request = urllib.request.Request(url)
-        response = urllib.request.urlopen(request)
-        response_content = json.loads(response.read().decode("utf-8"))
+        return urljoin(base=url, url='{}/'.format(item_id))
+
+    def _iter_list(self, url: str = None, limit: int = None, offset: int = None, params: dict = None):
+        """ Yield records of a listing while the response body is still being received. """
+        url = self._get_list_url(url=url, limit=limit, offset=offset, params=params)
+        response = self.session.open(url)
+        with response:
+            yield from jsonStream.iter_array_items(response, 'results')
+
+    def _get_list(self, url: str = None, limit: int = None, offset: int = None, params: dict = None):
+        return list(self._iter_list(url=url, limit=limit, offset=offset, params=params))
+
+    def _get_by_id(self, item_id: str, url: str = None):
+        url = self._get_by_id_url(item_id=item_id, url=url)
+        response = self.session.open(url)
+        with response:
+            response_content = jsonStream.loads(response.read())
         return response_content
 
     def _download(self, url: str, callback = None, target_dir: str = None, filename: str = None):
-        response = urllib.request.urlopen(url)
-        length = response.getheader('content-length')
+        response = self.session.open(url)
+        # Content-Length counts encoded bytes, so progress and the truncation
+        # check use the bytes received rather than the bytes written.
+        length = response.headers.get('content-length')
         if length:
             length = int(length)
             blocksize = max(0x1000, length//100)
@@ -117,20 +420,27 @@ class MatlibEntityClient:
         if not target_dir:
             target_dir = '.'
         full_filename = os.path.abspath(os.path.join(target_dir, filename))
-        with open(full_filename, 'wb') as file:
-            size = 0
+        # Only time spent receiving counts for throughput, not callbacks throttling or pausing.
+        read_seconds = 0.0
+        with response, open(full_filename, 'wb') as file:
             while True:
+                start = time.perf_counter()
                 buf = response.read(blocksize)
+                read_seconds += time.perf_counter() - start
                 if not buf:
                     break
                 file.write(buf)
-                size += len(buf)
                 if callback:
-                    if not callback(size, length):
+                    if not callback(response.wire_bytes, length):
                         break
+        size = response.wire_bytes
         if length and size != length and os.path.exists(full_filename):
             os.remove(full_filename)
             raise EOFError
+        # The estimate is for upstream downloads, a LAN or file:// mirror would inflate it.
+        if (not length or size == length) and not response.from_mirror:
+            self.session.throughput.record(size, read_seconds)
+        return {'path': full_filename, 'content_type': response.headers.get('content-type'), 'url': response.url}
 
 
 class MatlibEntityListClient(MatlibEntityClient):
@@ -140,6 +450,12 @@ class MatlibEntityListClient(MatlibEntityClient):
     def get_list(self, limit: int, offset: int, params: dict = None):
         return self._get_list(limit=limit, offset=offset, params=params)
 
+    def get_list_url(self, limit: int, offset: int, params: dict = None):
+        return self._get_list_url(limit=limit, offset=offset, params=params)
+
+    def iter_list(self, limit: int, offset: int, params: dict = None):
+        return self._iter_list(limit=limit, offset=offset, params=params)
+
     def get(self, item_id: str):
         return self._get_by_id(item_id=item_id)
 
@@ -169,15 +485,21 @@ class MatlibRendersClient(MatlibEntityListClient):
         super(MatlibRendersClient, self).__init__(*args, **kwargs, endpoint=MatlibEndpoint.RENDERS)
         self._imageurl = self.base.replace('https://api.', 'https://image.')
 
+    def download_url(self, item_id: str):
+        return urljoin(self.base_url, '{}/download/'.format(item_id))
+
+    def thumbnail_url(self, item_id: str):
+        return urljoin(self._imageurl, '{}_thumbnail.jpeg'.format(item_id))
+
     def download(self, item_id: str, callback = None, target_dir: str = None, filename: str = None):
-        self._download(
-            url=urljoin(self.base_url, '{}/download/'.format(item_id)), callback=callback,
+        return self._download(
+            url=self.download_url(item_id), callback=callback,
             target_dir=target_dir, filename=filename
         )
 
     def download_thumbnail(self, item_id: str, callback = None, target_dir: str = None, filename: str = None):
-        self._download(
-            url=urljoin(self._imageurl, '{}_thumbnail.jpeg'.format(item_id)), callback=callback, 
+        return self._download(
+            url=self.thumbnail_url(item_id), callback=callback, 
             target_dir=target_dir, filename=filename
         )
 
@@ -186,22 +508,27 @@ class MatlibPackagesClient(MatlibEntityListClient):
     def __init__(self, *args, **kwargs):
         super(MatlibPackagesClient, self).__init__(*args, **kwargs, endpoint=MatlibEndpoint.PACKAGES)
 
+    def download_url(self, item_id: str):
+        return urljoin(self.base_url, '{}/download/'.format(item_id))
+
     def download(self, item_id: str, callback = None, target_dir: str = None, filename: str = None):
-        self._download(
-            url=urljoin(self.base_url, '{}/download/'.format(item_id)), callback=callback,
+        return self._download(
+            url=self.download_url(item_id), callback=callback,
             target_dir=target_dir, filename=filename
         )
 
 
 class MatlibClient:
 
-    def __init__(self, host: str):
+    def __init__(self, host: str, mirror: str = None, throughput_file: str = None):
         """
         Web Material Library API Client
         :param host (str): Web Material Library host (example: https://web.material.library.com
+        :param mirror (str): optional studio mirror base URL (example: file:///N:/matlib/), see matlibMirror
+        :param throughput_file (str): optional file sharing measured download throughput, see ThroughputMeter
         """
         self.host = host
-        self.session = MatlibSession()
+        self.session = MatlibSession(mirror=mirror, throughput_file=throughput_file)
 
         self.materials = MatlibMaterialsClient(session=self.session, base=self.host)
         self.collections = MatlibCollectionsClient(session=self.session, base=self.host)
@@ -0,0 +1,288 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Content-addressed store for extracted package files.
+
+Every file is stored once under <root>/objects/<sha256[:2]>/<sha256> and
+hard-linked (or symlinked, or as a last resort copied) into the package
+layout. <root>/packages/ holds one manifest per extracted package directory,
+listing the blobs it uses, so unreferenced blobs can be collected safely:
+
+    mayapy contentStore.py N:/matlib/.store gc
+    mayapy contentStore.py N:/matlib/.store stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+LINK_HARDLINK = "hardlink"
+LINK_SYMLINK = "symlink"
+
+# Blobs younger than this are never collected: they may belong to an
+# extraction whose manifest hasn't been written yet.
+GC_GRACE_PERIOD = 60 * 60
+
+
+class ContentStore:
+
+    def __init__(self, root: str, link_mode: str = LINK_HARDLINK):
+        """
+        :param root (str): store directory, must be on the same volume as the packages for hard links
+        :param link_mode (str): LINK_HARDLINK or LINK_SYMLINK
+        """
+        self.root = os.path.abspath(root)
+        self.link_mode = link_mode
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.packages_dir = os.path.join(self.root, "packages")
+        self.temp_dir = os.path.join(self.root, "tmp")
+        for path in (self.objects_dir, self.packages_dir, self.temp_dir):
+            os.makedirs(path, exist_ok=True)
+
+    def get_object_path(self, digest: str):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def extract_zip(self, zip_ref, target_dir: str, package_id: str = None, members=None, max_workers: int = 1) -> Dict:
+        """ Extract zip members into target_dir through the store.
+
+        :param zip_ref: opened zipfile.ZipFile
+        :param target_dir: package directory receiving the links
+        :param package_id: id of the package, recorded in the manifest
+        :param members: optional subset of ZipInfo to extract
+        :param max_workers: number of members extracted in parallel
+        :return: dict with file count, stored bytes and deduplicated bytes
+        """
+        target_dir = os.path.abspath(target_dir)
+        files = dict()
+        stats = {'files': 0, 'stored_bytes': 0, 'deduplicated_bytes': 0}
+        lock = threading.Lock()
+
+        def extract(info, relPath):
+            with zip_ref.open(info, 'r') as source:
+                digest, isNew = self.add_stream(source)
+
+            self.link(digest, os.path.join(target_dir, relPath))
+            with lock:
+                files[relPath.replace(os.sep, '/')] = digest
+                stats['files'] += 1
+                stats['stored_bytes' if isNew else 'deduplicated_bytes'] += info.file_size
+
+        jobs = []
+        for info in (members if members is not None else zip_ref.infolist()):
+            relPath = self._sanitize(info.filename)
+            if relPath is None:
+                continue
+
+            if info.is_dir():
+                os.makedirs(os.path.join(target_dir, relPath), exist_ok=True)
+                continue
+            jobs.append((info, relPath))
+
+        if max_workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='RprUsdExtract') as executor:
+                for future in [executor.submit(extract, *job) for job in jobs]:
+                    future.result()
+        else:
+            for job in jobs:
+                extract(*job)
+
+        self.write_manifest(target_dir, package_id, files)
+        return stats
+
+    def add_stream(self, source):
+        """ Hash a stream while copying it into the store. Returns (digest, True if the blob is new). """
+        hasher = hashlib.sha256()
+        tempPath = os.path.join(self.temp_dir, "{}-{}.part".format(os.getpid(), threading.get_ident()))
+        try:
+            with open(tempPath, 'wb') as file:
+                while True:
+                    buf = source.read(1024 * 1024)
+                    if not buf:
+                        break
+                    hasher.update(buf)
+                    file.write(buf)
+
+            digest = hasher.hexdigest()
+            objectPath = self.get_object_path(digest)
+            # A reused blob gets a fresh modification time, so garbage_collect leaves it alone until the
+            # manifest referencing it is written.
+            if self._touch(objectPath):
+                return digest, False
+
+            os.makedirs(os.path.dirname(objectPath), exist_ok=True)
+            # Blobs are shared by every linked package, protect them from in-place edits.
+            os.chmod(tempPath, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tempPath, objectPath)
+            return digest, True
+        finally:
+            if os.path.exists(tempPath):
+                self._remove(tempPath)
+
+    def link(self, digest: str, destination: str):
+        objectPath = self.get_object_path(digest)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if os.path.lexists(destination):
+            self._remove(destination)
+
+        if self.link_mode == LINK_HARDLINK:
+            try:
+                os.link(objectPath, destination)
+                # Removing an old link on Windows may have cleared the shared read-only flag.
+                os.chmod(objectPath, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+                return
+            except OSError:
+                pass
+        try:
+            os.symlink(objectPath, destination)
+        except OSError:
+            # No link support (i.e. FAT volume or no symlink privilege on Windows).
+            shutil.copyfile(objectPath, destination)
+
+    def get_manifest_path(self, package_dir: str):
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(package_dir)).encode('utf-8')).hexdigest()
+        return os.path.join(self.packages_dir, key + ".json")
+
+    def write_manifest(self, package_dir: str, package_id: str, files: Dict[str, str]):
+        manifest = {'package': package_id, 'directory': os.path.abspath(package_dir), 'files': files}
+        manifestPath = self.get_manifest_path(package_dir)
+        with open(manifestPath + ".part", 'w') as file:
+            json.dump(manifest, file)
+        os.replace(manifestPath + ".part", manifestPath)
+
+    def forget(self, package_dir: str):
+        """ Drop the manifest of a package directory, i.e. before deleting it. """
+        manifestPath = self.get_manifest_path(package_dir)
+        if os.path.exists(manifestPath):
+            os.remove(manifestPath)
+
+    def garbage_collect(self, dry_run: bool = False) -> Dict:
+        """ Remove manifests of deleted package directories and blobs no manifest references.
+
+        :return: dict with removed manifest and blob counts and freed bytes
+        """
+        referenced = set()
+        stats = {'manifests_removed': 0, 'blobs_removed': 0, 'freed_bytes': 0}
+
+        for manifest, manifestPath in self._manifests():
+            if not os.path.isdir(manifest['directory']):
+                stats['manifests_removed'] += 1
+                if not dry_run:
+                    os.remove(manifestPath)
+                continue
+            referenced.update(manifest['files'].values())
+
+        now = time.time()
+        for digest, objectPath in self._objects():
+            if digest in referenced:
+                continue
+            info = os.stat(objectPath)
+            if now - info.st_mtime < GC_GRACE_PERIOD:
+                continue
+            stats['blobs_removed'] += 1
+            stats['freed_bytes'] += info.st_size
+            if not dry_run:
+                self._remove(objectPath)
+
+        return stats
+
+    def get_stats(self) -> Dict:
+        """ Return stored bytes and the bytes the package layouts would take without deduplication. """
+        sizes = dict()
+        for digest, objectPath in self._objects():
+            sizes[digest] = os.stat(objectPath).st_size
+
+        logical = 0
+        packages = 0
+        for manifest, _ in self._manifests():
+            packages += 1
+            logical += sum(sizes.get(digest, 0) for digest in manifest['files'].values())
+
+        return {'packages': packages, 'blobs': len(sizes), 'stored_bytes': sum(sizes.values()), 'logical_bytes': logical}
+
+    def _manifests(self):
+        for fileName in os.listdir(self.packages_dir):
+            if not fileName.endswith(".json"):
+                continue
+            manifestPath = os.path.join(self.packages_dir, fileName)
+            try:
+                with open(manifestPath, 'r') as file:
+                    yield json.load(file), manifestPath
+            except (OSError, ValueError):
+                continue
+
+    def _objects(self):
+        for prefix in os.listdir(self.objects_dir):
+            prefixDir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefixDir):
+                continue
+            for digest in os.listdir(prefixDir):
+                yield digest, os.path.join(prefixDir, digest)
+
+    @staticmethod
+    def _touch(path: str):
+        """ Set the modification time of a blob to now, False if it doesn't exist. """
+        try:
+            os.utime(path, None)
+            return True
+        except FileNotFoundError:
+            return False
+        except PermissionError:
+            # Read-only blobs can't be touched on Windows.
+            os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+            try:
+                os.utime(path, None)
+            finally:
+                os.chmod(path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            return True
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except PermissionError:
+            # Read-only files can't be removed on Windows.
+            os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+            os.remove(path)
+
+    @staticmethod
+    def _sanitize(name: str):
+        """ Relative OS path of a zip member, None for members escaping the package directory. """
+        parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.')]
+        if not parts or '..' in parts or ':' in parts[0]:
+            return None
+        return os.path.join(*parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain a content-addressed package store")
+    parser.add_argument("root", help="store directory")
+    parser.add_argument("command", choices=["gc", "stats"])
+    parser.add_argument("--dry-run", action="store_true", help="gc: only report what would be removed")
+    args = parser.parse_args(argv)
+
+    store = ContentStore(args.root)
+    if args.command == "gc":
+        print(store.garbage_collect(dry_run=args.dry_run))
+    else:
+        print(store.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+import matlibPackages
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_PAUSED = "paused"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+
+FINISHED_STATES = (STATE_DONE, STATE_FAILED, STATE_CANCELLED)
+
+
+class DownloadJob:
+
+    _ids = itertools.count(1)
+
+    def __init__(self, package: Dict, target_dir: str, title: str = None):
+        self.id = next(DownloadJob._ids)
+        self.package = package
+        self.target_dir = target_dir
+        self.title = title or package.get("file", package["id"])
+        self.state = STATE_QUEUED
+        self.received = 0
+        self.total = 0
+        self.error = None
+        self.path = None
+        self.paused = False
+        self.cancelled = False
+        self.interrupted = False
+
+    def to_dict(self):
+        return {'package': self.package, 'target_dir': self.target_dir, 'title': self.title,
+                'paused': self.paused}
+
+    @staticmethod
+    def from_dict(data: Dict):
+        job = DownloadJob(data['package'], data['target_dir'], data.get('title'))
+        job.paused = data.get('paused', False)
+        return job
+
+
+class DownloadManager:
+    """ Queue of package downloads run by background workers.
+
+    Listeners are called from a notifier thread with the manager as argument,
+    at most `notify_rate` times per second, so per-block progress never floods the UI.
+    Unfinished jobs are written to `queue_file` and restored on the next start.
+    `post_install`, if set, is called from the worker with the directory of every installed package.
+    """
+
+    def __init__(self, client, queue_file: str = None, max_workers: int = 2, notify_rate: float = 4.0, store=None):
+        self.client = client
+        self.queue_file = queue_file
+        self.store = store
+        self.max_workers = max_workers
+        self.notify_interval = 1.0 / notify_rate
+        self.bandwidth_limit = 0
+        self.extract_mode = matlibPackages.EXTRACT_ALL
+        self.post_install = None
+        self.paused = False
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._jobs = []
+        self._listeners = []
+        self._dirty = False
+        self._stopped = False
+
+        self._bucket_time = time.monotonic()
+        self._bucket_bytes = 0
+
+        self._restore()
+
+        self._workers = [
+            threading.Thread(target=self._worker, name='RprUsdDownload{}'.format(i), daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        threading.Thread(target=self._notifier, name='RprUsdDownloadNotifier', daemon=True).start()
+
+    # Public API.
+    # -----------------------------------------------------------------------------
+    def enqueue(self, package: Dict, target_dir: str, title: str = None) -> DownloadJob:
+        """ Queue a package download. A package already queued, paused or running for the same
+        directory isn't queued twice, its job is returned instead.
+        """
+        with self._condition:
+            for job in self._jobs:
+                if job.state not in FINISHED_STATES and job.package["id"] == package["id"] \
+                        and self._same_directory(job.target_dir, target_dir):
+                    return job
+
+            job = DownloadJob(package, target_dir, title)
+            self._jobs.append(job)
+            self._queue.append(job)
+            self._changed()
+        self._save()
+        return job
+
+    @staticmethod
+    def _same_directory(first: str, second: str):
+        return os.path.normcase(os.path.abspath(first)) == os.path.normcase(os.path.abspath(second))
+
+    def get_jobs(self) -> List[DownloadJob]:
+        with self._condition:
+            return list(self._jobs)
+
+    def cancel(self, job: DownloadJob):
+        with self._condition:
+            job.cancelled = True
+            if job in self._queue:
+                self._queue.remove(job)
+                job.state = STATE_CANCELLED
+            self._changed()
+        self._save()
+
+    def set_job_paused(self, job: DownloadJob, paused: bool):
+        """ Pause or resume one job. A queued job is skipped by the workers while paused,
+        a running one is abandoned at the next block and downloaded again once resumed.
+        """
+        with self._condition:
+            job.paused = paused
+            self._resume_queued()
+            self._changed()
+        self._save()
+
+    def set_paused(self, paused: bool):
+        """ Pause or resume all downloads. Running downloads are abandoned at the next block
+        and start over once resumed.
+        """
+        with self._condition:
+            self.paused = paused
+            self._resume_queued()
+            self._changed()
+
+    def set_bandwidth_limit(self, bytes_per_second: int):
+        """ Limit the total download rate of all workers, 0 means unlimited. """
+        with self._condition:
+            self.bandwidth_limit = max(0, int(bytes_per_second))
+
+    def clear_finished(self):
+        with self._condition:
+            self._jobs = [job for job in self._jobs if job.state not in FINISHED_STATES]
+            self._changed()
+
+    def get_progress(self):
+        """ Aggregate (received, total) bytes of all unfinished jobs with known size. """
+        with self._condition:
+            jobs = [job for job in self._jobs if job.state not in FINISHED_STATES]
+            return sum(job.received for job in jobs), sum(job.total for job in jobs)
+
+    def add_listener(self, listener: Callable):
+        with self._condition:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable):
+        with self._condition:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            for job in self._jobs:
+                if job.state == STATE_RUNNING:
+                    job.cancelled = True
+            self._condition.notify_all()
+
+    # Workers.
+    # -----------------------------------------------------------------------------
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (self.paused or not self._next_runnable()):
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                job = self._next_runnable()
+                self._queue.remove(job)
+                job.state = STATE_RUNNING
+                self._changed()
+
+            self._run(job)
+            self._save()
+
+    def _resume_queued(self):
+        # Called with the condition held: interrupted jobs show as paused until they may run again.
+        for job in self._queue:
+            if job.state == STATE_PAUSED and not (self.paused or job.paused):
+                job.state = STATE_QUEUED
+
+    def _next_runnable(self):
+        for job in self._queue:
+            if not job.paused:
+                return job
+        return None
+
+    def _run(self, job: DownloadJob):
+        def progress(size, length):
+            return self._on_progress(job, size, length)
+
+        try:
+            job.path = matlibPackages.install_package(self.client, job.package, job.target_dir, progress, self.store,
+                                                      self.extract_mode)
+            state = STATE_DONE
+            job.interrupted = False
+        except Exception as e:
+            if job.interrupted:
+                state = STATE_PAUSED
+            else:
+                state = STATE_CANCELLED if job.cancelled else STATE_FAILED
+            if state == STATE_FAILED:
+                job.error = str(e)
+                print("ML Log: ERROR: download of " + job.title + " failed: " + job.error)
+
+        if state == STATE_PAUSED:
+            # Paused mid-download: back to the front of the queue, it starts over once resumed.
+            with self._condition:
+                job.interrupted = False
+                job.received = 0
+                job.state = STATE_CANCELLED if job.cancelled or self._stopped else STATE_PAUSED
+                if job.state == STATE_PAUSED:
+                    self._queue.appendleft(job)
+                    self._resume_queued()
+                self._changed()
+            return
+
+        if state == STATE_DONE and self.post_install is not None:
+            try:
+                self.post_install(job.path)
+            except Exception as e:
+                print("ML Log: WARNING: post-install step of " + job.title + " failed: " + str(e))
+
+        with self._condition:
+            job.state = state
+            self._changed()
+
+    def _on_progress(self, job: DownloadJob, size: int, length: int):
+        with self._condition:
+            delta = size - job.received
+            job.received = size
+            job.total = length or 0
+            self._changed()
+
+            if job.cancelled or self._stopped:
+                return False
+
+            # A connection held open through a pause gets dropped by servers and proxies,
+            # so the download is abandoned here and started over once resumed.
+            if self.paused or job.paused:
+                job.interrupted = True
+                return False
+
+            delay = self._throttle(delta)
+
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def _throttle(self, size: int):
+        """ Token bucket shared by all workers, returns how long the caller should sleep. """
+        if not self.bandwidth_limit:
+            return 0.0
+
+        now = time.monotonic()
+        self._bucket_bytes = max(0.0, self._bucket_bytes - (now - self._bucket_time) * self.bandwidth_limit)
+        self._bucket_time = now
+        self._bucket_bytes += size
+        return max(0.0, self._bucket_bytes / self.bandwidth_limit - 1.0)
+
+    # Notifications.
+    # -----------------------------------------------------------------------------
+    def _changed(self):
+        # Called with the condition held.
+        self._dirty = True
+        self._condition.notify_all()
+
+    def _notifier(self):
+        while not self._stopped:
+            time.sleep(self.notify_interval)
+            with self._condition:
+                if not self._dirty:
+                    continue
+                self._dirty = False
+                listeners = list(self._listeners)
+
+            for listener in listeners:
+                try:
+                    listener(self)
+                except Exception as e:
+                    print("ML Log: ERROR: download listener failed: " + str(e))
+
+    # Persistence.
+    # -----------------------------------------------------------------------------
+    def _save(self):
+        if not self.queue_file:
+            return
+
+        with self._condition:
+            data = [job.to_dict() for job in self._jobs if job.state not in FINISHED_STATES]
+
+        try:
+            with open(self.queue_file + ".part", 'w') as file:
+                json.dump(data, file)
+            os.replace(self.queue_file + ".part", self.queue_file)
+        except OSError as e:
+            print("ML Log: ERROR: couldn't save download queue: " + str(e))
+
+    def _restore(self):
+        if not self.queue_file or not os.path.isfile(self.queue_file):
+            return
+
+        try:
+            with open(self.queue_file, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        for item in data:
+            job = DownloadJob.from_dict(item)
+            self._jobs.append(job)
+            self._queue.append(job)
@@ -0,0 +1,248 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental JSON decoding of listing responses.
+
+iter_array_items parses `{"count": ..., "results": [...]}` straight from a
+file-like object and yields the records one by one, so a large listing is
+never held as bytes, str and objects at the same time. ijson (with its C
+backend) is used when installed; otherwise the stdlib scanner decodes one
+record at a time from a sliding text buffer. read_arrays decodes several
+arrays of one object in a single pass. loads uses orjson when installed.
+"""
+
+import codecs
+import functools
+import json
+from typing import Dict, Iterable
+
+CHUNK_SIZE = 64 * 1024
+
+# Consumed text is dropped from the buffer once it grows past this size.
+COMPACT_THRESHOLD = 1024 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+@functools.lru_cache(maxsize=None)
+def _get_ijson():
+    """ ijson module, None if it isn't installed; looked up once. """
+    try:
+        import ijson
+        return ijson
+    except ImportError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_orjson():
+    """ orjson module, None if it isn't installed; looked up once. """
+    try:
+        import orjson
+        return orjson
+    except ImportError:
+        return None
+
+
+def loads(data):
+    """ Decode a complete JSON document given as bytes or str. """
+    orjson = _get_orjson()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_array_items(stream, key: str = 'results', chunk_size: int = CHUNK_SIZE, use_backend: bool = True):
+    """ Yield the items of the array stored under `key` in the top-level JSON object read from `stream`.
+
+    :param stream: file-like object with a read(size) method returning bytes
+    :param key: top-level key of the array
+    :param chunk_size: number of bytes read from the stream at once
+    :param use_backend: allow a faster installed parser (ijson)
+    :raises KeyError: if the object has no `key`, i.e. an error payload such as {"detail": ...}
+    """
+    ijson = _get_ijson() if use_backend else None
+    if ijson is not None:
+        try:
+            events = ijson.parse(stream, use_float=True)
+        except TypeError:
+            # ijson < 3.1 has no use_float and returns Decimal for real numbers.
+            events = ijson.parse(stream)
+        found = [False]
+        yield from ijson.items(_watch_key(events, key, found), key + '.item')
+        if not found[0]:
+            raise KeyError(key)
+        return
+
+    reader = _TextReader(stream, chunk_size)
+    reader.expect('{')
+
+    while True:
+        c = reader.peek()
+        if c == '}':
+            raise KeyError(key)
+        if c == ',':
+            reader.advance()
+            continue
+
+        name = reader.decode_value()
+        reader.expect(':')
+
+        if name != key:
+            reader.decode_value()
+            continue
+
+        # The rest of the document isn't needed.
+        yield from _iter_array(reader)
+        return
+
+
+def read_arrays(stream, keys: Iterable[str], chunk_size: int = CHUNK_SIZE, use_backend: bool = True) -> Dict[str, list]:
+    """ Decode the arrays stored under `keys` in the top-level JSON object read from `stream`, in one pass.
+
+    Values under other keys are skipped, reading stops once every array is decoded.
+
+    :param stream: file-like object with a read(size) method returning bytes
+    :param keys: top-level keys of the arrays
+    :param chunk_size: number of bytes read from the stream at once
+    :param use_backend: allow a faster installed parser (ijson)
+    :return: arrays by key, null values as empty lists
+    :raises KeyError: if the object lacks one of `keys`
+    """
+    keys = list(keys)
+    wanted = set(keys)
+    result = dict()
+
+    ijson = _get_ijson() if use_backend else None
+    if ijson is not None:
+        try:
+            pairs = ijson.kvitems(stream, '', use_float=True)
+        except TypeError:
+            pairs = ijson.kvitems(stream, '')
+        for name, value in pairs:
+            if name in wanted:
+                result[name] = value if value is not None else []
+                if len(result) == len(wanted):
+                    break
+    else:
+        reader = _TextReader(stream, chunk_size)
+        reader.expect('{')
+        while len(result) < len(wanted):
+            c = reader.peek()
+            if c == '}':
+                break
+            if c == ',':
+                reader.advance()
+                continue
+
+            name = reader.decode_value()
+            reader.expect(':')
+            if name in wanted:
+                result[name] = list(_iter_array(reader))
+            else:
+                reader.decode_value()
+
+    for key in keys:
+        if key not in result:
+            raise KeyError(key)
+    return {key: result[key] for key in keys}
+
+
+def _iter_array(reader):
+    """ Yield the items of the array (or null) at the position of `reader`, one record decoded at a time. """
+    if reader.peek() == 'n':
+        # null counts as an empty listing.
+        reader.decode_value()
+        return
+
+    reader.expect('[')
+    while True:
+        c = reader.peek()
+        if c == ']':
+            reader.advance()
+            return
+        if c == ',':
+            reader.advance()
+            continue
+        yield reader.decode_value()
+
+
+def _watch_key(events, key: str, found: list):
+    """ Pass ijson events through, setting found[0] once the top-level `key` shows up. """
+    for event in events:
+        if not found[0] and event[0] == '' and event[1] == 'map_key' and event[2] == key:
+            found[0] = True
+        yield event
+
+
+class _TextReader:
+
+    def __init__(self, stream, chunk_size: int):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        data = self._stream.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            self._buffer += self._decoder.decode(b'', final=True)
+            return False
+
+        if self._pos > COMPACT_THRESHOLD:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        self._buffer += self._decoder.decode(data)
+        return True
+
+    def peek(self):
+        """ Return the next non-whitespace character without consuming it. """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of data", self._buffer, self._pos)
+
+    def advance(self):
+        self._pos += 1
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError("Expecting '" + char + "'", self._buffer, self._pos)
+        self._pos += 1
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # A number ending exactly at the end of the buffer may continue in the next chunk.
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+            return value
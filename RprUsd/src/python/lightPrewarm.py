@@ -0,0 +1,194 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Background warming of storage:// environment lights.
+
+rprUsdSetIBL references storage://<name> and the first render then waits
+while the resolver fetches the light and its HDRI. Warming opens the same
+layer through the layer registry and keeps it open, so it is already loaded
+when the reference is composed, and reads every asset it points to through
+the resolver. Warming never delays applying a light; pipeline tools warm
+lights ahead of a session:
+
+    import lightPrewarm
+    lightPrewarm.prefetch(["Studio Softbox", "Sunset Beach"])
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+STORAGE_SCHEME = "storage://"
+
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+
+g_Prewarmer = None
+
+
+def get_asset_path(name: str):
+    return STORAGE_SCHEME + name
+
+
+class LightPrewarmer:
+    """ Warms storage:// lights on worker threads and keeps the last `max_entries` of them loaded.
+
+    Callbacks are invoked on a worker thread with (name, ok); ok is False if warming
+    failed, in which case applying the light simply fetches it synchronously as before.
+    """
+
+    def __init__(self, max_entries: int = 8, max_workers: int = 2):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._layers = OrderedDict()
+        self._futures = dict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='RprUsdLightWarm')
+        self.stats = {'warmed': 0, 'hits': 0, 'failed': 0, 'bytes': 0}
+
+    def is_warm(self, name: str):
+        with self._lock:
+            if name not in self._layers:
+                return False
+            self._layers.move_to_end(name)
+            return True
+
+    def request(self, name: str, callback: Callable = None):
+        """ Warm one light in the background; a request for a light already in flight is shared. """
+        with self._lock:
+            future = self._futures.get(name)
+            if future is None:
+                if name in self._layers:
+                    self._layers.move_to_end(name)
+                    self.stats['hits'] += 1
+                future = self._executor.submit(self._warm, name)
+                self._futures[name] = future
+
+        if callback:
+            future.add_done_callback(lambda f: callback(name, not f.cancelled() and f.exception() is None))
+        return future
+
+    def prefetch(self, names: Iterable[str]):
+        return [self.request(name) for name in names]
+
+    def clear(self):
+        with self._lock:
+            self._layers.clear()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        self.clear()
+
+    def _warm(self, name: str):
+        try:
+            if not self.is_warm(name):
+                layers, size = self._load(name)
+                with self._lock:
+                    self._layers[name] = layers
+                    self.stats['warmed'] += 1
+                    self.stats['bytes'] += size
+                    # Dropping the handles lets the registry release layers of lights no longer in use.
+                    while len(self._layers) > self._max_entries:
+                        self._layers.popitem(last=False)
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += 1
+            print("ML Log: ERROR: couldn't warm light '" + name + "': " + str(e))
+            raise
+        finally:
+            with self._lock:
+                self._futures.pop(name, None)
+
+    def _load(self, name: str):
+        from pxr import Sdf
+
+        rootLayer = Sdf.Layer.FindOrOpen(get_asset_path(name))
+        if rootLayer is None:
+            raise OSError("couldn't open " + get_asset_path(name))
+
+        # Walk sublayers and references so nested HDRI layers are warmed as well.
+        layers = [rootLayer]
+        visited = {rootLayer.identifier}
+        size = 0
+        index = 0
+        while index < len(layers):
+            layer = layers[index]
+            index += 1
+
+            for assetPath in self._get_attribute_asset_paths(layer):
+                size += self._read_asset(layer.ComputeAbsolutePath(assetPath))
+
+            getDependencies = getattr(layer, 'GetCompositionAssetDependencies', None)
+            for dependency in (getDependencies() if getDependencies else layer.subLayerPaths):
+                child = Sdf.Layer.FindOrOpenRelativeToLayer(layer, dependency)
+                if child is not None and child.identifier not in visited:
+                    visited.add(child.identifier)
+                    layers.append(child)
+
+        return layers, size
+
+    @staticmethod
+    def _get_attribute_asset_paths(layer):
+        from pxr import Sdf
+
+        assetPaths = []
+
+        def visit(path):
+            if not path.IsPropertyPath():
+                return
+            spec = layer.GetAttributeAtPath(path)
+            value = spec.default if spec is not None else None
+            if isinstance(value, Sdf.AssetPath) and value.path:
+                assetPaths.append(value.path)
+
+        layer.Traverse(Sdf.Path.absoluteRootPath, visit)
+        return assetPaths
+
+    @staticmethod
+    def _read_asset(assetPath: str):
+        """ Read an asset through the resolver so it ends up in the resolver's cache, return its size. """
+        from pxr import Ar
+
+        resolver = Ar.GetResolver()
+        resolvedPath = resolver.Resolve(assetPath)
+        if not resolvedPath:
+            return 0
+
+        asset = resolver.OpenAsset(resolvedPath)
+        if asset is None:
+            return 0
+
+        size = asset.GetSize()
+        if not hasattr(asset, 'Read'):
+            asset.GetBuffer()
+            return size
+
+        offset = 0
+        while offset < size:
+            data = asset.Read(min(READ_CHUNK_SIZE, size - offset), offset)
+            if not data:
+                break
+            offset += len(data)
+        return size
+
+
+def getPrewarmer():
+    global g_Prewarmer
+
+    if g_Prewarmer is None:
+        g_Prewarmer = LightPrewarmer()
+    return g_Prewarmer
+
+
+def prefetch(names: Iterable[str]):
+    """ Warm a list of light names in the background, return their futures. """
+    return getPrewarmer().prefetch(names)
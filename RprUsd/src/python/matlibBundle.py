@@ -0,0 +1,298 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline material bundles for network-free farm rendering.
+
+Live-mode binds reference gpuopen://<material id> under /RenderStudioMaterials
+and look the MaterialX name up on the server. Exporting a bundle resolves
+every such id of a stage once, downloads one package per material next to a
+manifest, and writes an override layer which points the references at the
+local .mtlx files:
+
+    mayapy matlibBundle.py shot.usda N:/bundles/shot --resolution 2k --insert
+
+Setting RPRUSD_MATLIB_MANIFEST to the bundle manifest makes name lookups read
+it instead of asking the server.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import matlibPackages
+import resolutionPolicy
+
+MANIFEST_FILE = "matlibManifest.json"
+OVERRIDE_LAYER_FILE = "localizedMaterials.usda"
+MATERIALS_ROOT = "/RenderStudioMaterials"
+GPUOPEN_SCHEME = "gpuopen://"
+PACKAGE_LIST_LIMIT = 100
+
+_manifestCache = dict()
+_manifestLock = threading.Lock()
+
+
+def scan_stage(stage) -> Dict[str, str]:
+    """ Matlib material ids referenced under /RenderStudioMaterials.
+
+    :param stage: Usd.Stage
+    :return: dict of prim path to material id
+    """
+    root = stage.GetPrimAtPath(MATERIALS_ROOT)
+    if not root:
+        return dict()
+
+    found = dict()
+    for prim in root.GetChildren():
+        references = prim.GetMetadata("references")
+        if references is None:
+            continue
+        for reference in references.GetAddedOrExplicitItems():
+            if reference.assetPath.startswith(GPUOPEN_SCHEME):
+                found[str(prim.GetPath())] = reference.assetPath[len(GPUOPEN_SCHEME):]
+    return found
+
+
+def find_mtlx_file(package_dir: str):
+    """ First .mtlx file of an extracted package, None if there is none. """
+    for root, dirs, files in os.walk(package_dir):
+        dirs.sort()
+        for fileName in sorted(files):
+            if fileName.lower().endswith(".mtlx"):
+                return os.path.join(root, fileName)
+    return None
+
+
+class MatlibBundleExporter:
+
+    def __init__(self, client, bundle_dir: str, rule: str = "largest", max_workers: int = 4, store=None,
+                 policy=None, extract_mode: str = matlibPackages.EXTRACT_ALL):
+        """
+        :param client: MatlibClient
+        :param bundle_dir: directory receiving the manifest, packages and override layer
+        :param rule: package rule passed to matlibPackages.choose_package
+        :param max_workers: number of materials resolved in parallel
+        :param store: optional contentStore.ContentStore deduplicating extracted files
+        :param policy: resolutionPolicy.ResolutionPolicy of the "auto" rule, the defaults if None
+        :param extract_mode: matlibPackages extraction mode
+        """
+        self.client = client
+        self.bundle_dir = bundle_dir
+        self.rule = rule
+        self.max_workers = max_workers
+        self.store = store
+        self.policy = policy
+        self.extract_mode = extract_mode
+        self.stats = {'materials': 0, 'downloaded': 0, 'reused': 0, 'failed': 0, 'unextracted_bytes': 0, 'seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def export(self, stage, insert_override: bool = False):
+        """ Resolve the stage's Matlib materials into the bundle.
+
+        :param stage: Usd.Stage to scan
+        :param insert_override: insert the override layer as the strongest sublayer of the root layer
+        :return: manifest dict
+        """
+        start = time.perf_counter()
+        primIds = scan_stage(stage)
+        materialIds = sorted(set(primIds.values()))
+
+        packagesDir = os.path.join(self.bundle_dir, "packages")
+        os.makedirs(packagesDir, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='RprUsdBundle') as executor:
+            results = list(executor.map(lambda i: self._resolve(i, packagesDir), materialIds))
+
+        manifest = {
+            'version': 1,
+            'host': self.client.host,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'materials': {materialId: entry for materialId, entry in zip(materialIds, results) if entry},
+        }
+        self._write_json(os.path.join(self.bundle_dir, MANIFEST_FILE), manifest)
+
+        overridePath = self._write_override_layer(primIds, manifest)
+        if insert_override and overridePath:
+            rootLayer = stage.GetRootLayer()
+            relativePath = self._relative_to_layer(overridePath, rootLayer)
+            if relativePath not in rootLayer.subLayerPaths:
+                rootLayer.subLayerPaths.insert(0, relativePath)
+
+        self.stats['materials'] = len(manifest['materials'])
+        self.stats['seconds'] = time.perf_counter() - start
+        return manifest
+
+    def _resolve(self, material_id: str, packages_dir: str):
+        try:
+            material = self.client.materials.get(material_id)
+            packages = self.client.packages.get_list(limit=PACKAGE_LIST_LIMIT, offset=0, params={'material': material_id})
+            package = matlibPackages.choose_package(packages, self.rule, self.policy,
+                                                    self.client.session.throughput.get_bytes_per_second())
+            if package is None:
+                raise ValueError("material has no packages")
+
+            packageDir = matlibPackages.get_package_directory(package, packages_dir)
+            if matlibPackages.is_package_installed(package, packages_dir):
+                self._count('reused')
+            else:
+                report = dict()
+                matlibPackages.install_package(self.client, package, packages_dir, store=self.store,
+                                               mode=self.extract_mode, report=report)
+                self._count('downloaded')
+                with self._lock:
+                    self.stats['unextracted_bytes'] += report.get('skipped_bytes', 0)
+
+            mtlxPath = find_mtlx_file(packageDir)
+            if mtlxPath is None:
+                raise ValueError("package " + package["file"] + " contains no .mtlx file")
+
+            return {
+                'name': material["mtlx_material_name"],
+                'title': material.get("title"),
+                'package': package["id"],
+                'label': package.get("label"),
+                'mtlx': os.path.relpath(mtlxPath, self.bundle_dir).replace(os.sep, '/'),
+            }
+        except Exception as e:
+            print("ML Log: ERROR: couldn't bundle material " + material_id + ": " + str(e))
+            self._count('failed')
+            return None
+
+    def _write_override_layer(self, prim_ids: Dict[str, str], manifest: Dict):
+        """ Layer with explicit references from the material prims to the bundled .mtlx files. """
+        from pxr import Sdf
+
+        entries = manifest['materials']
+        if not entries:
+            return None
+
+        path = os.path.join(self.bundle_dir, OVERRIDE_LAYER_FILE)
+        layer = Sdf.Layer.CreateAnonymous(".usda")
+        for primPath, materialId in sorted(prim_ids.items()):
+            if materialId not in entries:
+                continue
+            spec = Sdf.CreatePrimInLayer(layer, Sdf.Path(primPath))
+            spec.specifier = Sdf.SpecifierOver
+            # An explicit list in the stronger layer replaces the gpuopen:// reference.
+            spec.referenceList.explicitItems = [Sdf.Reference("./" + entries[materialId]['mtlx'], Sdf.Path("/MaterialX"))]
+
+        layer.Export(path)
+        return path
+
+    @staticmethod
+    def _relative_to_layer(path: str, layer):
+        if layer.realPath:
+            return os.path.relpath(path, os.path.dirname(layer.realPath)).replace(os.sep, '/')
+        return path.replace(os.sep, '/')
+
+    @staticmethod
+    def _write_json(path: str, data):
+        partPath = path + ".part"
+        with open(partPath, 'w') as file:
+            json.dump(data, file, indent=2)
+        os.replace(partPath, path)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def load_manifest(path: str):
+    """ Parsed manifest, cached per path and modification time. None if it can't be read. """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _manifestLock:
+        cached = _manifestCache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    try:
+        with open(path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        print("ML Log: WARNING: couldn't read material manifest " + path + ": " + str(e))
+        return None
+
+    with _manifestLock:
+        _manifestCache[path] = (mtime, manifest)
+    return manifest
+
+
+def get_manifest_paths() -> List[str]:
+    """ Manifests listed in RPRUSD_MATLIB_MANIFEST, separated by os.pathsep; a directory means its manifest file. """
+    paths = []
+    for path in (os.environ.get("RPRUSD_MATLIB_MANIFEST") or "").split(os.pathsep):
+        if not path:
+            continue
+        if os.path.isdir(path):
+            path = os.path.join(path, MANIFEST_FILE)
+        paths.append(path)
+    return paths
+
+
+def lookup_material(material_id: str):
+    """ Manifest entry of a material from the configured manifests, None if none of them has it. """
+    for path in get_manifest_paths():
+        manifest = load_manifest(path)
+        if manifest and material_id in manifest.get('materials', {}):
+            return manifest['materials'][material_id]
+    return None
+
+
+def main(argv=None):
+    import webServerUrlHelper
+    from pxr import Usd
+
+    parser = argparse.ArgumentParser(description="Bundle the Web Material Library materials of a stage for offline rendering")
+    parser.add_argument("stage", help="USD stage to scan")
+    parser.add_argument("bundle_dir", help="directory receiving the manifest, packages and override layer")
+    parser.add_argument("--resolution", default="largest",
+                        help="'smallest', 'largest', 'auto' or a resolution label such as 2k (default: largest); "
+                             "'auto' picks the highest resolution fitting the download budgets")
+    parser.add_argument("--workers", type=int, default=4, help="parallel downloads (default: 4)")
+    parser.add_argument("--insert", action="store_true",
+                        help="insert the override layer into the stage's root layer and save it")
+    parser.add_argument("--extract", choices=(matlibPackages.EXTRACT_ALL, matlibPackages.EXTRACT_REFERENCED),
+                        default=matlibPackages.EXTRACT_ALL,
+                        help="extract all files, or only the .mtlx documents and the files they reference "
+                             "(default: all)")
+    resolutionPolicy.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    stage = Usd.Stage.Open(args.stage)
+    if not stage:
+        print("ML Log: ERROR: couldn't open " + args.stage)
+        return 1
+
+    exporter = MatlibBundleExporter(webServerUrlHelper.createMatlibClient(), args.bundle_dir,
+                                    rule=args.resolution, max_workers=args.workers,
+                                    store=matlibPackages.get_content_store(),
+                                    policy=resolutionPolicy.policy_from_arguments(args), extract_mode=args.extract)
+    exporter.export(stage, insert_override=args.insert)
+    if args.insert:
+        stage.GetRootLayer().Save()
+
+    print("ML Log: bundle done: {materials} materials, {downloaded} downloaded, {reused} reused, "
+          "{failed} failed in {seconds:.1f}s, {unextracted_bytes} unreferenced bytes not extracted".format(**exporter.stats))
+    return 1 if exporter.stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Studio mirror builder for the Web Material Library.
+
+Snapshots the catalog listings, the selected materials, their thumbnails and
+packages into a directory tree laid out by MatlibSession.get_mirror_path.
+The tree can be served by any static HTTP server or read through file://;
+point clients at it with RPRUSD_MATLIB_MIRROR:
+
+    mayapy matlibMirror.py N:/matlib --category Metals --category Wood
+    set RPRUSD_MATLIB_MIRROR=file:///N:/matlib/
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from client import MatlibClient
+
+# Queries issued by the browser; the mirror must answer exactly these.
+CATALOG_LIMIT = 10000
+PACKAGE_LIST_LIMIT = 100
+
+
+class MatlibMirrorBuilder:
+
+    def __init__(self, host: str, mirror_dir: str, packages: bool = True, thumbnails: bool = True,
+                 renders: bool = False, max_workers: int = 8):
+        """
+        :param host (str): upstream Web Material Library host
+        :param mirror_dir (str): root directory of the mirror tree
+        :param packages (bool): mirror package archives of the selected materials
+        :param thumbnails (bool): mirror grid thumbnails of the selected materials
+        :param renders (bool): mirror full-size renders used by the preview pane
+        :param max_workers (int): number of parallel downloads
+        """
+        self.client = MatlibClient(host)
+        self.mirror_dir = mirror_dir
+        self.packages = packages
+        self.thumbnails = thumbnails
+        self.renders = renders
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self.stats = {'files': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+
+    def build(self, categories: Iterable[str] = (), collections: Iterable[str] = (), all_materials: bool = False):
+        """ Snapshot the catalog and the materials of the given categories and collections.
+
+        :param categories: category ids or titles
+        :param collections: collection ids or titles
+        :param all_materials: mirror every material of the catalog
+        :return: dict with file, byte and failure counts
+        """
+        start = time.perf_counter()
+
+        # Catalog listings are always refreshed, they are small and drive the browser.
+        categoryList = self._snapshot_list(self.client.categories, CATALOG_LIMIT)
+        self._snapshot_list(self.client.tags, CATALOG_LIMIT)
+        collectionList = self._snapshot_list(self.client.collections, CATALOG_LIMIT)
+        materialList = self._snapshot_list(self.client.materials, CATALOG_LIMIT)
+
+        if all_materials:
+            materials = materialList
+        else:
+            categoryIds = self._resolve_ids(categories, categoryList)
+            materials = [m for m in materialList if m["category"] in categoryIds]
+
+            for collectionId in self._resolve_ids(collections, collectionList):
+                materials += self._snapshot_list(
+                    self.client.materials, CATALOG_LIMIT, params={'collections': collectionId}
+                )
+
+        materials = list({m["id"]: m for m in materials}.values())
+        print("ML Log: mirroring {} materials into {}".format(len(materials), self.mirror_dir))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='RprUsdMirror') as executor:
+            for future in [executor.submit(self._mirror_material, m) for m in materials]:
+                future.result()
+
+        self.stats['seconds'] = time.perf_counter() - start
+        self._write_manifest(materials)
+        return self.stats
+
+    def _mirror_material(self, material: dict):
+        try:
+            self._snapshot(self.client.materials._get_by_id_url(material["id"]))
+            packageList = self._snapshot_list(
+                self.client.packages, PACKAGE_LIST_LIMIT, params={'material': material["id"]}
+            )
+
+            renderIds = material.get("renders_order") or []
+            if self.thumbnails and renderIds:
+                self._snapshot(self.client.renders.thumbnail_url(renderIds[0]), overwrite=False)
+            if self.renders and renderIds:
+                self._snapshot(self.client.renders.download_url(renderIds[0]), overwrite=False)
+            if self.packages:
+                for package in packageList:
+                    self._snapshot(self.client.packages.download_url(package["id"]), overwrite=False)
+        except Exception as e:
+            print("ML Log: ERROR: couldn't mirror material " + material["id"] + ": " + str(e))
+            with self._lock:
+                self.stats['failed'] += 1
+
+    def _snapshot_list(self, entity_client, limit: int, params: dict = None):
+        url = entity_client.get_list_url(limit=limit, offset=0, params=params)
+        with open(self._snapshot(url), 'rb') as file:
+            return json.loads(file.read().decode("utf-8"))['results']
+
+    def _snapshot(self, url: str, overwrite: bool = True):
+        """ Store the upstream response of URL at its mirror path and return that path. """
+        path = os.path.join(self.mirror_dir, *self.client.session.get_mirror_path(url).split('/'))
+        if not overwrite and os.path.isfile(path):
+            with self._lock:
+                self.stats['skipped'] += 1
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partPath = "{}.{}.part".format(path, threading.get_ident())
+        # Mirror files are stored decoded, static file servers and file:// can't negotiate encodings.
+        response = self.client.session.open_upstream(url)
+        size = 0
+        try:
+            with response, open(partPath, 'wb') as file:
+                while True:
+                    buf = response.read(1024 * 1024)
+                    if not buf:
+                        break
+                    file.write(buf)
+                    size += len(buf)
+            # Readers of a live mirror never see a partially written file.
+            os.replace(partPath, path)
+        finally:
+            if os.path.exists(partPath):
+                os.remove(partPath)
+
+        with self._lock:
+            self.stats['files'] += 1
+            self.stats['bytes'] += size
+        return path
+
+    def _write_manifest(self, materials):
+        manifest = {
+            'host': self.client.host,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'materials': sorted(m["id"] for m in materials),
+            'stats': self.stats,
+        }
+        with open(os.path.join(self.mirror_dir, 'mirror.json'), 'w') as file:
+            json.dump(manifest, file, indent=2)
+
+    @staticmethod
+    def _resolve_ids(names: Iterable[str], entities: list):
+        ids = set()
+        for name in names:
+            matches = [e["id"] for e in entities if name in (e["id"], e.get("title"))]
+            if not matches:
+                print("ML Log: WARNING: '" + name + "' was not found in the catalog")
+            ids.update(matches)
+        return ids
+
+
+def main(argv=None):
+    import webServerUrlHelper
+
+    parser = argparse.ArgumentParser(description="Snapshot the Web Material Library into a studio mirror")
+    parser.add_argument("mirror_dir", help="root directory of the mirror tree")
+    parser.add_argument("--category", action="append", default=[], help="category id or title, repeatable")
+    parser.add_argument("--collection", action="append", default=[], help="collection id or title, repeatable")
+    parser.add_argument("--all", action="store_true", help="mirror every material in the catalog")
+    parser.add_argument("--no-packages", action="store_true", help="mirror metadata and thumbnails only")
+    parser.add_argument("--renders", action="store_true", help="also mirror full-size preview renders")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--host", default=webServerUrlHelper.g_WebMatXServerUrl)
+    args = parser.parse_args(argv)
+
+    builder = MatlibMirrorBuilder(args.host, args.mirror_dir, packages=not args.no_packages,
+                                  renders=args.renders, max_workers=args.workers)
+    stats = builder.build(args.category, args.collection, all_materials=args.all)
+    print("ML Log: mirror done: {files} files ({bytes} bytes) written, {skipped} up to date, "
+          "{failed} failed in {seconds:.1f}s".format(**stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# Written into every extracted package directory so later runs can skip it.
+PACKAGE_MARKER_FILE = ".rprusd_package.json"
+
+# Extraction modes: everything (the default), or only the MaterialX documents and the files they reference.
+EXTRACT_ALL = "all"
+EXTRACT_REFERENCED = "referenced"
+EXTRACT_WORKERS = 4
+
+
+_SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# Characters zipfile replaces in member names on Windows.
+_WINDOWS_ILLEGAL = str.maketrans(':<>|"?*', '_' * 7)
+
+
+def package_size_key(package: Dict):
+    """ Sort key for packages based on their human-readable size string (i.e. "850 KB", "12.5 MB").
+
+    :param package: package record as returned by the packages endpoint
+    :return: size in bytes, 0 if the size string can't be parsed
+    """
+    return package_size_bytes(package) or 0
+
+
+def package_size_bytes(package: Dict) -> Optional[int]:
+    """ Package size in bytes from its size string ("850 KB", "12.5 MB"), None if it can't be parsed. """
+    match = re.match(r'\s*([\d.]+)\s*([KMG]?B)?', (package.get("size") or '').upper())
+    if not match:
+        return None
+    try:
+        return int(float(match.group(1)) * _SIZE_UNITS[match.group(2) or ''])
+    except ValueError:
+        return None
+
+
+def package_resolution(package: Dict) -> Optional[int]:
+    """ Texture resolution encoded in a package label ("1k", "2K", "4096"), None if unknown. """
+    match = re.search(r'(\d+)\s*([kK])?', package.get("label") or '')
+    if not match:
+        return None
+    value = int(match.group(1))
+    return value * 1024 if match.group(2) else value
+
+
+def choose_package(packages: List[Dict], rule: str = "largest", policy=None,
+                   bytes_per_second: float = None) -> Optional[Dict]:
+    """ Pick one package of a material by rule.
+
+    :param packages: package records of a material
+    :param rule: "smallest", "largest", "auto" or a resolution label such as "2k";
+        for a label the best package not exceeding that resolution is taken
+    :param policy: resolutionPolicy.ResolutionPolicy used by the "auto" rule, the defaults if None
+    :param bytes_per_second: measured download throughput used by the "auto" rule
+    :return: package record or None if the material has no packages
+    """
+    if not packages:
+        return None
+
+    if rule == "auto":
+        if policy is None:
+            from resolutionPolicy import ResolutionPolicy
+            policy = ResolutionPolicy()
+        return policy.choose(packages, bytes_per_second)
+
+    packages = sorted(packages, key=package_size_key)
+    if rule == "smallest":
+        return packages[0]
+    if rule == "largest":
+        return packages[-1]
+
+    for package in packages:
+        if (package.get("label") or '').lower() == rule.lower():
+            return package
+
+    wanted = package_resolution({"label": rule})
+    if wanted is None:
+        raise ValueError("Unknown package rule: " + rule)
+
+    fitting = [p for p in packages if (package_resolution(p) or 0) <= wanted]
+    return fitting[-1] if fitting else packages[0]
+
+
+def get_package_directory(package: Dict, target_dir: str):
+    return os.path.join(target_dir, os.path.splitext(package["file"])[0])
+
+
+def is_package_installed(package: Dict, target_dir: str):
+    markerPath = os.path.join(get_package_directory(package, target_dir), PACKAGE_MARKER_FILE)
+    try:
+        with open(markerPath, 'r') as file:
+            return json.load(file).get("id") == package["id"]
+    except (OSError, ValueError):
+        return False
+
+
+def get_content_store():
+    """ Content store configured by the RPRUSD_MATLIB_STORE environment variable, None if deduplication is off. """
+    root = os.environ.get("RPRUSD_MATLIB_STORE")
+    if not root:
+        return None
+
+    from contentStore import ContentStore
+    return ContentStore(root)
+
+
+def get_mtlx_references(document: bytes, document_path: str = '') -> List[str]:
+    """ Files a MaterialX document references through filename inputs.
+
+    :param document: content of the .mtlx file
+    :param document_path: path of the document inside the archive, references are relative to it
+    :return: normalized archive paths; they may contain <UDIM> or <UVTILE> tokens
+    """
+    import xml.etree.ElementTree as ElementTree
+
+    base = posixpath.dirname(document_path.replace('\\', '/'))
+    references = []
+
+    # fileprefix applies to the element and its descendants, the nearest one wins.
+    stack = [(ElementTree.fromstring(document), '')]
+    while stack:
+        element, prefix = stack.pop()
+        prefix = element.get("fileprefix", prefix)
+        value = element.get("value")
+        if element.tag == "input" and element.get("type") == "filename" and value:
+            # Absolute paths and URLs point outside the archive, with or without a prefix.
+            path = (prefix + value).replace('\\', '/')
+            if not any(item.startswith('/') or re.match(r'^\w+:', item) for item in (value.replace('\\', '/'), path)):
+                references.append(posixpath.normpath(posixpath.join(base, path)))
+        stack.extend((child, prefix) for child in element)
+    return references
+
+
+def select_members(zip_ref):
+    """ Members of a package archive its MaterialX documents need.
+
+    :param zip_ref: opened zipfile.ZipFile
+    :return: (members to extract, members skipped); everything is extracted
+        when the archive has no .mtlx document or one can't be parsed
+    """
+    files = [info for info in zip_ref.infolist() if not info.is_dir()]
+    documents = [info for info in files if info.filename.lower().endswith(".mtlx")]
+    if not documents:
+        return files, []
+
+    references = []
+    for info in documents:
+        try:
+            references += get_mtlx_references(zip_ref.read(info), info.filename)
+        except Exception as e:
+            print("ML Log: WARNING: couldn't read " + info.filename + ", extracting the whole package: " + str(e))
+            return files, []
+
+    # Archive names are compared case-insensitively, packages are authored on Windows.
+    byName = {info.filename.replace('\\', '/').lower(): info for info in files}
+    selected = {id(info): info for info in documents}
+    for reference in references:
+        if '<' in reference:
+            pattern = re.compile(re.escape(reference.lower()).replace(re.escape("<udim>"), r"\d{4}")
+                                 .replace(re.escape("<uvtile>"), r"u\d+_v\d+"))
+            matches = [info for name, info in byName.items() if pattern.fullmatch(name)]
+        else:
+            matches = [byName[reference.lower()]] if reference.lower() in byName else []
+
+        if not matches:
+            print("ML Log: WARNING: " + reference + " is referenced but not in the package")
+        for info in matches:
+            selected[id(info)] = info
+
+    members = [info for info in files if id(info) in selected]
+    skipped = [info for info in files if id(info) not in selected]
+    return members, skipped
+
+
+def get_member_path(info, target_dir: str) -> str:
+    """ Path ZipFile.extract writes an archive member to.
+
+    Like zipfile, drops drive letters and empty, "." and ".." components, and on
+    Windows replaces characters illegal in file names.
+    """
+    name = info.filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        name = name.replace(os.path.altsep, os.path.sep)
+    name = os.path.splitdrive(name)[1]
+    parts = [part for part in name.split(os.path.sep) if part not in ('', os.path.curdir, os.path.pardir)]
+    if os.path.sep == '\\':
+        parts = [part.translate(_WINDOWS_ILLEGAL).rstrip('.') for part in parts]
+        parts = [part for part in parts if part]
+    return os.path.join(target_dir, *parts)
+
+
+def extract_package(zip_ref, target_dir: str, mode: str = EXTRACT_ALL, store=None, package_id: str = None,
+                    max_workers: int = EXTRACT_WORKERS) -> Dict:
+    """ Extract a package archive, members in parallel.
+
+    :param zip_ref: opened zipfile.ZipFile
+    :param target_dir: package directory
+    :param mode: EXTRACT_ALL for everything, EXTRACT_REFERENCED for the .mtlx documents and the files they reference
+    :param store: optional contentStore.ContentStore
+    :param package_id: id of the package, recorded in the store manifest
+    :param max_workers: number of members extracted in parallel
+    :return: dict with extracted and skipped file counts and bytes
+    """
+    if mode == EXTRACT_REFERENCED:
+        members, skipped = select_members(zip_ref)
+    elif mode == EXTRACT_ALL:
+        members, skipped = [info for info in zip_ref.infolist() if not info.is_dir()], []
+    else:
+        raise ValueError("Unknown extraction mode: " + mode)
+
+    if store is not None:
+        store.extract_zip(zip_ref, target_dir, package_id, members, max_workers)
+    else:
+        # Directories first, so parallel extraction doesn't race on creating them.
+        for parent in {os.path.dirname(get_member_path(info, target_dir)) for info in members}:
+            os.makedirs(parent, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='RprUsdExtract') as executor:
+            for future in [executor.submit(zip_ref.extract, info, target_dir) for info in members]:
+                future.result()
+
+    return {
+        'files': len(members),
+        'bytes': sum(info.file_size for info in members),
+        'skipped_files': len(skipped),
+        'skipped_bytes': sum(info.file_size for info in skipped),
+    }
+
+
+def install_package(client, package: Dict, target_dir: str, callback: Callable = None, store=None,
+                    mode: str = EXTRACT_ALL, report: Dict = None):
+    """ Download a package archive, extract it into <target_dir>/<package name>/ and remove the archive.
+
+    :param client: MatlibClient
+    :param package: package record as returned by the packages endpoint
+    :param target_dir: directory receiving the extracted package
+    :param callback: download progress callback(size, length), return False to cancel
+    :param store: optional contentStore.ContentStore; files are then stored once and linked into the package
+    :param mode: extraction mode, see extract_package
+    :param report: optional dict receiving the extraction report of extract_package
+    :return: path of the extracted package directory
+    """
+    import zipfile
+
+    os.makedirs(target_dir, exist_ok=True)
+    client.packages.download(package["id"], callback, target_dir, package["file"])
+
+    zipFileName = os.path.join(target_dir, package["file"])
+    fullPathToExtract = get_package_directory(package, target_dir)
+    os.makedirs(fullPathToExtract, exist_ok=True)
+
+    try:
+        with zipfile.ZipFile(zipFileName, 'r') as zip_ref:
+            stats = extract_package(zip_ref, fullPathToExtract, mode, store, package["id"])
+    finally:
+        os.remove(zipFileName)
+
+    if stats['skipped_files']:
+        print("ML Log: extracted {} files of {}, skipped {} unreferenced files ({} bytes)".format(
+            stats['files'], package["file"], stats['skipped_files'], stats['skipped_bytes']))
+    if report is not None:
+        report.update(stats)
+
+    with open(os.path.join(fullPathToExtract, PACKAGE_MARKER_FILE), 'w') as file:
+        json.dump({"id": package["id"], "material": package.get("material"), "label": package.get("label"),
+                   "extract": mode}, file)
+
+    return fullPathToExtract
@@ -0,0 +1,213 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Headless bulk download of Web Material Library packages, i.e. to pre-warm
+render farm nodes before a job starts. Needs no Maya UI:
+
+    mayapy matlibPrefetch.py D:/matlib --category Metals --resolution 2k --workers 8
+    mayapy matlibPrefetch.py D:/matlib --collection "Studio Basics" --tag wood
+    mayapy matlibPrefetch.py D:/matlib --id <material id> --id <material id>
+    mayapy matlibPrefetch.py D:/matlib --category Wood --resolution auto --time-budget 60
+    mayapy matlibPrefetch.py D:/matlib --category Wood --translate
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+import matlibPackages
+import resolutionPolicy
+
+CATALOG_LIMIT = 10000
+PACKAGE_LIST_LIMIT = 100
+
+
+class MatlibPrefetcher:
+
+    def __init__(self, client, target_dir: str, rule: str = "largest", max_workers: int = 4, store=None,
+                 policy=None, extract_mode: str = matlibPackages.EXTRACT_ALL, layer_cache=None):
+        """
+        :param client: MatlibClient
+        :param target_dir: directory receiving the extracted packages
+        :param rule: package rule passed to matlibPackages.choose_package
+        :param max_workers: number of packages downloaded and extracted in parallel
+        :param store: optional contentStore.ContentStore deduplicating extracted files
+        :param policy: resolutionPolicy.ResolutionPolicy of the "auto" rule, the defaults if None
+        :param extract_mode: matlibPackages extraction mode
+        :param layer_cache: optional mtlxLayerCache.MtlxLayerCache receiving USD translations of the packages
+        """
+        self.client = client
+        self.target_dir = target_dir
+        self.rule = rule
+        self.max_workers = max_workers
+        self.store = store
+        self.policy = policy
+        self.extract_mode = extract_mode
+        self.layer_cache = layer_cache
+        self._lock = threading.Lock()
+        self.stats = {'downloaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'unextracted_bytes': 0, 'seconds': 0.0}
+
+    def resolve_materials(self, categories: Iterable[str] = (), collections: Iterable[str] = (),
+                          tags: Iterable[str] = (), ids: Iterable[str] = ()) -> List[Dict]:
+        """ Resolve category, collection and tag ids or titles and material ids to material records. """
+        materials = []
+
+        # Categories and tags are matched here like matlibMirror does, a listing parameter the server
+        # ignores would otherwise prefetch the whole library.
+        categoryIds = self._resolve_ids(categories, self.client.categories)
+        tagIds = self._resolve_ids(tags, self.client.tags)
+        if categoryIds or tagIds:
+            for material in self.client.materials.get_list(CATALOG_LIMIT, 0):
+                if material.get("category") in categoryIds or tagIds.intersection(material.get("tags") or ()):
+                    materials.append(material)
+
+        for collectionId in self._resolve_ids(collections, self.client.collections):
+            listed = self.client.materials.get_list(CATALOG_LIMIT, 0, params={'collections': collectionId})
+            members = [m for m in listed if collectionId in (m.get("collections") or ())]
+            if len(members) < len(listed):
+                print("ML Log: WARNING: skipping {} materials the server listed for collection {} "
+                      "without them being in it".format(len(listed) - len(members), collectionId))
+            materials += members
+
+        for materialId in ids:
+            materials.append(self.client.materials.get(materialId))
+
+        return list({m["id"]: m for m in materials}.values())
+
+    def run(self, materials: List[Dict]):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='RprUsdPrefetch') as executor:
+            for future in [executor.submit(self._prefetch_material, m) for m in materials]:
+                future.result()
+
+        self.stats['seconds'] = time.perf_counter() - start
+        return self.stats
+
+    def _prefetch_material(self, material: Dict):
+        try:
+            packages = self.client.packages.get_list(limit=PACKAGE_LIST_LIMIT, offset=0, params={'material': material["id"]})
+            package = matlibPackages.choose_package(packages, self.rule, self.policy,
+                                                    self.client.session.throughput.get_bytes_per_second())
+            if package is None:
+                print("ML Log: WARNING: material '" + material["title"] + "' has no packages")
+                return
+
+            if matlibPackages.is_package_installed(package, self.target_dir):
+                self._count('skipped')
+                self._translate(matlibPackages.get_package_directory(package, self.target_dir))
+                return
+
+            received = [0]
+
+            def progress(size, length):
+                received[0] = size
+                return True
+
+            report = dict()
+            path = matlibPackages.install_package(self.client, package, self.target_dir, progress, self.store,
+                                                  self.extract_mode, report)
+            self._count('downloaded', received[0], report.get('skipped_bytes', 0))
+            print("ML Log: downloaded " + package["file"])
+            self._translate(path)
+        except Exception as e:
+            print("ML Log: ERROR: couldn't download material '" + material.get("title", material["id"]) + "': " + str(e))
+            self._count('failed')
+
+    def _translate(self, package_dir: str):
+        # Runs on the prefetch worker; translations already in the cache are only hashed.
+        if self.layer_cache is not None:
+            self.layer_cache.translate_package(package_dir, wait=True)
+
+    def _count(self, key: str, size: int = 0, unextracted: int = 0):
+        with self._lock:
+            self.stats[key] += 1
+            self.stats['bytes'] += size
+            self.stats['unextracted_bytes'] += unextracted
+
+    @staticmethod
+    def _resolve_ids(names: Iterable[str], entity_client):
+        names = list(names)
+        if not names:
+            return set()
+
+        entities = entity_client.get_list(CATALOG_LIMIT, 0)
+        ids = set()
+        for name in names:
+            matches = [e["id"] for e in entities if name in (e["id"], e.get("title"))]
+            if not matches:
+                print("ML Log: WARNING: '" + name + "' was not found in the catalog")
+            ids.update(matches)
+        return ids
+
+
+def main(argv=None):
+    import webServerUrlHelper
+
+    parser = argparse.ArgumentParser(description="Download Web Material Library packages without the Maya UI")
+    parser.add_argument("target_dir", help="directory receiving the extracted packages")
+    parser.add_argument("--category", action="append", default=[], help="category id or title, repeatable")
+    parser.add_argument("--collection", action="append", default=[], help="collection id or title, repeatable")
+    parser.add_argument("--tag", action="append", default=[], help="tag id or title, repeatable")
+    parser.add_argument("--id", action="append", default=[], help="material id, repeatable")
+    parser.add_argument("--ids-file", help="file with one material id per line")
+    parser.add_argument("--resolution", default="largest",
+                        help="'smallest', 'largest', 'auto' or a resolution label such as 2k (default: largest); "
+                             "'auto' picks the highest resolution fitting the download budgets")
+    parser.add_argument("--workers", type=int, default=4, help="parallel downloads (default: 4)")
+    parser.add_argument("--store", help="content-addressed store directory; identical files are stored once "
+                                        "and hard-linked into the packages (default: RPRUSD_MATLIB_STORE)")
+    parser.add_argument("--extract", choices=(matlibPackages.EXTRACT_ALL, matlibPackages.EXTRACT_REFERENCED),
+                        default=matlibPackages.EXTRACT_ALL,
+                        help="extract all files, or only the .mtlx documents and the files they reference "
+                             "(default: all)")
+    parser.add_argument("--translate", action="store_true",
+                        help="also translate the .mtlx documents to USD layers in the MaterialX layer cache "
+                             "(RPRUSD_MTLX_LAYER_CACHE) so binding them needs no MaterialX parse "
+                             "(needs the USD Python bindings)")
+    resolutionPolicy.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    ids = list(args.id)
+    if args.ids_file:
+        with open(args.ids_file, 'r') as file:
+            ids += [line.strip() for line in file if line.strip()]
+
+    store = matlibPackages.get_content_store()
+    if args.store:
+        from contentStore import ContentStore
+        store = ContentStore(args.store)
+
+    layerCache = None
+    if args.translate:
+        import mtlxLayerCache
+        layerCache = mtlxLayerCache.getMtlxLayerCache()
+
+    prefetcher = MatlibPrefetcher(webServerUrlHelper.createMatlibClient(), args.target_dir,
+                                  rule=args.resolution, max_workers=args.workers, store=store,
+                                  policy=resolutionPolicy.policy_from_arguments(args), extract_mode=args.extract,
+                                  layer_cache=layerCache)
+    materials = prefetcher.resolve_materials(args.category, args.collection, args.tag, ids)
+    print("ML Log: prefetching {} materials into {}".format(len(materials), args.target_dir))
+
+    stats = prefetcher.run(materials)
+    throughput = stats['bytes'] / max(stats['seconds'], 1e-6) / (1024 * 1024)
+    print("ML Log: prefetch done: {downloaded} downloaded, {skipped} already present, {failed} failed, "
+          "{bytes} bytes in {seconds:.1f}s".format(**stats) + " ({:.2f} MB/s), ".format(throughput) +
+          "{unextracted_bytes} unreferenced bytes not extracted".format(**stats))
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
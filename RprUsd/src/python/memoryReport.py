@@ -0,0 +1,293 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Opt-in memory accounting for the material browser.
+
+Tracing is off unless RPRUSD_MEMORY_TRACE is set or start() is called. While
+tracing, the browser marks its phases (show, catalog, layout, populate) and
+each mark records tracemalloc totals and the allocations of the RprUsd
+scripts that grew since the previous mark. The report also works without
+tracing and adds per-structure sizes of the catalog, cache byte totals, the
+widgets of the browser window and live counts of the objects which leak when
+a window isn't released:
+
+    import memoryReport
+    memoryReport.start()
+    ... open the browser a few times ...
+    memoryReport.printReport()
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import weakref
+from typing import Dict
+
+MAX_PHASES = 200
+TOP_ALLOCATIONS = 10
+
+# Objects counted by live_objects(); more than one browser or catalog alive points at a leak.
+TRACKED_TYPES = ("RPRMaterialBrowser", "RPRLightBrowser", "MatlibCatalog", "UiScheduler", "CatalogService")
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_phases = []
+_lastSnapshot = None
+_browser = None
+
+
+def start(frames: int = 1):
+    """ Start tracing allocations; phases are recorded from now on. """
+    global _lastSnapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _lastSnapshot = None
+    del _phases[:]
+
+
+def stop():
+    global _lastSnapshot
+    _lastSnapshot = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def mark(phase: str):
+    """ Record the traced memory at the end of a phase. Does nothing unless tracing. """
+    global _lastSnapshot
+    if not tracemalloc.is_tracing():
+        return
+
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, SCRIPTS_DIR + os.sep + "*")])
+
+    top = []
+    if _lastSnapshot is not None:
+        for stat in snapshot.compare_to(_lastSnapshot, 'lineno')[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            top.append((os.path.basename(frame.filename) + ":" + str(frame.lineno), stat.size_diff, stat.size))
+    _lastSnapshot = snapshot
+
+    _phases.append({'phase': phase, 'time': time.time(), 'current': current, 'peak': peak, 'top': top})
+    del _phases[:-MAX_PHASES]
+
+
+def get_phases():
+    return list(_phases)
+
+
+def track(browser):
+    """ Remember the latest browser window without keeping it alive. """
+    global _browser
+    _browser = weakref.ref(browser)
+
+
+def deep_size(obj, seen: set) -> int:
+    """ Bytes of an object and everything it contains that isn't in `seen` yet; adds what it counts to `seen`. """
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+def measure_catalog(catalog) -> Dict[str, Dict]:
+    """ Count and bytes per catalog structure.
+
+    Structures are measured in order and objects are counted once, so the
+    indexes only account for their own containers and not for the records
+    already counted under materials.
+    """
+    orders, permutations = catalog.get_sort_caches()
+    structures = [
+        ('materials', catalog.materials),
+        ('categories', catalog.categories),
+        ('tags', catalog.tags),
+        ('materialDict', catalog.materialDict),
+        ('materialByCategory', catalog.materialByCategory),
+        ('categoryDict', catalog.categoryDict),
+        ('tagDict', catalog.tagDict),
+        ('sortOrders', orders),
+        ('sortPermutations', permutations),
+    ]
+
+    seen = set()
+    result = dict()
+    for name, value in structures:
+        result[name] = {'count': len(value), 'bytes': deep_size(value, seen)}
+    return result
+
+
+def directory_size(path: str, pattern_suffix: str = None, recursive: bool = True):
+    """ Number of files and their total bytes under a directory. """
+    files = 0
+    size = 0
+    for root, dirs, names in os.walk(path):
+        if not recursive:
+            dirs[:] = []
+        for name in names:
+            if pattern_suffix and not name.endswith(pattern_suffix):
+                continue
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+                files += 1
+            except OSError:
+                pass
+    return {'files': files, 'bytes': size}
+
+
+def measure_caches(service) -> Dict[str, Dict]:
+    """ Disk and memory held by the caches of a catalog service.
+
+    Caches the session didn't use yet are skipped, measuring must not create them.
+    """
+    result = {
+        'thumbnails': directory_size(service.cache_dir, ".png", recursive=False),
+        'catalogSnapshots': directory_size(service.cache_dir, ".json", recursive=False),
+        'previews': directory_size(os.path.join(service.cache_dir, "Previews")),
+    }
+
+    atlasStore = service.get_atlas_store()
+    if atlasStore is not None:
+        result['atlases'] = directory_size(atlasStore.atlas_dir)
+        result['atlasTiles'] = directory_size(atlasStore.tile_dir)
+
+    packageCache = service.get_package_cache()
+    if packageCache is not None:
+        lists = packageCache.get_all_cached()
+        result['packageLists'] = {'count': len(lists), 'bytes': deep_size(lists, set())}
+    return result
+
+
+def count_widgets(window: str = "RPRMaterialBrowserWindow") -> Dict[str, int]:
+    """ Live controls and layouts of a Maya window, and the cells of the material grid. """
+    import maya.cmds as cmds
+
+    result = {'window': 0, 'controls': 0, 'layouts': 0, 'gridCells': 0}
+    if not cmds.window(window, exists=True):
+        return result
+
+    prefix = window + "|"
+    result['window'] = 1
+    result['controls'] = sum(1 for c in cmds.lsUI(controls=True, long=True) or [] if c.startswith(prefix))
+    result['layouts'] = sum(1 for c in cmds.lsUI(controlLayouts=True, long=True) or [] if c.startswith(prefix))
+    if cmds.layout("RPRMaterialsFlow", exists=True):
+        result['gridCells'] = cmds.layout("RPRMaterialsFlow", query=True, numberOfChildren=True) or 0
+    return result
+
+
+def live_objects(type_names=TRACKED_TYPES) -> Dict[str, int]:
+    """ Instances of the tracked classes reachable by the garbage collector. """
+    counts = dict.fromkeys(type_names, 0)
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in counts:
+            counts[name] += 1
+    return counts
+
+
+def collect(service=None, browser=None) -> Dict:
+    """ Gather the whole report. Maya-only sections are skipped outside Maya. """
+    import catalogService
+
+    if service is None:
+        service = catalogService.g_CatalogService
+    if browser is None and _browser is not None:
+        browser = _browser()
+
+    report = {'time': time.time(), 'tracing': tracemalloc.is_tracing(), 'phases': get_phases()}
+    if tracemalloc.is_tracing():
+        report['traced'], report['tracedPeak'] = tracemalloc.get_traced_memory()
+
+    catalog = service.get_catalog() if service is not None else None
+    if catalog is not None:
+        report['catalog'] = measure_catalog(catalog)
+    if service is not None:
+        report['caches'] = measure_caches(service)
+
+    if 'maya.cmds' in sys.modules:
+        widgets = count_widgets()
+        if browser is not None:
+            # Maya doesn't report image memory; assume one decoded RGBA icon per grid cell.
+            widgets['decodedThumbnailBytes'] = widgets['gridCells'] * browser.iconSize * browser.iconSize * 4
+        report['widgets'] = widgets
+
+    report['liveObjects'] = live_objects()
+    return report
+
+
+def format_bytes(size: int):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return "{:.0f} {}".format(size, unit) if unit == "B" else "{:.1f} {}".format(size, unit)
+        size /= 1024.0
+    return "{:.1f} GB".format(size)
+
+
+def format_report(report: Dict) -> str:
+    lines = ["RprUsd memory report, " + time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['time']))]
+
+    if report['tracing']:
+        lines.append("traced: {} (peak {})".format(format_bytes(report['traced']), format_bytes(report['tracedPeak'])))
+        for phase in report['phases']:
+            lines.append("  {:<24} {:>10}".format(phase['phase'], format_bytes(phase['current'])))
+            for location, diff, size in phase['top']:
+                lines.append("      {:<32} {:>+10} -> {}".format(location, diff, format_bytes(size)))
+    else:
+        lines.append("tracing off, call memoryReport.start() or set RPRUSD_MEMORY_TRACE to record phases")
+
+    for section in ('catalog', 'caches'):
+        if section not in report:
+            continue
+        lines.append(section + ":")
+        for name, values in report[section].items():
+            amount = values.get('count', values.get('files'))
+            lines.append("  {:<20} {:>8} {:>12}".format(name, amount, format_bytes(values['bytes'])))
+
+    if 'widgets' in report:
+        lines.append("widgets:")
+        for name, value in report['widgets'].items():
+            lines.append("  {:<20} {:>8}".format(name, format_bytes(value) if name.endswith('Bytes') else value))
+
+    lines.append("live objects:")
+    for name, count in report['liveObjects'].items():
+        lines.append("  {:<20} {:>8}".format(name, count))
+    return "\n".join(lines)
+
+
+def printReport(path: str = None):
+    """ Print the report to the script editor, and write it to `path` if given. """
+    text = format_report(collect())
+    for line in text.splitlines():
+        print("ML Log: " + line)
+
+    if path:
+        with open(path, 'w') as file:
+            file.write(text + "\n")
+    return text
+
+
+if os.environ.get("RPRUSD_MEMORY_TRACE"):
+    start()
@@ -11,16 +11,13 @@
 # limitations under the License.
 
 
-import maya.cmds
-import maya.mel
-import os
-import maya.mel as mel
-import ufe
+# This module is imported on every plugin load, including batch sessions which
+# never open a browser. Keep module level work limited to menu registration and
+# import anything heavier inside the menu commands that use it.
 
-import winreg
-import subprocess
+import maya.cmds
 
-mel.eval("source loadUsdStageForSharing.mel")
+g_SceneReadJob = None
 
 def ShowRPRMaterialXLibrary(value) :
     import rprMaterialXBrowser
@@ -30,7 +27,41 @@ def ShowLightBrowser(value) :
     import rprLightBrowser
     rprLightBrowser.show()
 
+def ShowDownloadPanel(value) :
+    import rprDownloadPanel
+    rprDownloadPanel.show()
+
+def ExportMaterialBundle(value) :
+    import maya.OpenMaya
+    import mayaUsd.ufe
+    import matlibBundle
+    import matlibPackages
+    import webServerUrlHelper
+
+    proxyShapes = maya.cmds.ls(type="mayaUsdProxyShape", long=True)
+    if not proxyShapes :
+        maya.OpenMaya.MGlobal.displayError("RprUsd: USD stage does not exist!")
+        return
+
+    ret = maya.cmds.fileDialog2(cap="Select Bundle Directory", fm=3)
+    if ret is None :
+        return
+
+    # Without the override layer in the stage, renders still resolve gpuopen:// over the network.
+    answer = maya.cmds.confirmDialog(title="Export Material Bundle",
+                                     message="Insert the bundle's override layer into the stage so renders use the local materials?",
+                                     button=["Insert", "Don't Insert"], defaultButton="Insert",
+                                     cancelButton="Don't Insert", dismissString="Don't Insert")
+
+    exporter = matlibBundle.MatlibBundleExporter(webServerUrlHelper.createMatlibClient(), ret[0],
+                                                 store=matlibPackages.get_content_store())
+    exporter.export(mayaUsd.ufe.getStage(proxyShapes[0]), insert_override=(answer == "Insert"))
+    print("ML Log: bundle done: {materials} materials, {downloaded} downloaded, {reused} reused, "
+          "{failed} failed in {seconds:.1f}s".format(**exporter.stats))
+
 def BindMaterialXFromFile(value) :
+    import maya.OpenMaya
+    import ufe
 
     gsel = ufe.GlobalSelection.get()
     if gsel.empty() : 
@@ -50,13 +81,31 @@ def BindMaterialXFromFile(value) :
     filePath = ret[0]
     maya.cmds.optionVar(sv=(optionVarNameRecentDirectory, filePath))
 
+    # Load the cached USD translation of the document, with its material name the command skips parsing it.
+    # The scene references the document itself either way.
+    import mtlxLayerCache
+    materialName = mtlxLayerCache.getMtlxLayerCache().prepare_bind(filePath)
+
     pathList = list(gsel)    
     while len(pathList) > 0 :
         selected_path = str(pathList.pop().path())
         selected_path = selected_path[selected_path.find("/"):len(selected_path)]
-        maya.cmds.rprUsdBindMtlx(pp=selected_path, mp=filePath)
+        if materialName :
+            maya.cmds.rprUsdBindMtlx(pp=selected_path, mp=filePath, mn=materialName)
+        else :
+            maya.cmds.rprUsdBindMtlx(pp=selected_path, mp=filePath)
 
 def createRprUsdMenu():
+    global g_SceneReadJob
+
+    # Only defines procs. rprUsdOpenStudioStage -fp calls RprUsd_DoCreateStage from it, so it is needed without the menu too.
+    import maya.mel
+    maya.mel.eval("source loadUsdStageForSharing.mel")
+
+    # Scenes opened later, batch renders included, compose cached MaterialX translations instead of translating.
+    if g_SceneReadJob is None :
+        g_SceneReadJob = maya.cmds.scriptJob(event=("PostSceneRead", _registerMtlxLayers))
+
     if not maya.cmds.menu("rprUsdMenuCtrl", exists=1):
         gMainWindow = "MayaWindow"
         rprUsdMenuCtrl = maya.cmds.menu("rprUsdMenuCtrl", label="RPR USD", p=gMainWindow)
@@ -65,15 +114,45 @@ def createRprUsdMenu():
         maya.cmds.menuItem("loadUsdForSharing",label="Load Usd Stage For Sharing", p=rprUsdMenuCtrl, c=LoadUsdStageForSharing)
         maya.cmds.menuItem("runRenderStudio",label="Run RenderStudio", p=rprUsdMenuCtrl, c=RunRenderStudio)
         maya.cmds.menuItem("lightBrowserCtrl",label="Light Browser", p=rprUsdMenuCtrl, c=ShowLightBrowser)
+        maya.cmds.menuItem("downloadPanelCtrl",label="Downloads", p=rprUsdMenuCtrl, c=ShowDownloadPanel)
+        maya.cmds.menuItem("exportMaterialBundleCtrl",label="Export Offline Material Bundle", p=rprUsdMenuCtrl, c=ExportMaterialBundle)
+
+    # Load the material library catalog in the background once Maya is idle.
+    # Batch renders never browse, and the catalog modules are only imported once deferred.
+    if not maya.cmds.about(batch=True) :
+        from maya.utils import executeDeferred
+        executeDeferred(_warmUpCatalog)
+
+def _warmUpCatalog() :
+    import catalogService
+    catalogService.warmUp()
+
+def _registerMtlxLayers() :
+    try :
+        import mtlxLayerCache
+        mtlxLayerCache.registerSceneDocuments()
+    except Exception as e :
+        print("ML Log: WARNING: couldn't load cached MaterialX translations: " + str(e))
 
 def LoadUsdStageForSharing(value):  
+    import maya.mel as mel
     mel.eval("RprUsd_CreateStageFromFile();")
 
 def removeRprUsdMenu():
+    global g_SceneReadJob
+
     if maya.cmds.menu("rprUsdMenuCtrl", exists=1):
         maya.cmds.deleteUI("rprUsdMenuCtrl")
 
+    if g_SceneReadJob is not None :
+        if maya.cmds.scriptJob(exists=g_SceneReadJob) :
+            maya.cmds.scriptJob(kill=g_SceneReadJob, force=True)
+        g_SceneReadJob = None
+
 def RunRenderStudio(value) :
+    import winreg
+    import subprocess
+
     try:
         key = winreg.OpenKeyEx(winreg.HKEY_LOCAL_MACHINE, "SOFTWARE\\AMD\\RenderStudio")
         renderStudioExecPath = winreg.QueryValueEx(key, "ExecCmd")[0]
@@ -0,0 +1,465 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cache of MaterialX documents translated to USD.
+
+rprUsdBindMtlx references a .mtlx file through USD's MaterialX file format
+plugin, which parses and translates the document every time a stage opens it.
+The cache runs that translation once and keeps the result as a .usdc layer,
+keyed by the document content, its directory and the USD and MaterialX
+versions. Scenes keep referencing the document itself: before binding, the
+cached layer is handed to USD's layer registry under the document's path, so
+stages of this session compose it without translating, while farm nodes and
+other artists resolve the document as usual. Passing the material name also
+spares the command its own parse of the document.
+
+    materialName = getMtlxLayerCache().prepare_bind(mtlxPath)
+
+Scenes opened later, including farm renders, get the same treatment: after
+Maya reads a scene, the documents its USD layers reference are registered
+from the cache before the proxy shapes compose their stages.
+
+The cache lives in the per-user RprUsd directory unless RPRUSD_MTLX_LAYER_CACHE
+points it elsewhere, i.e. at a shared studio directory. Least recently used
+layers are evicted once the cache outgrows its size limit.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import sharedCache
+
+# Bump when the translation or the layer post-processing changes, older layers are then ignored.
+TRANSLATION_VERSION = 2
+
+# Size the cache is trimmed to after each translation.
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Root prim of the MaterialX file format plugin output; rprUsdBindMtlx references it.
+MATERIALX_ROOT = "/MaterialX"
+MATERIALS_SCOPE = MATERIALX_ROOT + "/Materials"
+
+g_MtlxLayerCache = None
+
+
+def get_versions() -> Dict[str, str]:
+    """ Versions the translated layers depend on. """
+    from pxr import Usd
+
+    versions = {'usd': '.'.join(str(v) for v in Usd.GetVersion()), 'translation': str(TRANSLATION_VERSION)}
+    try:
+        import MaterialX
+        versions['materialx'] = MaterialX.getVersionString()
+    except (ImportError, AttributeError):
+        # USD built with MaterialX support but without its Python bindings; the USD version pins it in practice.
+        versions['materialx'] = 'unknown'
+    return versions
+
+
+def get_material_names(mtlx_path: str) -> List[str]:
+    """ Names of the materials of a MaterialX document in document order.
+
+    The first one is what rprUsdBindMtlx binds without a material name (getMaterialNodes()[0]).
+    """
+    import xml.etree.ElementTree as ElementTree
+
+    root = ElementTree.parse(mtlx_path).getroot()
+    return [element.get("name") for element in root if element.get("type") == "material" and element.get("name")]
+
+
+def translate(mtlx_path: str, layer_path: str) -> List[str]:
+    """ Translate a MaterialX document to a USD layer with absolute asset paths.
+
+    :param mtlx_path: .mtlx file
+    :param layer_path: layer file to write, its extension selects the USD file format
+    :return: names of the materials in document order
+    """
+    from pxr import Sdf
+
+    materialNames = get_material_names(mtlx_path)
+    if not materialNames:
+        raise RuntimeError(mtlx_path + " defines no material")
+
+    # Not FindOrOpen: a layer the session already opened would hold the document as it was back then.
+    source = Sdf.Layer.OpenAsAnonymous(mtlx_path)
+    if source is None:
+        raise RuntimeError("USD couldn't open " + mtlx_path)
+    if not source.GetPrimAtPath(MATERIALS_SCOPE):
+        raise RuntimeError(mtlx_path + " has no " + MATERIALS_SCOPE + " prim after translation")
+
+    layer = Sdf.Layer.CreateAnonymous(".usdc")
+    layer.TransferContent(source)
+    make_asset_paths_absolute(layer, os.path.dirname(os.path.abspath(mtlx_path)))
+
+    layer.customLayerData = dict(layer.customLayerData, rprUsdMtlxSource=os.path.abspath(mtlx_path))
+    if not layer.Export(layer_path):
+        raise RuntimeError("couldn't write " + layer_path)
+    return materialNames
+
+
+def make_asset_paths_absolute(layer, base_dir: str):
+    """ Resolve the relative asset paths of `layer` against `base_dir`. """
+    from pxr import Sdf
+
+    def absolute(path):
+        # Leave empty, absolute and URI-like paths alone.
+        if not path or os.path.isabs(path) or re.match(r'^\w{2,}:', path):
+            return path
+        return os.path.normpath(os.path.join(base_dir, path)).replace('\\', '/')
+
+    def visit(path):
+        if not path.IsPropertyPath():
+            return
+        spec = layer.GetAttributeAtPath(path)
+        if spec is None or not spec.HasDefaultValue():
+            return
+        value = spec.default
+        if isinstance(value, Sdf.AssetPath):
+            spec.default = Sdf.AssetPath(absolute(value.path))
+        elif isinstance(value, Sdf.AssetPathArray):
+            spec.default = Sdf.AssetPathArray([Sdf.AssetPath(absolute(item.path)) for item in value])
+
+    layer.Traverse(layer.pseudoRoot.path, visit)
+
+
+class MtlxLayerCache:
+
+    def __init__(self, cache_dir: str, max_workers: int = 1, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param cache_dir: directory receiving the translated layers
+        :param max_workers: number of background translations, see translate_async
+        :param max_bytes: size the cache is trimmed to after a translation, None to keep every layer
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self._versions = None
+        self._lock = threading.Lock()
+        self._executor = None
+        # Layers handed to USD's registry by document path, with their cache keys; see load_layer.
+        self._layers = dict()
+        # Sublayers opened by register_documents, kept so the stage doesn't parse them again.
+        self._sceneLayers = []
+
+    def get_key(self, mtlx_path: str) -> str:
+        """ Cache key of a document: its content, its directory (baked into asset paths) and the versions.
+
+        Documents pulled in with xi:include aren't part of the key; packages don't use them.
+        """
+        if self._versions is None:
+            self._versions = get_versions()
+
+        digest = hashlib.sha256()
+        with open(mtlx_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(os.path.dirname(os.path.realpath(mtlx_path)).encode("utf-8"))
+        digest.update(json.dumps(self._versions, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_layer_path(self, key: str):
+        return os.path.join(self.cache_dir, key[:2], key + ".usdc")
+
+    def lookup(self, mtlx_path: str) -> Optional[Dict]:
+        """ Cached entry of a document ({'layer', 'materials'}) without translating, None on a miss. """
+        layerPath = self.get_layer_path(self.get_key(mtlx_path))
+        return self._read_entry(layerPath)
+
+    def get(self, mtlx_path: str) -> Dict:
+        """ Cached entry of a document, translating it on a miss. Raises if the translation fails. """
+        layerPath = self.get_layer_path(self.get_key(mtlx_path))
+        entry = self._read_entry(layerPath)
+        if entry is not None:
+            self._touch(layerPath)
+            return entry
+
+        os.makedirs(os.path.dirname(layerPath), exist_ok=True)
+
+        def fetch(partPath):
+            # USD picks the file format by extension, so export under a .usdc name and move it onto the part file.
+            exportPath = partPath + ".usdc"
+            sidecarPath = partPath + ".json"
+            try:
+                materials = translate(mtlx_path, exportPath)
+                with open(sidecarPath, 'w') as file:
+                    json.dump({'source': os.path.abspath(mtlx_path), 'materials': materials}, file)
+                # The sidecar goes in place first, readers treat a layer without one as a miss.
+                sharedCache.replace(sidecarPath, layerPath + ".json")
+                os.replace(exportPath, partPath)
+            finally:
+                for path in (exportPath, sidecarPath):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        sharedCache.single_flight(layerPath, fetch)
+
+        entry = self._read_entry(layerPath)
+        if entry is None:
+            raise RuntimeError("translated layer of " + mtlx_path + " is missing")
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes, keep=layerPath)
+        return entry
+
+    def prepare_bind(self, mtlx_path: str) -> Optional[str]:
+        """ Load the translation of a document for rprUsdBindMtlx and return the material name to bind.
+
+        The command still gets the document path, so the scene stays portable.
+
+        :return: first material in document order, None if the document can't be read
+        """
+        try:
+            entry = self.get(mtlx_path)
+            self.load_layer(mtlx_path, entry['layer'])
+            return entry['materials'][0]
+        except Exception as e:
+            print("ML Log: WARNING: binding " + mtlx_path + " untranslated: " + str(e))
+
+        try:
+            return next(iter(get_material_names(mtlx_path)), None)
+        except Exception:
+            return None
+
+    def load_layer(self, mtlx_path: str, layer_path: str):
+        """ Register a translated layer in USD under the document's path.
+
+        Stages referencing the document then compose the registered layer instead
+        of translating the file. The layer is locked, it must never be saved over
+        the document. Kept alive for the session; a changed document is reloaded
+        into it.
+        """
+        from pxr import Sdf
+
+        identifier = os.path.abspath(mtlx_path).replace('\\', '/')
+        key = os.path.basename(layer_path)
+        with self._lock:
+            registered = self._layers.get(identifier)
+        if registered is not None and registered[0] == key:
+            return registered[1]
+
+        layer = Sdf.Layer.Find(identifier)
+        if layer is not None and registered is None:
+            # USD already translated the document itself.
+            return layer
+
+        if layer is None:
+            fileFormat = Sdf.FileFormat.FindByExtension(os.path.splitext(mtlx_path)[1].lstrip('.'))
+            if fileFormat is None:
+                raise RuntimeError("USD has no file format plugin for " + mtlx_path)
+            layer = Sdf.Layer.New(fileFormat, identifier)
+
+        translated = Sdf.Layer.OpenAsAnonymous(layer_path)
+        if translated is None:
+            raise RuntimeError("USD couldn't open " + layer_path)
+        layer.SetPermissionToEdit(True)
+        layer.TransferContent(translated)
+        layer.SetPermissionToEdit(False)
+        layer.SetPermissionToSave(False)
+
+        with self._lock:
+            self._layers[identifier] = (key, layer)
+        return layer
+
+    def register_documents(self, layers: Iterable, extensions: Iterable[str] = (".mtlx",)) -> List[str]:
+        """ Register the cached translations of the documents referenced from `layers` and their sublayers.
+
+        Call it before a stage composes the layers. Nothing is translated, documents
+        missing from the cache are left to USD. Referenced and payload layers aren't
+        opened, documents they reference are left to USD as well.
+
+        :param layers: Sdf.Layer objects, i.e. the root layers of the stages about to be loaded
+        :param extensions: file extensions of the documents
+        :return: paths of the documents served from the cache
+        """
+        from pxr import Sdf
+
+        extensions = tuple(e.lower() for e in extensions)
+        stack = []
+        visited = set()
+        for layer in layers:
+            if layer.identifier not in visited and not layer.identifier.lower().endswith(extensions):
+                visited.add(layer.identifier)
+                stack.append(layer)
+        opened = []
+        documents = []
+        while stack:
+            layer = stack.pop()
+            getDependencies = getattr(layer, 'GetCompositionAssetDependencies', None)
+            for assetPath in (getDependencies() if getDependencies else layer.externalReferences):
+                if assetPath.lower().endswith(extensions):
+                    path = layer.ComputeAbsolutePath(assetPath)
+                    if path not in documents:
+                        documents.append(path)
+
+            for subLayerPath in layer.subLayerPaths:
+                child = Sdf.Layer.FindOrOpenRelativeToLayer(layer, subLayerPath)
+                if child is not None and child.identifier not in visited:
+                    visited.add(child.identifier)
+                    opened.append(child)
+                    stack.append(child)
+
+        registered = []
+        for path in documents:
+            try:
+                entry = self.lookup(path)
+                if entry is not None:
+                    self.load_layer(path, entry['layer'])
+                    self._touch(entry['layer'])
+                    registered.append(path)
+            except Exception as e:
+                print("ML Log: WARNING: couldn't load the cached translation of " + path + ": " + str(e))
+
+        with self._lock:
+            self._sceneLayers = opened
+        return registered
+
+    def evict(self, max_bytes: int, keep: str = None):
+        """ Remove the least recently used layers until the cache fits `max_bytes`.
+
+        :param keep: layer path which stays, i.e. the one just translated
+        """
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for fileName in files:
+                if not fileName.endswith(".usdc"):
+                    continue
+                layerPath = os.path.join(root, fileName)
+                try:
+                    stat = os.stat(layerPath)
+                    size = stat.st_size + os.path.getsize(layerPath + ".json")
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, size, layerPath))
+
+        entries.sort(reverse=True)
+        totalBytes = sum(entry[1] for entry in entries)
+        while entries and totalBytes > max_bytes:
+            _, size, layerPath = entries.pop()
+            if layerPath == keep:
+                continue
+            try:
+                # The sidecar goes first, a layer without one is a miss.
+                os.remove(layerPath + ".json")
+                os.remove(layerPath)
+                totalBytes -= size
+            except OSError:
+                pass
+
+    def translate_async(self, mtlx_paths: Iterable[str]):
+        """ Translate documents on a background worker, i.e. right after a package was downloaded.
+
+        :return: list of futures, one per document
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='RprUsdMtlxLayer')
+            executor = self._executor
+        return [executor.submit(self._translate_quietly, path) for path in mtlx_paths]
+
+    def translate_package(self, package_dir: str, wait: bool = False):
+        """ Translate every .mtlx document of an extracted package.
+
+        :param package_dir: package directory
+        :param wait: translate on the calling thread instead of the background worker
+        """
+        documents = find_documents(package_dir)
+        if wait:
+            return [self._translate_quietly(path) for path in documents]
+        return self.translate_async(documents)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _translate_quietly(self, mtlx_path: str):
+        try:
+            return self.get(mtlx_path)
+        except Exception as e:
+            print("ML Log: WARNING: couldn't pre-translate " + mtlx_path + ": " + str(e))
+            return None
+
+    @staticmethod
+    def _touch(layer_path: str):
+        # Eviction goes by modification time; a read-only shared cache just doesn't record the use.
+        try:
+            os.utime(layer_path, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _read_entry(layer_path: str) -> Optional[Dict]:
+        if not os.path.exists(layer_path):
+            return None
+        try:
+            with open(layer_path + ".json", 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not data.get('materials'):
+            return None
+        return {'layer': layer_path, 'materials': data['materials'], 'source': data.get('source')}
+
+
+def find_documents(package_dir: str) -> List[str]:
+    documents = []
+    for root, dirs, files in os.walk(package_dir):
+        documents += [os.path.join(root, name) for name in files if name.lower().endswith(".mtlx")]
+    return sorted(documents)
+
+
+def getMtlxLayerCache():
+    """ Cache in RPRUSD_MTLX_LAYER_CACHE, or in the per-user RprUsd directory. """
+    global g_MtlxLayerCache
+
+    if g_MtlxLayerCache is None:
+        cacheDirectory = os.environ.get("RPRUSD_MTLX_LAYER_CACHE")
+        if not cacheDirectory:
+            import cacheTiers
+            cacheDirectory = cacheTiers.getUserDirectory() + "/MtlxLayerCache"
+        os.makedirs(cacheDirectory, exist_ok=True)
+        g_MtlxLayerCache = MtlxLayerCache(cacheDirectory)
+    return g_MtlxLayerCache
+
+
+def registerSceneDocuments(*args):
+    """ Register the cached translations of the documents the USD layers of the scene reference.
+
+    Runs after Maya read a scene, before the proxy shapes compose their stages.
+    """
+    import maya.cmds as cmds
+    from pxr import Sdf
+
+    # Layers the scene restored, i.e. anonymous root layers, and the files of the proxy shapes.
+    layers = list(Sdf.Layer.GetLoadedLayers())
+    sceneDir = os.path.dirname(cmds.file(query=True, sceneName=True) or '')
+    for shape in cmds.ls(type="mayaUsdProxyShape", long=True) or []:
+        filePath = cmds.getAttr(shape + ".filePath")
+        if filePath:
+            layer = Sdf.Layer.FindOrOpen(os.path.join(sceneDir, filePath))
+            if layer is not None:
+                layers.append(layer)
+
+    registered = getMtlxLayerCache().register_documents(layers)
+    if registered:
+        print("ML Log: loaded {} cached MaterialX translations".format(len(registered)))
+
+
+def pretranslatePackage(package_dir: str):
+    """ Queue the documents of a freshly extracted package for translation. """
+    getMtlxLayerCache().translate_package(package_dir)
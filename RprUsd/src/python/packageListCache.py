@@ -0,0 +1,166 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from matlibPackages import package_size_key
+
+
+class PackageListCache:
+    """ Per-material cache of package lists with asynchronous fetching.
+
+    Explicit requests (the material the user clicked) go through their own
+    worker pool so they never queue behind speculative prefetches.
+    Callbacks are invoked on a worker thread with (material_id, packages);
+    packages is None if the request failed. At most max_entries lists are kept,
+    the least recently used ones are dropped first. The worker pools are started
+    on demand and stopped by clear().
+    """
+
+    def __init__(self, client, max_workers: int = 2, max_prefetch_workers: int = 2, limit: int = 100,
+                 max_entries: int = 4096):
+        self._client = client
+        self._limit = limit
+        self._max_workers = max_workers
+        self._max_prefetch_workers = max_prefetch_workers
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._lists = OrderedDict()
+        self._pending = dict()
+        self._speculative = dict()
+        self._executor = None
+        self._prefetch_executor = None
+        # Bumped by clear(), so requests started before it don't fill the cache again.
+        self._generation = 0
+
+    def get_cached(self, material_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            packages = self._lists.get(material_id)
+            if packages is not None:
+                self._lists.move_to_end(material_id)
+            return packages
+
+    def fetch(self, material_id: str, callback: Callable = None):
+        """ Request the package list of a material.
+
+        :param material_id: id of the material
+        :param callback: called with (material_id, packages) once the list is available
+        :return: Future resolving to the package list
+        """
+        with self._lock:
+            if material_id in self._lists:
+                packages = self._lists[material_id]
+                self._lists.move_to_end(material_id)
+                future = None
+            else:
+                future = self._pending.get(material_id)
+                speculative = self._speculative.get(material_id)
+                # Promote a speculative request that hasn't started yet to the explicit pool.
+                if future is None and speculative is not None and speculative.cancel():
+                    del self._speculative[material_id]
+                    speculative = None
+                if future is None and speculative is None:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                            thread_name_prefix='RprUsdPackages')
+                    future = self._executor.submit(self._load, material_id, self._generation)
+                    self._pending[material_id] = future
+                elif future is None:
+                    future = speculative
+
+        if future is None:
+            if callback:
+                callback(material_id, packages)
+            return self._resolved(packages)
+
+        if callback:
+            future.add_done_callback(lambda f: callback(material_id, self._result(f)))
+        return future
+
+    def prefetch(self, material_ids: Iterable[str]):
+        """ Speculatively fetch package lists for the given materials.
+
+        Queued prefetches for materials that are no longer requested are dropped,
+        so scrolling or switching categories doesn't build up a stale backlog.
+        """
+        wanted = list(dict.fromkeys(material_ids))
+        with self._lock:
+            for material_id, future in list(self._speculative.items()):
+                if material_id not in wanted and future.cancel():
+                    del self._speculative[material_id]
+
+            for material_id in wanted:
+                if material_id in self._lists or material_id in self._pending or material_id in self._speculative:
+                    continue
+                if self._prefetch_executor is None:
+                    self._prefetch_executor = ThreadPoolExecutor(max_workers=self._max_prefetch_workers,
+                                                                 thread_name_prefix='RprUsdPackagesPrefetch')
+                self._speculative[material_id] = self._prefetch_executor.submit(self._load, material_id,
+                                                                                self._generation)
+
+    def get_all_cached(self) -> Dict[str, List[Dict]]:
+        """ Copy of every cached package list by material id. """
+        with self._lock:
+            return dict(self._lists)
+
+    def clear(self):
+        """ Drop every list and stop the worker pools; requests in flight still call back but aren't cached. """
+        self.shutdown()
+        with self._lock:
+            self._lists.clear()
+
+    def shutdown(self):
+        with self._lock:
+            for future in self._speculative.values():
+                future.cancel()
+            self._speculative.clear()
+            self._pending.clear()
+            self._generation += 1
+            executors = (self._executor, self._prefetch_executor)
+            self._executor = self._prefetch_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _load(self, material_id: str, generation: int):
+        packages = None
+        try:
+            packages = self._client.packages.get_list(limit=self._limit, offset=0, params={'material': material_id})
+            packages.sort(key=package_size_key)
+            return packages
+        finally:
+            with self._lock:
+                if generation == self._generation:
+                    if packages is not None:
+                        self._lists[material_id] = packages
+                        self._lists.move_to_end(material_id)
+                        while len(self._lists) > self._max_entries:
+                            self._lists.popitem(last=False)
+                    self._pending.pop(material_id, None)
+                    self._speculative.pop(material_id, None)
+
+    @staticmethod
+    def _result(future):
+        if future.cancelled() or future.exception() is not None:
+            if not future.cancelled():
+                print("ML Log: ERROR: couldn't load packages: " + str(future.exception()))
+            return None
+        return future.result()
+
+    @staticmethod
+    def _resolved(value):
+        future = Future()
+        future.set_result(value)
+        return future
@@ -0,0 +1,162 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mimetypes
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+import sharedCache
+
+# Image formats kept in the cache, renders of any other type are stored as DEFAULT_EXTENSION.
+PREVIEW_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff', '.exr', '.hdr')
+DEFAULT_EXTENSION = '.png'
+
+
+def get_extension(content_type: str = None, url: str = None):
+    """ File extension of a render from its Content-Type, else from the URL it was served from. """
+    extension = None
+    if content_type:
+        extension = mimetypes.guess_extension(content_type.split(';')[0].strip().lower())
+    if extension not in PREVIEW_EXTENSIONS and url:
+        extension = posixpath.splitext(urlparse(url).path)[1].lower()
+    return extension if extension in PREVIEW_EXTENSIONS else DEFAULT_EXTENSION
+
+
+class PreviewCache:
+    """ Bounded on-disk cache of full-size material renders.
+
+    Only the most recent request is kept alive: issuing a new request cancels
+    the download of the previous one at the next received block.
+    Callbacks are invoked on a worker thread with (render_id, path);
+    path is None if the download failed or was cancelled.
+    """
+
+    def __init__(self, client, cache_dir: str, max_entries: int = 64, max_bytes: int = 512 * 1024 * 1024):
+        self._client = client
+        self._cache_dir = cache_dir
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='RprUsdPreview')
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def get_path(self, render_id: str, extension: str = DEFAULT_EXTENSION):
+        return os.path.join(self._cache_dir, render_id + extension)
+
+    def get_cached(self, render_id: str) -> Optional[str]:
+        for extension in PREVIEW_EXTENSIONS:
+            path = self.get_path(render_id, extension)
+            if os.path.isfile(path):
+                break
+        else:
+            return None
+
+        # Refresh the access time used for eviction.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def request(self, render_id: str, callback: Callable = None):
+        """ Fetch the full render in the background, cancelling any previous request. """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+
+        return self._executor.submit(self._load, render_id, generation, callback)
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _is_current(self, generation: int):
+        with self._lock:
+            return generation == self._generation
+
+    def _load(self, render_id: str, generation: int, callback: Callable):
+        path = self.get_cached(render_id)
+
+        if path is None and self._is_current(generation):
+            path = self._download(render_id, generation)
+
+        if callback:
+            callback(render_id, path if self._is_current(generation) else None)
+        return path
+
+    def _download(self, render_id: str, generation: int):
+        # The file name depends on the response's content type, so the lock is taken by hand
+        # rather than through sharedCache.single_flight.
+        lock = sharedCache.FileLock(sharedCache.get_lock_path(self.get_path(render_id, '')))
+        try:
+            with lock:
+                # Another process may have finished the render while we were waiting.
+                path = self.get_cached(render_id)
+                if path is None:
+                    path = self._fetch(render_id, generation)
+        except Exception as e:
+            if self._is_current(generation):
+                print("ML Log: ERROR: couldn't download preview " + render_id + ": " + str(e))
+            return None
+
+        self._evict()
+        return path
+
+    def _fetch(self, render_id: str, generation: int):
+        def progress(size, length):
+            return self._is_current(generation)
+
+        partPath = sharedCache.get_part_path(self.get_path(render_id, ''))
+        try:
+            info = self._client.renders.download(render_id, progress, self._cache_dir, os.path.basename(partPath)) or {}
+            # Cancelled downloads of unknown length leave a truncated file behind.
+            if not self._is_current(generation):
+                raise InterruptedError()
+
+            path = self.get_path(render_id, get_extension(info.get('content_type'), info.get('url')))
+            sharedCache.replace(partPath, path)
+            return path
+        finally:
+            if os.path.exists(partPath):
+                os.remove(partPath)
+
+    def _evict(self):
+        entries = []
+        for fileName in os.listdir(self._cache_dir):
+            if os.path.splitext(fileName)[1].lower() not in PREVIEW_EXTENSIONS:
+                continue
+            fullPath = os.path.join(self._cache_dir, fileName)
+            try:
+                stat = os.stat(fullPath)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fullPath))
+
+        # Remove the least recently used previews until the cache fits its bounds.
+        entries.sort(reverse=True)
+        totalBytes = sum(entry[1] for entry in entries)
+        while entries and (len(entries) > self._max_entries or totalBytes > self._max_bytes):
+            _, size, fullPath = entries.pop()
+            try:
+                os.remove(fullPath)
+                totalBytes -= size
+            except OSError:
+                pass
@@ -0,0 +1,189 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Automatic package resolution selection.
+
+The "auto" package rule picks the highest resolution whose download fits a
+time budget at the throughput measured on recent downloads (see
+client.ThroughputMeter) and an optional byte budget. A project overrides the
+defaults with a file in its root directory (the Maya workspace, or the
+--project directory of the command line tools):
+
+    rprUsdMatlib.json
+    {
+        "resolutionPolicy": {"timeBudget": 60, "byteBudget": "200 MB", "maxResolution": "4k"}
+    }
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import matlibPackages
+
+PROJECT_FILE = "rprUsdMatlib.json"
+PROJECT_SECTION = "resolutionPolicy"
+
+# Seconds a single package download may take when nothing else is configured.
+DEFAULT_TIME_BUDGET = 120.0
+
+
+class ResolutionPolicy:
+
+    def __init__(self, time_budget: float = DEFAULT_TIME_BUDGET, byte_budget: int = None, max_resolution: int = None):
+        """
+        :param time_budget: seconds a package download may take, None for no limit
+        :param byte_budget: bytes a package may have, None for no limit
+        :param max_resolution: highest texture resolution in pixels (i.e. 4096), None for no limit
+        """
+        self.time_budget = time_budget
+        self.byte_budget = byte_budget
+        self.max_resolution = max_resolution
+
+    @staticmethod
+    def from_dict(data: Dict, base: 'ResolutionPolicy' = None) -> 'ResolutionPolicy':
+        """ Policy from a settings dict, keys missing from it are taken from `base`. """
+        base = base or ResolutionPolicy()
+        policy = ResolutionPolicy(base.time_budget, base.byte_budget, base.max_resolution)
+
+        if 'timeBudget' in data:
+            policy.time_budget = None if data['timeBudget'] is None else float(data['timeBudget'])
+        if 'byteBudget' in data:
+            policy.byte_budget = parse_size(data['byteBudget'])
+        if 'maxResolution' in data:
+            policy.max_resolution = parse_resolution(data['maxResolution'])
+        return policy
+
+    def to_dict(self):
+        return {'timeBudget': self.time_budget, 'byteBudget': self.byte_budget, 'maxResolution': self.max_resolution}
+
+    def choose(self, packages: List[Dict], bytes_per_second: float = None) -> Optional[Dict]:
+        """ Highest resolution package fitting the budgets, the smallest one if none fits.
+
+        Packages of unknown size only fit when no budget applies, and rank last as the smallest one.
+
+        :param packages: package records of a material
+        :param bytes_per_second: measured throughput; without it only the byte budget applies
+        """
+        if not packages:
+            return None
+
+        packages = sorted(packages, key=size_rank)
+        fitting = [package for package in packages if self.fits(package, bytes_per_second)]
+        if not fitting:
+            return packages[0]
+        return max(fitting, key=lambda p: (matlibPackages.package_resolution(p) or 0, matlibPackages.package_size_key(p)))
+
+    def fits(self, package: Dict, bytes_per_second: float = None):
+        if self.max_resolution is not None:
+            resolution = matlibPackages.package_resolution(package)
+            if resolution is not None and resolution > self.max_resolution:
+                return False
+
+        size = matlibPackages.package_size_bytes(package)
+        if size is None:
+            # Nothing tells it fits a budget in effect.
+            return self.byte_budget is None and (self.time_budget is None or not bytes_per_second)
+        if self.byte_budget is not None and size > self.byte_budget:
+            return False
+
+        seconds = estimate_seconds(package, bytes_per_second)
+        return seconds is None or self.time_budget is None or seconds <= self.time_budget
+
+
+def size_rank(package: Dict):
+    """ Sort key ordering packages by size, those of unknown size last. """
+    size = matlibPackages.package_size_bytes(package)
+    return size is None, size or 0
+
+
+def estimate_seconds(package: Dict, bytes_per_second: float = None):
+    """ Expected download time of a package, None if its size or the throughput is unknown. """
+    size = matlibPackages.package_size_bytes(package)
+    if size is None or not bytes_per_second:
+        return None
+    return size / bytes_per_second
+
+
+def parse_size(value) -> Optional[int]:
+    """ Byte count from a number or a size string such as "200 MB". """
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else int(value)
+    size = matlibPackages.package_size_bytes({"size": value})
+    if size is None:
+        raise ValueError("Invalid size: " + str(value))
+    return size
+
+
+def parse_resolution(value) -> Optional[int]:
+    """ Pixel count from a number or a label such as "4k". """
+    if value is None or isinstance(value, int):
+        return value
+    resolution = matlibPackages.package_resolution({"label": str(value)})
+    if resolution is None:
+        raise ValueError("Invalid resolution: " + str(value))
+    return resolution
+
+
+def load_policy(project_dir: str = None, base: ResolutionPolicy = None) -> ResolutionPolicy:
+    """ Policy of a project: `base` (or the defaults) overridden by the project's settings file. """
+    policy = base or ResolutionPolicy()
+    if not project_dir:
+        return policy
+
+    path = os.path.join(project_dir, PROJECT_FILE)
+    try:
+        with open(path, 'r') as file:
+            data = json.load(file).get(PROJECT_SECTION) or {}
+    except FileNotFoundError:
+        return policy
+    except (OSError, ValueError, AttributeError) as e:
+        print("ML Log: WARNING: ignoring project settings " + path + ": " + str(e))
+        return policy
+
+    try:
+        return ResolutionPolicy.from_dict(data, policy)
+    except (TypeError, ValueError) as e:
+        print("ML Log: WARNING: ignoring resolution policy of " + path + ": " + str(e))
+        return policy
+
+
+def format_seconds(seconds: float):
+    if seconds < 90:
+        return "{:.0f} s".format(max(1, seconds))
+    if seconds < 5400:
+        return "{:.0f} min".format(seconds / 60)
+    return "{:.1f} h".format(seconds / 3600)
+
+
+def add_arguments(parser):
+    """ Command line options of the "auto" resolution rule, shared by the headless tools. """
+    parser.add_argument("--time-budget", type=float,
+                        help="with --resolution auto: seconds a package download may take "
+                             "(default: project setting or {:.0f})".format(DEFAULT_TIME_BUDGET))
+    parser.add_argument("--byte-budget", help="with --resolution auto: largest package size, i.e. '500 MB'")
+    parser.add_argument("--max-resolution", help="with --resolution auto: highest resolution, i.e. '4k'")
+    parser.add_argument("--project", default=os.getcwd(),
+                        help="project directory with " + PROJECT_FILE + " settings (default: current directory)")
+
+
+def policy_from_arguments(args) -> ResolutionPolicy:
+    policy = load_policy(args.project)
+    overrides = dict()
+    if args.time_budget is not None:
+        overrides['timeBudget'] = args.time_budget
+    if args.byte_budget is not None:
+        overrides['byteBudget'] = args.byte_budget
+    if args.max_resolution is not None:
+        overrides['maxResolution'] = args.max_resolution
+    return ResolutionPolicy.from_dict(overrides, policy)
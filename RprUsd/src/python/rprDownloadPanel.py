@@ -0,0 +1,189 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import maya.cmds as cmds
+import maya.utils
+import os
+from functools import partial
+
+import cacheTiers
+import downloadManager
+import matlibPackages
+import mtlxLayerCache
+import webServerUrlHelper
+
+g_DownloadManager = None
+g_DownloadPanel = None
+
+# Get the download manager shared by all browser windows.
+# -----------------------------------------------------------------------------
+def getDownloadManager() :
+    global g_DownloadManager
+
+    if g_DownloadManager is None :
+        queueDirectory = cacheTiers.getUserDirectory()
+        os.makedirs(queueDirectory, exist_ok=True)
+
+        g_DownloadManager = downloadManager.DownloadManager(webServerUrlHelper.createMatlibClient(),
+                                                            os.path.join(queueDirectory, "downloadQueue.json"),
+                                                            store=matlibPackages.get_content_store())
+
+        if cmds.optionVar(exists="RprUsd_DownloadBandwidthLimit") :
+            g_DownloadManager.set_bandwidth_limit(cmds.optionVar(query="RprUsd_DownloadBandwidthLimit") * 1024 * 1024)
+
+        # Packages are extracted whole unless asked to keep only the files their MaterialX documents use.
+        if cmds.optionVar(exists="RprUsd_ExtractReferencedPackageFiles") and cmds.optionVar(query="RprUsd_ExtractReferencedPackageFiles") :
+            g_DownloadManager.extract_mode = matlibPackages.EXTRACT_REFERENCED
+
+        # Translate the MaterialX documents of new packages to USD in the background, binding them is then instant.
+        g_DownloadManager.post_install = mtlxLayerCache.pretranslatePackage
+
+    return g_DownloadManager
+
+# Get the download panel, creating it on first use.
+# -----------------------------------------------------------------------------
+def getDownloadPanel() :
+    global g_DownloadPanel
+
+    if g_DownloadPanel is None :
+        g_DownloadPanel = RPRDownloadPanel(getDownloadManager())
+    return g_DownloadPanel
+
+# Show the download status panel.
+# -----------------------------------------------------------------------------
+def show() :
+    getDownloadPanel().show()
+
+# Build the panel inside its workspace control. Maya also calls this when it
+# restores the control at startup, before the panel was ever shown.
+# -----------------------------------------------------------------------------
+def createLayout() :
+    getDownloadPanel().createLayout()
+
+# A dockable panel listing queued package downloads.
+# -----------------------------------------------------------------------------
+class RPRDownloadPanel(object) :
+
+    controlName = "RPRDownloadPanel"
+
+    def __init__(self, manager) :
+        self.manager = manager
+        self.jobRows = dict()
+        self.jobsColumn = None
+        self.refreshPending = False
+        self.manager.add_listener(self.onManagerChanged)
+
+    def show(self) :
+        if cmds.workspaceControl(self.controlName, exists=True) :
+            cmds.workspaceControl(self.controlName, edit=True, restore=True)
+            return
+
+        cmds.workspaceControl(self.controlName, label="RPR Downloads", floating=True,
+                              initialWidth=420, initialHeight=300, retain=False,
+                              uiScript="import rprDownloadPanel\nrprDownloadPanel.createLayout()")
+
+    # Create the panel layout inside the workspace control.
+    # -----------------------------------------------------------------------------
+    def createLayout(self) :
+        self.jobRows = dict()
+
+        cmds.setParent(self.controlName)
+        form = cmds.formLayout(numberOfDivisions=100)
+
+        topRow = cmds.rowLayout(numberOfColumns=5, adjustableColumn=1)
+        self.totalProgress = cmds.progressBar(maxValue=100, height=20)
+        self.pauseAllButton = cmds.button(label="Pause All", width=70, command=self.togglePauseAll)
+        cmds.text(label=" Limit MB/s:")
+        self.limitField = cmds.floatField(width=50, minValue=0, precision=1,
+                                          value=self.manager.bandwidth_limit / (1024.0 * 1024.0),
+                                          changeCommand=self.onLimitChanged)
+        cmds.button(label="Clear", width=50, command=self.clearFinished)
+        cmds.setParent('..')
+
+        scroll = cmds.scrollLayout(childResizable=True)
+        self.jobsColumn = cmds.columnLayout(adjustableColumn=True, rowSpacing=2)
+        cmds.setParent('..')
+        cmds.setParent('..')
+
+        cmds.formLayout(form, edit=True,
+                        attachForm=[(topRow, 'top', 5), (topRow, 'left', 5), (topRow, 'right', 5),
+                                    (scroll, 'left', 5), (scroll, 'right', 5), (scroll, 'bottom', 5)],
+                        attachControl=[(scroll, 'top', 5, topRow)])
+
+        self.refresh()
+
+    # Called by the manager at a capped rate from its notifier thread.
+    # -----------------------------------------------------------------------------
+    def onManagerChanged(self, manager) :
+        if self.refreshPending :
+            return
+        self.refreshPending = True
+        maya.utils.executeDeferred(self.refresh)
+
+    def refresh(self) :
+        self.refreshPending = False
+
+        if self.jobsColumn is None or not cmds.layout(self.jobsColumn, exists=True) :
+            return
+
+        received, total = self.manager.get_progress()
+        cmds.progressBar(self.totalProgress, edit=True, progress=int(100 * received / total) if total else 0)
+        cmds.button(self.pauseAllButton, edit=True, label="Resume All" if self.manager.paused else "Pause All")
+
+        for job in self.manager.get_jobs() :
+            if job.id not in self.jobRows :
+                self.createJobRow(job)
+            self.updateJobRow(job)
+
+        # Drop rows of jobs removed by Clear.
+        jobIds = set(job.id for job in self.manager.get_jobs())
+        for jobId in [i for i in self.jobRows if i not in jobIds] :
+            cmds.deleteUI(self.jobRows.pop(jobId)["row"])
+
+    def createJobRow(self, job) :
+        cmds.setParent(self.jobsColumn)
+        row = cmds.rowLayout(numberOfColumns=4, adjustableColumn=1)
+        label = cmds.text(align="left")
+        progress = cmds.progressBar(maxValue=100, width=100, height=16)
+        pauseButton = cmds.button(label="Pause", width=55, command=partial(self.togglePauseJob, job))
+        cancelButton = cmds.button(label="Cancel", width=55, command=partial(self.cancelJob, job))
+        cmds.setParent('..')
+
+        self.jobRows[job.id] = {"row": row, "label": label, "progress": progress,
+                                "pause": pauseButton, "cancel": cancelButton}
+
+    def updateJobRow(self, job) :
+        controls = self.jobRows[job.id]
+        finished = job.state in downloadManager.FINISHED_STATES
+        state = "paused" if job.paused and not finished else job.state
+
+        cmds.text(controls["label"], edit=True, label=job.title + " - " + state)
+        percent = int(100 * job.received / job.total) if job.total else (100 if job.state == downloadManager.STATE_DONE else 0)
+        cmds.progressBar(controls["progress"], edit=True, progress=percent)
+        cmds.button(controls["pause"], edit=True, enable=not finished, label="Resume" if job.paused else "Pause")
+        cmds.button(controls["cancel"], edit=True, enable=not finished)
+
+    def togglePauseAll(self, *args) :
+        self.manager.set_paused(not self.manager.paused)
+
+    def togglePauseJob(self, job, *args) :
+        self.manager.set_job_paused(job, not job.paused)
+
+    def cancelJob(self, job, *args) :
+        self.manager.cancel(job)
+
+    def clearFinished(self, *args) :
+        self.manager.clear_finished()
+
+    def onLimitChanged(self, value) :
+        cmds.optionVar(floatValue=("RprUsd_DownloadBandwidthLimit", value))
+        self.manager.set_bandwidth_limit(value * 1024 * 1024)
@@ -14,11 +14,12 @@
 import maya.cmds as cmds
 import maya.mel as mel
 import os
-import json
+import catalogService
+import lightPrewarm
 import urllib.request
 import threading
 
-from funcagents import partial
+from functools import partial
 
 
 def show() :
@@ -36,8 +37,9 @@ class RPRLightBrowser(object) :
     # Show the material browser.
     # -----------------------------------------------------------------------------
     def show(self) :
-        self.pathRootThumbnail = os.environ["USERPROFILE"] + "/Documents/Maya/RprUsd/WebMatlibCache"
-        os.makedirs(self.pathRootThumbnail, exist_ok=True)
+        service = catalogService.getCatalogService()
+        self.pathRootThumbnail = service.cache_dir
+        self.cacheTiers = service.tiers
 
         self.baseUrl = "https://renderstudio.luxoft.com/storage/api/lights/";
         self.downloadMetadata()
@@ -48,13 +50,14 @@ class RPRLightBrowser(object) :
 
     def downloadMetadata(self) :
         url = self.baseUrl + "?limit=50&type=environment"
-        request = urllib.request.Request(url)
-        response = urllib.request.urlopen(request)
-        response_content = json.loads(response.read().decode("utf-8"))
-        self.lights = response_content['results']
+        self.lights = catalogService.getCatalogService().get_listing(url)
 
     def threadProcDownloadThumbnail(self, light_id, fullFilePath) :
-        self.downloadThumbnail(light_id, fullFilePath)
+        # Downloaded under a private name, a studio cache tier may already have it.
+        try :
+            self.cacheTiers.get(os.path.basename(fullFilePath), partial(self.downloadThumbnail, light_id))
+        except Exception as e :
+            print("ML Log: ERROR: couldn't download light thumbnail " + light_id + ": " + str(e))
 
     def downloadThumbnails(self) :
         threads = []        
@@ -140,5 +143,13 @@ class RPRLightBrowser(object) :
          # Show the material browser window.
         cmds.showWindow(self.window)
 
+    # Apply the light right away, warming never delays it. Lights warmed
+    # ahead of time with lightPrewarm.prefetch are already loaded, and the
+    # applied light is kept loaded so switching back to it doesn't fetch again.
+    # -----------------------------------------------------------------------------
     def selectIBL(self, lightName) :
         cmds.rprUsdSetIBL(name=lightName)
+
+        prewarmer = lightPrewarm.getPrewarmer()
+        if not prewarmer.is_warm(lightName) :
+            prewarmer.request(lightName)
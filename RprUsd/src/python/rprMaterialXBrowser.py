@@ -15,15 +15,33 @@ import maya.mel as mel
 import os
 import json
 import math
-from funcagents import partial
+from functools import partial
 from sys import platform
-import zipfile
 import threading
-from client import MatlibClient
-import webServerUrlHelper
+import maya.utils
+import catalogService
+import matlibPackages
+import memoryReport
+import resolutionPolicy
+import rprDownloadPanel
+import thumbnailPrefetcher
+import uiScheduler
 
 import ufe
 
+# Sort dropdown entries: label, catalogService sort key (None keeps the library order), reversed.
+SORT_MODES = [
+    ("No Sort", None, False),
+    ("Sort Ascending", "title", False),
+    ("Sort Descending", "title", True),
+    ("Material Type", "type", False),
+    ("License", "license", False),
+    ("Smallest Package Size", "size", False),
+]
+
+# Materials past the visible tiles whose package sizes the size sort fetches.
+PACKAGE_SIZE_WINDOW = 50
+
 # Show the material browser window.
 # -----------------------------------------------------------------------------
 def show() :
@@ -61,43 +79,44 @@ class RPRMaterialBrowser(object) :
     # -----------------------------------------------------------------------------
     def show(self) :
 
-        #load all material at one time. It's possible to rework to load in chunks if needs
-        maxElementCount = 10000
+        # Phase marks only record anything while memory tracing is enabled.
+        memoryReport.track(self)
+        memoryReport.mark("browser.show")
 
-        self.matlibClient = MatlibClient(webServerUrlHelper.g_WebMatXServerUrl)
-        self.categoryListData = self.matlibClient.categories.get_list(maxElementCount, 0)
-        self.pathRootThumbnail = os.environ["USERPROFILE"] + "/Documents/Maya/RprUsd/WebMatlibCache"
-        os.makedirs(self.pathRootThumbnail, exist_ok=True)
+        # The catalog is shared by all browser windows and loaded once per session.
+        service = catalogService.getCatalogService()
 
-        if len(self.categoryListData) <= 0 :
-            print("ML Log: ERROR: We couldn't load categories from the Web")	
+        try :
+            catalog = service.load()
+        except Exception as e :
+            print("ML Log: ERROR: We couldn't load categories from the Web: " + str(e))
             return
 
-        self.categoryDict = dict()
-
-        for category in self.categoryListData :
-            self.categoryDict[category["id"]] = category
+        self.matlibClient = service.client
+        self.packageCache = service.packageCache
+        self.previewCache = service.previewCache
+        self.atlasStore = service.atlasStore
+        self.tilePaths = dict()
+        self.packageDataList = []
+        self.pathRootThumbnail = service.cache_dir
+        self.cacheTiers = service.tiers
+
+        self.categoryListData = catalog.categories
+        self.categoryDict = catalog.categoryDict
+        self.tags = catalog.tags
+        self.tagDict = catalog.tagDict
+        self.materialListData = catalog.materials
+        self.materialDict = catalog.materialDict
+        self.materialByCategory = catalog.materialByCategory
+        self.catalog = catalog
+        self.resultSet = []
+        self.resultScope = None
+        self.pendingPackageSizes = set()
+        self.resolutionPolicy = self.loadResolutionPolicy()
+        memoryReport.mark("browser.catalog")
 
-        self.tags = self.matlibClient.tags.get_list(maxElementCount, 0)
-
-        self.tagDict = dict()
-        for tag in self.tags :
-            self.tagDict[tag["id"]] = tag["title"]
-
-        self.materialListData = self.matlibClient.materials.get_list(maxElementCount, 0)
-        self.materialDict = dict()
-      
-        self.materialByCategory = dict()
-
-        for material in self.materialListData :
-            self.materialDict[material["id"]] = material
-            categoryId = material["category"]
-
-            if categoryId not in self.materialByCategory :
-                self.materialByCategory[categoryId] = list()
-            self.materialByCategory[categoryId].append(material)
-              	     		
         self.createLayout()
+        memoryReport.mark("browser.layout")
 
     # Create the browser layout.
     # -----------------------------------------------------------------------------
@@ -112,9 +131,16 @@ class RPRMaterialBrowser(object) :
                                   widthHeight=(1200, 700),
                                   title="Radeon ProRender MaterialX Browser")
 
+        # Resize and rebuild requests are coalesced into one pass per idle.
+        self.uiScheduler = uiScheduler.UiScheduler(isAlive=partial(cmds.window, "RPRMaterialBrowserWindow", exists=True))
+        self.uiScheduler.addPass("sort", self.resortMaterials)
+        self.uiScheduler.addPass("rebuild", self.updateMaterialIconSize, covers=("layout", "preview"))
+        self.uiScheduler.addPass("layout", self.updateMaterialsLayout, covers=("preview",))
+        self.uiScheduler.addPass("preview", self.updatePreviewLayout)
+
         # Place UI sections in a horizontal 3 pane layout.
         paneLayout = cmds.paneLayout(configuration='vertical3', staticWidthPane=3,
-                                     separatorMovedCommand=self.updateMaterialsLayout)
+                                     separatorMovedCommand=partial(self.uiScheduler.request, "layout"))
 
         cmds.paneLayout(paneLayout, edit=True, paneSize=(1, 22, 100))
         cmds.paneLayout(paneLayout, edit=True, paneSize=(2, 48, 100))
@@ -182,17 +208,89 @@ class RPRMaterialBrowser(object) :
     def getMaterialFullPath(self, fileName) :
         return os.path.join(self.pathRootThumbnail, fileName)
 
+    # Thumbnail path, a tile from the category atlas when there is one.
+    # -----------------------------------------------------------------------------
+    def getThumbnailPath(self, material) :
+        renderId = material["renders_order"][0]
+        if renderId in self.tilePaths :
+            return self.tilePaths[renderId]
+        return self.getMaterialFullPath(self.getMaterialFileName(material))
+
+    # Read the atlases of the categories shown, one sequential read per category.
+    # -----------------------------------------------------------------------------
+    def loadAtlasTiles(self) :
+        for categoryId in set(material["category"] for material in self.materials) :
+            self.tilePaths.update(self.atlasStore.materialize(categoryId))
+
     def onSortModeChanged(self, modeName) :
         mode = cmds.optionMenu(self.sortDropdown, q=True, select=True)
         self.sortMaterials(mode)
         self.populateMaterialsInternal()
 
-    # 1 - No Sort, 2 - Ascending, 3 - Descending
+    # Order the current result set by the sort mode (1-based dropdown index).
+    # Sort orders are computed once per catalog, switching modes or categories
+    # only picks the result set out of them.
+    # -----------------------------------------------------------------------------
     def sortMaterials(self, mode) :
-        if mode == 1 :
-            self.materials = self.nonSortedMaterials.copy()
-        else :
-            self.materials = sorted(self.nonSortedMaterials, key=lambda material: material["title"], reverse = (mode == 3) )
+        label, key, reverse = SORT_MODES[mode - 1]
+
+        if key is None :
+            self.materials = self.resultSet
+            return
+
+        self.materials = self.catalog.get_sorted(self.resultSet, key, self.resultScope, reverse)
+
+        if key == "size" :
+            self.requestPackageSizes()
+
+    # Fetch the package lists the size sort needs. Sizes of the whole result set
+    # are taken from lists already cached, but only the visible tiles and the
+    # next PACKAGE_SIZE_WINDOW are fetched, the rest stay in title order.
+    # Sizes become known progressively, the grid is sorted again once all
+    # requested ones arrived.
+    # -----------------------------------------------------------------------------
+    def requestPackageSizes(self) :
+        for material in self.resultSet :
+            materialId = material["id"]
+            if not self.catalog.has_package_size(materialId) :
+                packages = self.packageCache.get_cached(materialId)
+                if packages is not None :
+                    self.recordPackageSize(materialId, packages)
+
+        first, last = self.getVisibleMaterialRange()
+        for material in self.materials[:last + PACKAGE_SIZE_WINDOW] :
+            materialId = material["id"]
+            if self.catalog.has_package_size(materialId) or materialId in self.pendingPackageSizes :
+                continue
+
+            self.pendingPackageSizes.add(materialId)
+            self.packageCache.fetch(materialId, self.onPackageSizeFetched)
+
+    def onPackageSizeFetched(self, materialId, packages) :
+        maya.utils.executeDeferred(self.applyPackageSize, materialId, packages)
+
+    def applyPackageSize(self, materialId, packages) :
+        self.pendingPackageSizes.discard(materialId)
+        self.recordPackageSize(materialId, packages or [])
+
+        if not self.pendingPackageSizes :
+            self.uiScheduler.request("sort")
+
+    def recordPackageSize(self, materialId, packages) :
+        sizes = [size for size in map(matlibPackages.package_size_bytes, packages) if size is not None]
+        self.catalog.set_package_size(materialId, min(sizes) if sizes else None)
+
+    # Sort the grid again with the package sizes fetched
+    # since, only while sorting by size.
+    # -----------------------------------------------------------------------------
+    def resortMaterials(self) :
+        mode = cmds.optionMenu(self.sortDropdown, q=True, select=True)
+        if SORT_MODES[mode - 1][1] != "size" :
+            return False
+
+        self.sortMaterials(mode)
+        self.populateMaterialsInternal()
+
     # Create the materials layout.
     # -----------------------------------------------------------------------------
     def createMaterialsLayout(self) :
@@ -208,7 +306,8 @@ class RPRMaterialBrowser(object) :
         cmds.image(image='material_browser/thumbnails.png')
         self.iconSizeSlider = cmds.intSlider(width=120, step=1, minValue=1, maxValue=4,
                                              value=self.getDefaultMaterialIconSize(),
-                                             dragCommand=self.updateMaterialIconSize)
+                                             dragCommand=partial(self.uiScheduler.request, "rebuild"),
+                                             changeCommand=self.onIconSizeChanged)
         cmds.setParent('..')
 
         cmds.separator(width=10,style="none")
@@ -216,9 +315,8 @@ class RPRMaterialBrowser(object) :
         # Add the search field.
         cmds.text(label="Sort Mode: ")
         self.sortDropdown = cmds.optionMenu(cc=self.onSortModeChanged)
-        cmds.menuItem(p=self.sortDropdown, l="No Sort")
-        cmds.menuItem(p=self.sortDropdown, l="Sort Ascending")
-        cmds.menuItem(p=self.sortDropdown, l="Sort Descending")
+        for label, key, reverse in SORT_MODES :
+            cmds.menuItem(p=self.sortDropdown, l=label)
 
         cmds.image(image='material_browser/search.png')
         self.searchField = cmds.textField(placeholderText="Search...", width=150, height=22,
@@ -234,7 +332,7 @@ class RPRMaterialBrowser(object) :
 
         # Add the scroll layout that will contain the material icons.
         self.materialsContainer = cmds.scrollLayout(backgroundColor=self.backgroundColor, childResizable=True,
-                                                    resizeCommand=self.updateMaterialsLayout)
+                                                    resizeCommand=partial(self.uiScheduler.request, "layout"))
         cmds.setParent('..')
 
         # Assign the form to the tab.
@@ -264,7 +362,7 @@ class RPRMaterialBrowser(object) :
 
         # Create a pane layout to contain material info and preview.
         paneLayout = cmds.paneLayout("RPRSelectedPane", configuration='horizontal2', staticHeightPane=2,
-                                     separatorMovedCommand=self.updatePreviewLayout)
+                                     separatorMovedCommand=partial(self.uiScheduler.request, "preview"))
 
         self.createInfoLayout()
         self.createPreviewLayout()
@@ -356,9 +454,15 @@ class RPRMaterialBrowser(object) :
     # Select a material category by index.
     # -----------------------------------------------------------------------------
     def selectCategory(self, index) :
+
+        # Hold off idle prefetching and remember the visit for its ordering.
+        thumbnailPrefetcher.notifyActivity()
+        thumbnailPrefetcher.recordCategoryVisit(self.categoryListData[index]["id"])
 	
         # Populate the materials view from the selected category.
-        self.materials = self.materialByCategory[self.categoryListData[index]["id"]]
+        categoryId = self.categoryListData[index]["id"]
+        self.resultSet = self.materialByCategory[categoryId]
+        self.resultScope = ("category", categoryId)
         self.populateMaterials()
 
         # Update the folder open / closed state on the category list.
@@ -373,17 +477,13 @@ class RPRMaterialBrowser(object) :
         # Clear the search field.
         cmds.textField(self.searchField, edit=True, text="")
 
-    def downloadPackageCallback(self, size, length) :
-        
-        percent = int(100 * size / length)
-        cmds.progressWindow( edit=True, progress=percent, status=('Downloading: ' + str(percent) + '%' ) )
-
-        return True
-
     def downloadMaterial(self, *args) :
-        menuItems = cmds.optionMenu(self.downloadPackageDropdown, q=True, itemListLong=True) # itemListLong returns the children
         index = cmds.optionMenu(self.downloadPackageDropdown, q=True, select=True) - 1
 
+        # Package list is still loading or failed to load.
+        if index < 0 or index >= len(self.packageDataList) :
+            return
+
         package = self.packageDataList[index]
         packageId = package["id"]
         
@@ -393,24 +493,13 @@ class RPRMaterialBrowser(object) :
             previousDirectoryUsed = cmds.optionVar(query=optionVarNameRecentDirectory)
         
         path = cmds.fileDialog2(cap="Select A Directory", startingDirectory=previousDirectoryUsed, fm=3)
-        cmds.progressWindow( title='Downloading Package',progress=0,status='downloading: 0%',isInterruptable=False)
         if path is not None :
-            print("ML Log: start downloading packageId=" + packageId)
-            self.matlibClient.packages.download(packageId, self.downloadPackageCallback, path[0], package["file"])
+            print("ML Log: queued downloading packageId=" + packageId)
             cmds.optionVar(sv=(optionVarNameRecentDirectory, path[0]))
 
-            zipFileName = os.path.join(path[0], package["file"])
-        
-            fullPathToExtract = os.path.join(path[0], os.path.splitext(package["file"])[0])
-            os.makedirs(fullPathToExtract, exist_ok=True)
-
-            #unzip
-            with zipfile.ZipFile(zipFileName, 'r') as zip_ref:
-                zip_ref.extractall(fullPathToExtract)
-            # remnove zip-archive
-            os.remove(zipFileName)
-                                                                                                               
-        cmds.progressWindow(endProgress=1)
+            # Download in the background and show progress in the download panel.
+            rprDownloadPanel.getDownloadManager().enqueue(package, path[0], self.selectedMaterial["title"] + " (" + package["label"] + ")")
+            rprDownloadPanel.show()
 
     def assignMatXLiveMode(self, *args) :
         gsel = ufe.GlobalSelection.get()
@@ -422,36 +511,149 @@ class RPRMaterialBrowser(object) :
 
     def updateSelectedMaterialPanel(self, fileName, categoryName, materialName, materialType, license) :
 
-        def sortAccordingPackageSize(package) :
-            numberDirtyString = package["size"]
-            return float(''.join(c for c in numberDirtyString if (c.isdigit() or c =='.')))
+        # Show the full render if it is cached, otherwise show the
+        # thumbnail now and swap in the full render when it arrives.
+        renderId = self.selectedMaterial["renders_order"][0]
+        previewFileName = self.previewCache.get_cached(renderId)
 
-        imageFileName = self.getMaterialFullPath(fileName)
+        if previewFileName is None :
+            previewFileName = self.getThumbnailPath(self.selectedMaterial)
+            self.previewCache.request(renderId, self.onPreviewFetched)
+        else :
+            self.previewCache.cancel()
 		
-        cmds.iconTextStaticLabel("RPRPreviewImage", edit=True, image=imageFileName)
+        cmds.iconTextStaticLabel("RPRPreviewImage", edit=True, image=previewFileName)
         cmds.text("RPRCategoryText", edit=True, label=categoryName)
         cmds.text("RPRNameText", edit=True, label=materialName)
         cmds.text("RPRMaterialLicense", edit=True, label=license)
-            
-        params = dict()
-        params["material"] = self.selectedMaterial["id"]
-        self.packageDataList = self.matlibClient.packages.get_list(limit=100, offset=0, params = params)
-          
-        self.packageDataList.sort(key=sortAccordingPackageSize)
+
+        # Fill the package dropdown from the cache or fetch
+        # the list in the background and fill it on arrival.
+        materialId = self.selectedMaterial["id"]
+        packages = self.packageCache.get_cached(materialId)
+
+        if packages is not None :
+            self.fillPackageDropdown(packages)
+        else :
+            self.fillPackageDropdown([], "Loading packages...")
+            self.packageCache.fetch(materialId, self.onPackageListFetched)
+
+    # Called on a worker thread when a full render download finishes.
+    # -----------------------------------------------------------------------------
+    def onPreviewFetched(self, renderId, previewFileName) :
+        if previewFileName is not None :
+            maya.utils.executeDeferred(self.applyPreview, renderId, previewFileName)
+
+    def applyPreview(self, renderId, previewFileName) :
+
+        if not cmds.window("RPRMaterialBrowserWindow", exists=True) :
+            return
+
+        if renderId != self.selectedMaterial["renders_order"][0] :
+            return
+
+        cmds.iconTextStaticLabel("RPRPreviewImage", edit=True, image=previewFileName)
+
+    # Called on a worker thread when a package list arrives.
+    # -----------------------------------------------------------------------------
+    def onPackageListFetched(self, materialId, packages) :
+        maya.utils.executeDeferred(self.applyPackageList, materialId, packages)
+
+    def applyPackageList(self, materialId, packages) :
+
+        # Ignore lists arriving after the selection changed or the window was closed.
+        if not cmds.window("RPRMaterialBrowserWindow", exists=True) :
+            return
+
+        if materialId != self.selectedMaterial["id"] :
+            return
+
+        if packages is None :
+            self.fillPackageDropdown([], "Packages are not available")
+        else :
+            self.fillPackageDropdown(packages)
+
+    def fillPackageDropdown(self, packages, placeholder=None) :
+
+        self.packageDataList = packages
 
         menuItems = cmds.optionMenu(self.downloadPackageDropdown, q=True, itemListLong=True) # itemListLong returns the children
         if menuItems:
             cmds.deleteUI(menuItems)
 
+        if placeholder is not None :
+            cmds.menuItem(p=self.downloadPackageDropdown, l=placeholder)
+            return
+
+        # Preselect the highest resolution that downloads within the budget
+        # at the throughput measured on recent downloads.
+        bytesPerSecond = self.matlibClient.session.throughput.get_bytes_per_second()
+        recommended = self.resolutionPolicy.choose(self.packageDataList, bytesPerSecond)
+
         index = 0
         for package in self.packageDataList:
             menuItemName = "Package: " + package["label"] + " ( " + package["size"] + " )"
-            cmd = partial(self.downloadMaterial, package)
+
+            seconds = resolutionPolicy.estimate_seconds(package, bytesPerSecond)
+            if seconds is not None :
+                menuItemName += " ~" + resolutionPolicy.format_seconds(seconds)
+            if package is recommended :
+                menuItemName += " - Recommended"
 
             cmds.menuItem(p=self.downloadPackageDropdown, l=menuItemName, data=index)
 
             index += 1
 
+        if recommended is not None :
+            cmds.optionMenu(self.downloadPackageDropdown, edit=True, select=self.packageDataList.index(recommended) + 1)
+
+    # Resolution policy of the current Maya project, see resolutionPolicy.
+    # The RprUsd_DownloadTimeBudget optionVar sets the user's default budget in seconds.
+    # -----------------------------------------------------------------------------
+    def loadResolutionPolicy(self) :
+        base = resolutionPolicy.ResolutionPolicy()
+        if cmds.optionVar(exists="RprUsd_DownloadTimeBudget") :
+            base.time_budget = float(cmds.optionVar(query="RprUsd_DownloadTimeBudget"))
+
+        return resolutionPolicy.load_policy(cmds.workspace(query=True, rootDirectory=True), base)
+
+    # Speculatively fetch package lists for the visible
+    # tiles and the neighbours of the selected material.
+    # -----------------------------------------------------------------------------
+    def prefetchPackageLists(self, centerIndex=None) :
+
+        if not self.materials :
+            return
+
+        first, last = self.getVisibleMaterialRange()
+        indices = list(range(first, last))
+
+        if centerIndex is not None :
+            perRow = self.getMaterialsPerRow()
+            neighbours = [centerIndex + 1, centerIndex - 1, centerIndex + perRow, centerIndex - perRow]
+            indices = [i for i in neighbours if 0 <= i < len(self.materials)] + indices
+
+        self.packageCache.prefetch(self.materials[i]["id"] for i in indices)
+
+    def getMaterialsPerRow(self) :
+        width = cmds.scrollLayout(self.materialsContainer, query=True, width=True)
+        return max(1, math.floor((width) / (self.cellWidth * self.uiMayaScaleCoeff)))
+
+    # Return the [first, last) range of material indices in the visible part of the grid.
+    # -----------------------------------------------------------------------------
+    def getVisibleMaterialRange(self) :
+        perRow = self.getMaterialsPerRow()
+        height = cmds.scrollLayout(self.materialsContainer, query=True, height=True)
+        scrollTop = cmds.scrollLayout(self.materialsContainer, query=True, scrollAreaValue=True)[0]
+
+        cellHeight = self.cellHeight * self.uiMayaScaleCoeff
+        firstRow = int(scrollTop // cellHeight)
+        rowCount = int(math.ceil(height / cellHeight)) + 1
+
+        first = min(len(self.materials), firstRow * perRow)
+        last = min(len(self.materials), (firstRow + rowCount) * perRow)
+        return first, last
+
     def selectMaterial(self, materialIndex) :
 
         self.selectedMaterial = self.materials[materialIndex]
@@ -462,6 +664,8 @@ class RPRMaterialBrowser(object) :
 
         self.updatePreviewLayout()
 
+        self.prefetchPackageLists(materialIndex)
+
     # Update the height of the materials flow layout
     # based on the width of its container and the
     # number of children. This is required so
@@ -469,28 +673,19 @@ class RPRMaterialBrowser(object) :
     # -----------------------------------------------------------------------------
     def updateMaterialsLayout(self) :
         
-        # Determine the width of the material view
-        # and the total number of materials to display.
-        width = cmds.scrollLayout(self.materialsContainer, query=True, width=True)      
-
-        count = cmds.flowLayout("RPRMaterialsFlow", query=True, numberOfChildren=True)
+        # Determine the total number of materials to display.
+        count = len(self.materials)
 
         if (count <= 0) :
             return
 
         # Calculate the number of materials that can fit on
         # a row and the total required height of the container.
-        perRow = max(1, math.floor((width) / (self.cellWidth * self.uiMayaScaleCoeff)))
+        perRow = self.getMaterialsPerRow()
         height = math.ceil(count / perRow) * self.cellHeight
 
         cmds.flowLayout("RPRMaterialsFlow", edit=True, height=height)
 
-        # Adjust the form to be narrower than the tab that
-        # contains it. This is required so the form doesn't
-        # prevent the tab layout shrinking.
-        materialsWidth = cmds.tabLayout(self.materialsTab, query=True, width=True)
-        newMaterialsWidth = max(1, materialsWidth - 10 * self.uiMayaScaleCoeff)
-
         # Update the preview layout.
         self.updatePreviewLayout()
 
@@ -534,13 +729,20 @@ class RPRMaterialBrowser(object) :
     # -----------------------------------------------------------------------------
     def updateMaterialIconSize(self, *args) :
 
-        # Calculate the new icon size and repopulate the view.
+        # Calculate the new icon size and repopulate the view. Drag
+        # ticks that don't change the value don't rebuild anything.
         value = cmds.intSlider(self.iconSizeSlider, query=True, value=True)
+        if pow(2, value + 4) == self.iconSize :
+            return False
+
         self.setMaterialIconSize(value)
         self.populateMaterials()
 
-        # Save the size setting to user preferences.
-        cmds.optionVar(intValue=['RPRIconSize', value])
+    # Save the size setting once the slider is released.
+    # -----------------------------------------------------------------------------
+    def onIconSizeChanged(self, *args) :
+        self.uiScheduler.request("rebuild")
+        cmds.optionVar(intValue=['RPRIconSize', cmds.intSlider(self.iconSizeSlider, query=True, value=True)])
 
 
     # Set the size of the material icons.
@@ -586,16 +788,17 @@ class RPRMaterialBrowser(object) :
         if (len(searchString) < 2 or searchString.isspace()) :
             return
 
-        # Set current materials to the search result.
-        self.materials = []
+        # Set the result set to the search result.
+        self.resultSet = []
+        self.resultScope = ("search", searchString)
 
         for material in self.materialListData:
             if (searchString in material["title"].lower()) :
-                self.materials.append(material)
+                self.resultSet.append(material)
             else :
                 for tagId in material["tags"] :
                     if (searchString == self.tagDict[tagId].lower()) :
-                        self.materials.append(material)
+                        self.resultSet.append(material)
                         break;
 
         # Repopulate the material view.
@@ -605,17 +808,26 @@ class RPRMaterialBrowser(object) :
     # -----------------------------------------------------------------------------
 
     def populateMaterials(self) :
-        self.nonSortedMaterials = self.materials.copy()
         self.sortMaterials(cmds.optionMenu(self.sortDropdown, q=True, select=True))
         self.populateMaterialsInternal()
 
     def threadProcDownloadThumbnail(self, render_id, fileName) :
-        self.matlibClient.renders.download_thumbnail(render_id, None, self.pathRootThumbnail, fileName)
+        # Other Maya sessions may be fetching the same thumbnail, or a studio cache tier may have it.
+        def fetch(partPath) :
+            self.matlibClient.renders.download_thumbnail(render_id, None, self.pathRootThumbnail, os.path.basename(partPath))
+
+        try :
+            self.cacheTiers.get(fileName, fetch)
+        except Exception as e :
+            print("ML Log: ERROR: couldn't download thumbnail " + render_id + ": " + str(e))
 
     def downloadThumbnails(self) :
         threadCount = 0
         progressBarShown = False
 
+        self.loadAtlasTiles()
+        atlasCategories = set()
+
         threads = []        
         for material in self.materials :
             fileName = self.getMaterialFileName(material)
@@ -624,6 +836,12 @@ class RPRMaterialBrowser(object) :
             # Checks if end condition has been reached
             render_id = material["renders_order"][0]
 
+            # Thumbnails from an atlas need no file check.
+            if render_id in self.tilePaths :
+                continue
+
+            atlasCategories.add(material["category"])
+
             if (not os.path.isfile(imageFileName)) :
                 if (not progressBarShown) : 
                     cmds.progressWindow( title='Opening materials ', progress=0, status='opening: 0%', isInterruptable=False )
@@ -641,6 +859,10 @@ class RPRMaterialBrowser(object) :
 
         if (progressBarShown) : 
             cmds.progressWindow( endProgress=1 )
+
+        # Pack the thumbnails of categories not fully covered by an atlas yet.
+        for categoryId in atlasCategories :
+            self.atlasStore.build_async(categoryId, [m["renders_order"][0] for m in self.materialByCategory[categoryId]])
       
 
     def populateMaterialsInternal(self) :
@@ -660,9 +882,8 @@ class RPRMaterialBrowser(object) :
 
         # Add materials for the selected category.
         for material in self.materials :
-            fileName = self.getMaterialFileName(material)
             cmd = partial(self.selectMaterial, materialIndex)
-            imageFileName = self.getMaterialFullPath(fileName)
+            imageFileName = self.getThumbnailPath(material)
 
             materialName = material["title"]
 
@@ -693,6 +914,9 @@ class RPRMaterialBrowser(object) :
         # Perform an initial layout update.
         self.updateMaterialsLayout()
 
+        self.prefetchPackageLists()
+        memoryReport.mark("browser.populate")
+
 
     # Import the currently selected material into Maya.
     # -----------------------------------------------------------------------------
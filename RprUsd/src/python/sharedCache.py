@@ -0,0 +1,197 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Coordination of cache writes between Maya and mayapy processes sharing a cache directory.
+
+single_flight lets one process fetch a file while the others wait on a file
+lock and then read the result. Files are written under a private name and
+moved into place with os.replace, so readers never see a partial file. The
+catalog snapshot is a JSON file readers parse straight from a memory mapping.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+import jsonStream
+
+LOCK_DIRECTORY = ".locks"
+
+# Locks are striped over this many files per cache directory instead of one lock file per key.
+LOCK_STRIPES = 256
+
+LOCK_POLL_INTERVAL = 0.05
+LOCK_TIMEOUT = 120.0
+
+SNAPSHOT_VERSION = 1
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _try_lock(file):
+        try:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(file):
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class FileLock:
+    """ Exclusive lock held through an OS file lock, so it works across processes and threads. """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self, timeout: float = LOCK_TIMEOUT):
+        """ Wait for the lock up to `timeout` seconds (0 tries once), return whether it was acquired. """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        file = open(self.path, 'a+b')
+        deadline = time.monotonic() + timeout
+        while not _try_lock(file):
+            if time.monotonic() >= deadline:
+                file.close()
+                return False
+            time.sleep(LOCK_POLL_INTERVAL)
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            try:
+                _unlock(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError("couldn't lock " + self.path)
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def get_lock_path(path: str):
+    """ Striped lock file guarding a cache file. """
+    directory, name = os.path.split(os.path.abspath(path))
+    stripe = int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:8], 16) % LOCK_STRIPES
+    return os.path.join(directory, LOCK_DIRECTORY, "{:03d}.lock".format(stripe))
+
+
+def get_part_path(path: str):
+    """ Private file name for writing `path`, unique per process and thread. """
+    return "{}.{}.{}.part".format(path, os.getpid(), threading.get_ident())
+
+
+def replace(source: str, target: str, attempts: int = 20):
+    # On Windows a reader holding the target open or mapped makes the replace fail for a moment.
+    for attempt in range(attempts):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(LOCK_POLL_INTERVAL)
+
+
+def is_fresh(path: str, max_age: float = None):
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return False
+    return max_age is None or time.time() - mtime < max_age
+
+
+def single_flight(path: str, fetch: Callable, max_age: float = None, wait: bool = True):
+    """ Make sure `path` exists, fetching it in at most one process at a time.
+
+    :param path: cache file
+    :param fetch: callable writing the content to the file name it is given; raising aborts the fetch
+    :param max_age: seconds after which an existing file is fetched again, None keeps it forever
+    :param wait: wait for another process fetching the same file; if False, return None when it is busy
+    :return: path, or None if wait is False and the file is being fetched elsewhere
+    """
+    if is_fresh(path, max_age):
+        return path
+
+    lock = FileLock(get_lock_path(path))
+    if not lock.acquire(LOCK_TIMEOUT if wait else 0):
+        if not wait:
+            return None
+        # A stuck process must not block everyone; the atomic replace still protects readers.
+        print("ML Log: WARNING: timed out waiting for " + lock.path + ", fetching without it")
+
+    try:
+        # Another process may have finished the file while we were waiting.
+        if is_fresh(path, max_age):
+            return path
+
+        partPath = get_part_path(path)
+        try:
+            fetch(partPath)
+            replace(partPath, path)
+        finally:
+            if os.path.exists(partPath):
+                os.remove(partPath)
+        return path
+    finally:
+        lock.release()
+
+
+def write_snapshot(path: str, sections: Dict[str, list], metadata: Dict = None):
+    """ Write a catalog snapshot: a JSON object with one array per section plus metadata. """
+    data = dict(metadata or {})
+    data['version'] = SNAPSHOT_VERSION
+    data['created'] = time.time()
+    data.update(sections)
+
+    with open(path, 'w', encoding="utf-8") as file:
+        json.dump(data, file, separators=(',', ':'))
+
+
+def read_snapshot(path: str, sections) -> Dict[str, list]:
+    """ Parse the given sections of a snapshot from a read-only memory mapping of the file.
+
+    Mapped pages are shared with every other process reading the same snapshot.
+    All sections are decoded in one pass; the parser copies the mapping chunk by
+    chunk, so besides the records only a chunk of the file is private at a time.
+
+    :raises KeyError: if the snapshot lacks one of the sections
+    """
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            return jsonStream.read_arrays(mapping, sections)
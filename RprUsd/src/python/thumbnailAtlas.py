@@ -0,0 +1,198 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-category thumbnail atlases.
+
+An atlas packs the encoded thumbnails of one category into a single file:
+
+    magic (8 bytes) | index length (uint32 LE) | JSON index | tile data
+
+The index maps render ids to [offset, size] within the tile data. Opening a
+category reads its atlas with one sequential read instead of hundreds of
+stat/open calls on a possibly roaming cache directory. Maya image controls
+take file paths, so tiles are written once per session to a local temp
+directory and the grid points at those.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
+
+import sharedCache
+
+ATLAS_MAGIC = b"RPRATLS1"
+_HEADER = struct.Struct("<8sI")
+
+
+def write_atlas(path: str, tiles: Dict[str, bytes]):
+    """ Write tiles to an atlas file, replacing any previous atlas atomically. """
+    index = dict()
+    offset = 0
+    for render_id, data in tiles.items():
+        index[render_id] = [offset, len(data)]
+        offset += len(data)
+
+    indexData = json.dumps(index, separators=(',', ':')).encode("utf-8")
+    partPath = "{}.{}.part".format(path, threading.get_ident())
+    try:
+        with open(partPath, 'wb') as file:
+            file.write(_HEADER.pack(ATLAS_MAGIC, len(indexData)))
+            file.write(indexData)
+            for data in tiles.values():
+                file.write(data)
+        os.replace(partPath, path)
+    finally:
+        if os.path.exists(partPath):
+            os.remove(partPath)
+
+
+def read_atlas(path: str) -> Dict[str, memoryview]:
+    """ Read an atlas with a single read, return tiles by render id. Raises ValueError on a damaged file. """
+    with open(path, 'rb') as file:
+        data = memoryview(file.read())
+
+    if len(data) < _HEADER.size:
+        raise ValueError("truncated atlas " + path)
+    magic, indexSize = _HEADER.unpack_from(data)
+    if magic != ATLAS_MAGIC:
+        raise ValueError("not an atlas " + path)
+
+    start = _HEADER.size + indexSize
+    index = json.loads(bytes(data[_HEADER.size:start]).decode("utf-8"))
+
+    tiles = dict()
+    for render_id, (offset, size) in index.items():
+        if start + offset + size > len(data):
+            raise ValueError("truncated atlas " + path)
+        tiles[render_id] = data[start + offset:start + offset + size]
+    return tiles
+
+
+class AtlasStore:
+    """ Atlases of a thumbnail cache directory and the local tiles materialized from them. """
+
+    def __init__(self, cache_dir: str, tile_dir: str = None):
+        """
+        :param cache_dir: thumbnail cache with <render id>.png files; atlases go to <cache_dir>/Atlases
+        :param tile_dir: local directory receiving materialized tiles, a temp directory by default
+        """
+        self._cache_dir = cache_dir
+        self._atlas_dir = os.path.join(cache_dir, "Atlases")
+        self._tile_dir = tile_dir or os.path.join(tempfile.gettempdir(), "RprUsdThumbnailTiles")
+        self._lock = threading.Lock()
+        self._materialized = dict()
+        self._building = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='RprUsdAtlas')
+        os.makedirs(self._atlas_dir, exist_ok=True)
+        os.makedirs(self._tile_dir, exist_ok=True)
+
+    @property
+    def atlas_dir(self):
+        return self._atlas_dir
+
+    @property
+    def tile_dir(self):
+        return self._tile_dir
+
+    def get_atlas_path(self, category_id: str):
+        return os.path.join(self._atlas_dir, category_id + ".atlas")
+
+    def get_tile_path(self, render_id: str):
+        return os.path.join(self._tile_dir, render_id + ".png")
+
+    def materialize(self, category_id: str) -> Dict[str, str]:
+        """ Local tile paths by render id for the thumbnails in the category's atlas, empty if there is none. """
+        with self._lock:
+            if category_id in self._materialized:
+                return self._materialized[category_id]
+
+        try:
+            tiles = read_atlas(self.get_atlas_path(category_id))
+        except FileNotFoundError:
+            return dict()
+        except (OSError, ValueError) as e:
+            print("ML Log: WARNING: ignoring thumbnail atlas of category " + category_id + ": " + str(e))
+            return dict()
+
+        paths = dict()
+        for render_id, data in tiles.items():
+            path = self.get_tile_path(render_id)
+            # The tile directory is shared by all Maya sessions, another one may be showing this tile.
+            partPath = sharedCache.get_part_path(path)
+            try:
+                with open(partPath, 'wb') as file:
+                    file.write(data)
+                sharedCache.replace(partPath, path)
+            except OSError:
+                continue
+            finally:
+                if os.path.exists(partPath):
+                    os.remove(partPath)
+            paths[render_id] = path
+
+        with self._lock:
+            self._materialized[category_id] = paths
+        return paths
+
+    def build_async(self, category_id: str, render_ids: Iterable[str]):
+        """ Pack the cached thumbnails of a category into its atlas in the background.
+
+        Thumbnails missing from the cache are left out; the atlas is rebuilt on a
+        later call once the category has more of them than the atlas holds.
+        """
+        render_ids = list(render_ids)
+        with self._lock:
+            if category_id in self._building:
+                return None
+            self._building.add(category_id)
+        return self._executor.submit(self._build, category_id, render_ids)
+
+    def invalidate(self, category_id: str):
+        with self._lock:
+            self._materialized.pop(category_id, None)
+
+    def _build(self, category_id: str, render_ids):
+        try:
+            atlasPath = self.get_atlas_path(category_id)
+            try:
+                existing = read_atlas(atlasPath)
+            except (OSError, ValueError):
+                existing = dict()
+
+            tiles = dict()
+            for render_id in render_ids:
+                if render_id in existing:
+                    tiles[render_id] = existing[render_id]
+                    continue
+                try:
+                    with open(os.path.join(self._cache_dir, render_id + ".png"), 'rb') as file:
+                        tiles[render_id] = file.read()
+                except OSError:
+                    pass
+
+            if not tiles or len(tiles) <= len(existing.keys() & tiles.keys()):
+                return False
+
+            write_atlas(atlasPath, tiles)
+            self.invalidate(category_id)
+            return True
+        except Exception as e:
+            print("ML Log: WARNING: couldn't build thumbnail atlas of category " + category_id + ": " + str(e))
+            return False
+        finally:
+            with self._lock:
+                self._building.discard(category_id)
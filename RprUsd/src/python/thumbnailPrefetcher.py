@@ -0,0 +1,300 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Idle-time prefetch of material thumbnails for categories not opened yet.
+
+Workers only start a download while Maya reports idle: an idle scriptJob
+renews a short lease and user activity events revoke it, which also cancels
+running downloads at their next block. Categories are walked in order of
+recent visits, then by material count, within a bandwidth and worker budget.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable, List
+
+import sharedCache
+
+RECENT_CATEGORIES_OPTION_VAR = "RprUsd_RecentCategories"
+PREFETCH_ENABLED_OPTION_VAR = "RprUsd_ThumbnailPrefetch"
+PREFETCH_LIMIT_OPTION_VAR = "RprUsd_ThumbnailPrefetchLimit"
+
+RECENT_CATEGORIES_COUNT = 10
+
+# Maya events taken as user activity.
+ACTIVITY_EVENTS = ("SelectionChanged", "ToolChanged", "timeChanged", "Undo", "DragRelease")
+
+g_Prefetcher = None
+g_ScriptJobs = []
+
+
+def order_categories(catalog, recent_ids: Iterable[str] = ()) -> List[str]:
+    """ Category ids ordered by likely use: recently visited first, then the largest categories.
+
+    :param catalog: catalogService.MatlibCatalog
+    :param recent_ids: category ids, most recent first
+    """
+    ordered = [i for i in recent_ids if i in catalog.categoryDict]
+    others = [c["id"] for c in catalog.categories if c["id"] not in ordered]
+    others.sort(key=lambda i: len(catalog.materialByCategory.get(i, ())), reverse=True)
+    return ordered + others
+
+
+class ThumbnailPrefetcher:
+    """ Downloads queued thumbnails into the cache while the idle lease is valid. """
+
+    def __init__(self, client, cache_dir: str, max_workers: int = 2, bandwidth_limit: int = 1024 * 1024,
+                 idle_lease: float = 0.5, tiers=None):
+        """
+        :param client: MatlibClient
+        :param cache_dir: thumbnail cache directory, files are named <render id>.png
+        :param max_workers: number of parallel downloads
+        :param bandwidth_limit: bytes per second for all workers, 0 means unlimited
+        :param idle_lease: seconds a single idle notification allows downloads to start
+        :param tiers: optional cacheTiers.TieredCache whose local tier is cache_dir, consulted before downloading
+        """
+        self._client = client
+        self._cache_dir = cache_dir
+        self._idle_lease = idle_lease
+        self._tiers = tiers
+        self.bandwidth_limit = bandwidth_limit
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._queued = set()
+        self._active = 0
+        self._idle_until = 0.0
+        self._stopped = False
+        self._bucket_time = time.monotonic()
+        self._bucket_bytes = 0.0
+        self.stats = {'downloaded': 0, 'present': 0, 'interrupted': 0, 'busy': 0, 'failed': 0, 'bytes': 0}
+
+        self._workers = [
+            threading.Thread(target=self._worker, name='RprUsdThumbnailPrefetch{}'.format(i), daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def get_path(self, render_id: str):
+        return os.path.join(self._cache_dir, render_id + ".png")
+
+    def enqueue(self, render_ids: Iterable[str]):
+        with self._condition:
+            for render_id in render_ids:
+                if render_id not in self._queued:
+                    self._queued.add(render_id)
+                    self._queue.append(render_id)
+            self._condition.notify_all()
+
+    def is_empty(self):
+        """ True once nothing is queued or downloading. """
+        with self._condition:
+            return not self._queue and not self._active
+
+    def notify_idle(self):
+        """ Allow downloads to start for the next `idle_lease` seconds. """
+        with self._condition:
+            self._idle_until = time.monotonic() + self._idle_lease
+            self._condition.notify_all()
+
+    def notify_activity(self, *args):
+        """ Revoke the idle lease; running downloads are abandoned at their next block. """
+        with self._condition:
+            self._idle_until = 0.0
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+    def _is_idle(self):
+        return time.monotonic() < self._idle_until
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not (self._queue and self._is_idle()):
+                    # Re-check periodically, the lease expires without a notification.
+                    self._condition.wait(self._idle_lease)
+                if self._stopped:
+                    return
+                render_id = self._queue.popleft()
+                self._active += 1
+
+            try:
+                self._fetch(render_id)
+            finally:
+                with self._condition:
+                    self._active -= 1
+
+    def _fetch(self, render_id: str):
+        path = self.get_path(render_id)
+        if os.path.isfile(path):
+            self._count('present')
+            return
+
+        received = [0]
+        interrupted = [False]
+
+        def progress(size, length):
+            with self._condition:
+                if not self._is_idle() or self._stopped:
+                    interrupted[0] = True
+                    return False
+                delay = self._throttle(size - received[0])
+            received[0] = size
+            if delay > 0:
+                time.sleep(delay)
+            return True
+
+        def fetch(partPath):
+            self._client.renders.download_thumbnail(render_id, progress, self._cache_dir, os.path.basename(partPath))
+            if interrupted[0]:
+                raise InterruptedError()
+
+        busy = False
+        try:
+            # Don't wait on a lock held by another process. Locks are striped, so a busy lock may
+            # guard a different file and this thumbnail is only put back into the queue.
+            if self._tiers is not None:
+                result = self._tiers.get(os.path.basename(path), fetch, wait=False)
+            else:
+                result = sharedCache.single_flight(path, fetch, wait=False)
+            if result is None:
+                busy = True
+            # Nothing received means another process fetched it or it was copied from a shared tier.
+            elif not received[0]:
+                self._count('present')
+            else:
+                self._count('downloaded', received[0])
+        except Exception as e:
+            if not interrupted[0]:
+                print("ML Log: WARNING: couldn't prefetch thumbnail " + render_id + ": " + str(e))
+                self._count('failed')
+
+        if interrupted[0]:
+            # Put it back so the next idle period picks it up first.
+            self._count('interrupted')
+            with self._condition:
+                if not self._stopped:
+                    self._queue.appendleft(render_id)
+        elif busy:
+            # Retry after the rest of the queue, pausing like a waiting lock so a lone entry doesn't spin.
+            self._count('busy')
+            with self._condition:
+                if not self._stopped:
+                    self._queue.append(render_id)
+            time.sleep(sharedCache.LOCK_POLL_INTERVAL)
+
+    def _throttle(self, size: int):
+        # Token bucket, called with the condition held.
+        if not self.bandwidth_limit:
+            return 0.0
+
+        now = time.monotonic()
+        self._bucket_bytes = max(0.0, self._bucket_bytes - (now - self._bucket_time) * self.bandwidth_limit)
+        self._bucket_time = now
+        self._bucket_bytes += size
+        return max(0.0, self._bucket_bytes / self.bandwidth_limit - 1.0)
+
+    def _count(self, key: str, size: int = 0):
+        with self._condition:
+            self.stats[key] += 1
+            self.stats['bytes'] += size
+
+
+# Maya integration.
+# -----------------------------------------------------------------------------
+def getRecentCategories():
+    import maya.cmds as cmds
+
+    if not cmds.optionVar(exists=RECENT_CATEGORIES_OPTION_VAR):
+        return []
+    return list(cmds.optionVar(query=RECENT_CATEGORIES_OPTION_VAR) or [])
+
+
+def recordCategoryVisit(categoryId: str):
+    """ Remember a visited category so later sessions prefetch it first. """
+    import maya.cmds as cmds
+
+    recent = [categoryId] + [i for i in getRecentCategories() if i != categoryId]
+    cmds.optionVar(clearArray=RECENT_CATEGORIES_OPTION_VAR)
+    for i in recent[:RECENT_CATEGORIES_COUNT]:
+        cmds.optionVar(stringValueAppend=(RECENT_CATEGORIES_OPTION_VAR, i))
+
+
+def notifyActivity():
+    if g_Prefetcher is not None:
+        g_Prefetcher.notify_activity()
+
+
+def start(service):
+    """ Queue the thumbnails of the loaded catalog and prefetch them whenever Maya is idle.
+
+    :param service: catalogService.CatalogService with a loaded catalog
+    """
+    global g_Prefetcher
+    import maya.cmds as cmds
+
+    if cmds.optionVar(exists=PREFETCH_ENABLED_OPTION_VAR) and not cmds.optionVar(query=PREFETCH_ENABLED_OPTION_VAR):
+        return
+
+    catalog = service.get_catalog()
+    if catalog is None or g_Prefetcher is not None:
+        return
+
+    limit = 1024 * 1024
+    if cmds.optionVar(exists=PREFETCH_LIMIT_OPTION_VAR):
+        limit = int(cmds.optionVar(query=PREFETCH_LIMIT_OPTION_VAR) * 1024 * 1024)
+
+    g_Prefetcher = ThumbnailPrefetcher(service.client, service.cache_dir, bandwidth_limit=limit, tiers=service.tiers)
+    for categoryId in order_categories(catalog, getRecentCategories()):
+        g_Prefetcher.enqueue(m["renders_order"][0] for m in catalog.materialByCategory.get(categoryId, ())
+                             if m.get("renders_order"))
+
+    g_ScriptJobs.append(cmds.scriptJob(idleEvent=_onIdle))
+    for event in ACTIVITY_EVENTS:
+        g_ScriptJobs.append(cmds.scriptJob(event=(event, notifyActivity)))
+
+
+def stop():
+    global g_Prefetcher
+    import maya.cmds as cmds
+
+    for job in g_ScriptJobs:
+        if cmds.scriptJob(exists=job):
+            cmds.scriptJob(kill=job, force=True)
+    del g_ScriptJobs[:]
+
+    if g_Prefetcher is not None:
+        g_Prefetcher.stop()
+        g_Prefetcher = None
+
+
+def _onIdle():
+    # An idle scriptJob keeps Maya busy, so it is removed once everything is fetched.
+    # Maya must not kill a job from inside its own callback, the kill is deferred.
+    if g_Prefetcher is None or g_Prefetcher.is_empty():
+        import maya.utils
+        maya.utils.executeDeferred(lambda prefetcher=g_Prefetcher: _stopIfCurrent(prefetcher))
+        return
+    g_Prefetcher.notify_idle()
+
+
+def _stopIfCurrent(prefetcher):
+    # Idle events queue several deferred stops, those must not stop a prefetcher started since.
+    if g_Prefetcher is prefetcher:
+        stop()
@@ -0,0 +1,67 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import maya.utils
+
+# Coalesces UI updates requested by control callbacks (slider drags, pane
+# resizes, separator moves) into one pass on the next Maya idle.
+#
+# Passes are registered from the most to the least expensive. A pass lists
+# the cheaper passes it already performs, so a full rebuild requested in the
+# same frame as a resize runs once and the resize is dropped. Callbacks read
+# the current control state when they run, so only the latest state is applied.
+# -----------------------------------------------------------------------------
+class UiScheduler(object) :
+
+    def __init__(self, isAlive=None, defer=None) :
+        """
+        :param isAlive: callable returning False once the owning window is gone; pending passes are then dropped
+        :param defer: function scheduling a callable on the main thread, maya.utils.executeDeferred by default
+        """
+        self.isAlive = isAlive
+        self.defer = defer or maya.utils.executeDeferred
+        self.passes = []
+        self.pending = set()
+        self.flushScheduled = False
+        self.stats = {"requested": 0, "run": 0}
+
+    def addPass(self, name, callback, covers=()) :
+        self.passes.append((name, callback, tuple(covers)))
+
+    def request(self, name, *args) :
+        # Control callbacks pass their own arguments, which are not needed.
+        self.stats["requested"] += 1
+        self.pending.add(name)
+
+        if not self.flushScheduled :
+            self.flushScheduled = True
+            self.defer(self.flush)
+
+    def flush(self) :
+        self.flushScheduled = False
+        pending, self.pending = self.pending, set()
+
+        if self.isAlive is not None and not self.isAlive() :
+            return
+
+        done = set()
+        for name, callback, covers in self.passes :
+            if name not in pending or name in done :
+                continue
+
+            result = callback()
+            self.stats["run"] += 1
+            done.add(name)
+
+            # A pass returning False did nothing, the cheaper passes still run.
+            if result is not False :
+                done.update(covers)
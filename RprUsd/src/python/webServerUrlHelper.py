@@ -1,7 +1,27 @@
+import os
+
 from client import MatlibClient
 
 g_WebMatXServerUrl = "https://api.matlib.gpuopen.com"
 
+# Optional studio mirror built with matlibMirror.py (http(s):// or file:// URL).
+g_WebMatXMirrorUrl = os.environ.get("RPRUSD_MATLIB_MIRROR") or None
+
+def getThroughputFile():
+    # Shared by the browser and the headless tools so both pick resolutions from the same measurements.
+    import cacheTiers
+    return os.path.join(cacheTiers.getUserDirectory(), "downloadThroughput.json")
+
+def createMatlibClient():
+    return MatlibClient(g_WebMatXServerUrl, mirror=g_WebMatXMirrorUrl, throughput_file=getThroughputFile())
+
 def getMatXNameByIdWithoutBrowserRunning(uid):
-    matlibClient = MatlibClient(g_WebMatXServerUrl)    
-    return matlibClient.materials._get_by_id(uid)["mtlx_material_name"]
+    # Farm nodes resolve names from an offline bundle manifest, see matlibBundle.
+    import matlibBundle
+    entry = matlibBundle.lookup_material(uid)
+    if entry is not None:
+        return entry["name"]
+
+    # The catalog service shares its client and records with the browsers.
+    import catalogService
+    return catalogService.getCatalogService().get_material(uid)["mtlx_material_name"]
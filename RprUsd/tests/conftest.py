@@ -0,0 +1,25 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Tests of the Maya-independent Python modules:
+
+    python -m pytest RprUsd/tests
+"""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+BENCHMARKS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+sys.path.insert(0, SCRIPTS_DIR)
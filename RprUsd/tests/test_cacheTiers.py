@@ -0,0 +1,111 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+import cacheTiers
+from cacheTiers import CacheTier, TieredCache
+
+
+def make_cache(tmp_path, *shared):
+    tiers = [CacheTier(cacheTiers.TIER_LOCAL, str(tmp_path / "local"), True)]
+    tiers += [CacheTier(name, str(tmp_path / name), writable) for name, writable in shared]
+    return TieredCache(tiers)
+
+
+class Fetch:
+
+    def __init__(self, data=b"fetched"):
+        self.data = data
+        self.count = 0
+
+    def __call__(self, part_path):
+        self.count += 1
+        with open(part_path, 'wb') as file:
+            file.write(self.data)
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_first_tier_must_be_writable(tmp_path):
+    with pytest.raises(ValueError):
+        TieredCache([CacheTier("local", str(tmp_path), False)])
+
+
+def test_fetch_publishes_to_writable_tiers(tmp_path):
+    cache = make_cache(tmp_path, ("studio", True), ("archive", False))
+    fetch = Fetch()
+
+    path = cache.get("a.png", fetch)
+    assert path == os.path.join(str(tmp_path / "local"), "a.png")
+    assert read(path) == b"fetched"
+    assert read(str(tmp_path / "studio" / "a.png")) == b"fetched"
+    assert not (tmp_path / "archive" / "a.png").exists()
+
+    assert cache.get("a.png", fetch) == path
+    assert fetch.count == 1
+
+
+def test_shared_hit_is_promoted_with_its_age(tmp_path):
+    cache = make_cache(tmp_path, ("studio", True), ("archive", False))
+    archived = tmp_path / "archive" / "b.png"
+    archived.parent.mkdir()
+    archived.write_bytes(b"archived")
+    os.utime(str(archived), (2000, 2000))
+    fetch = Fetch()
+
+    path = cache.get("b.png", fetch)
+    assert read(path) == b"archived" and os.path.getmtime(path) == 2000
+    assert read(str(tmp_path / "studio" / "b.png")) == b"archived"
+    assert fetch.count == 0
+
+    stats = {item['tier']: item for item in cache.get_stats()}
+    assert (stats["local"]['lookups'], stats["local"]['hits']) == (1, 0)
+    assert (stats["studio"]['lookups'], stats["studio"]['hits']) == (1, 0)
+    assert (stats["archive"]['lookups'], stats["archive"]['hits']) == (1, 1)
+    assert stats[cacheTiers.TIER_NETWORK]['lookups'] == 0
+
+
+def test_stale_shared_file_is_fetched(tmp_path):
+    cache = make_cache(tmp_path, ("archive", False))
+    archived = tmp_path / "archive" / "catalog.json"
+    archived.parent.mkdir()
+    archived.write_bytes(b"archived")
+    os.utime(str(archived), (1000, 1000))
+    fetch = Fetch()
+
+    assert read(cache.get("catalog.json", fetch, max_age=60)) == b"fetched"
+    assert fetch.count == 1
+    # Read-only tiers are left alone.
+    assert read(str(archived)) == b"archived"
+
+
+def test_parse_tiers():
+    value = os.pathsep.join(["rw=/studio/matlib", "ro=/archive", "/plain", " "])
+    tiers = cacheTiers.parse_tiers(value)
+    assert [(tier.name, tier.path, tier.writable) for tier in tiers] == [
+        ("shared 1", "/studio/matlib", True), ("shared 2", "/archive", False), ("shared 3", "/plain", False)]
+    assert cacheTiers.parse_tiers(None) == []
+
+
+def test_format_stats(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.get("a.png", Fetch())
+    lines = cacheTiers.format_stats(cache.get_stats()).splitlines()
+    assert lines[0].split()[:2] == ["tier", "lookups"]
+    assert lines[1].split()[:4] == ["local", "1", "0", "0.0%"]
+    assert lines[2].split()[:4] == ["network", "1", "1", "100.0%"]
@@ -0,0 +1,138 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import catalogService
+
+
+def no_client():
+    raise AssertionError("the service must not create a client")
+
+
+def make_catalog():
+    categories = [{"id": "c1", "title": "Wood"}, {"id": "c2", "title": "Metal"}]
+    tags = [{"id": "t1", "title": "oak"}]
+    materials = [{"id": "m%d" % i, "title": "Material %d" % i, "mtlx_material_name": "Material_%d" % i, "category": "c1"}
+                 for i in range(3)]
+    return catalogService.MatlibCatalog(categories, tags, materials)
+
+
+def test_set_catalog_skips_loading(tmp_path):
+    service = catalogService.CatalogService(no_client, str(tmp_path))
+    catalog = make_catalog()
+    service.set_catalog(catalog)
+
+    assert service.get_catalog() is catalog
+    assert service.load(timeout=1) is catalog
+    assert service.get_material("m1")["mtlx_material_name"] == "Material_1"
+    assert catalog.materialByCategory["c2"] == []
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.materials = self
+        self.calls = []
+
+    def get(self, material_id):
+        self.calls.append(material_id)
+        return {"id": material_id, "title": "Detail", "mtlx_material_name": "Detail_Name"}
+
+
+def test_get_material_fetches_missing_details(tmp_path):
+    client = FakeClient()
+    service = catalogService.CatalogService(lambda: client, str(tmp_path))
+    service.set_catalog(catalogService.MatlibCatalog([], [], [{"id": "m1", "title": "Material 1", "category": "c1"}]))
+
+    assert service.get_material("m1")["mtlx_material_name"] == "Detail_Name"
+    assert service.get_material("m1")["mtlx_material_name"] == "Detail_Name"
+    assert client.calls == ["m1"]
+
+
+def test_set_listing_skips_fetching(tmp_path):
+    service = catalogService.CatalogService(no_client, str(tmp_path))
+    url = "https://example.com/storage/api/lights/?limit=50"
+    service.set_listing(url, [{"id": "light"}])
+    assert service.get_listing(url) == [{"id": "light"}]
+
+
+def make_sort_catalog():
+    materials = [
+        {"id": "a", "title": "oak", "material_type": "Wood", "license": "CC0", "category": "c1"},
+        {"id": "b", "title": "Ébène", "material_type": "Wood", "license": "MIT", "category": "c1"},
+        {"id": "c", "title": "Brass", "material_type": "Metal", "license": "CC0", "category": "c2"},
+        {"id": "d", "title": "ash", "material_type": "Wood", "license": "CC0", "category": "c2"},
+    ]
+    return catalogService.MatlibCatalog([{"id": "c1"}, {"id": "c2"}], [], materials)
+
+
+def ids(materials):
+    return [m["id"] for m in materials]
+
+
+def test_collation_key_ignores_case_and_accents():
+    assert catalogService.collation_key("Ébène") < catalogService.collation_key("Oak")
+    assert catalogService.collation_key("ebene") < catalogService.collation_key("Ébène")
+    assert sorted(["b", "A", "á"], key=catalogService.collation_key) == ["A", "á", "b"]
+
+
+def test_get_sort_order():
+    catalog = make_sort_catalog()
+    assert ids(catalog.get_sort_order("title")) == ["d", "c", "b", "a"]
+    assert ids(catalog.get_sort_order("type")) == ["c", "d", "b", "a"]
+    assert ids(catalog.get_sort_order("license")) == ["d", "c", "a", "b"]
+    assert catalog.get_sort_order("title") is catalog.get_sort_order("title")
+
+    with pytest.raises(ValueError):
+        catalog.get_sort_order("color")
+
+
+def test_size_order_follows_recorded_sizes():
+    catalog = make_sort_catalog()
+    assert ids(catalog.get_sort_order("size")) == ["d", "c", "b", "a"]
+
+    catalog.set_package_size("a", 100)
+    catalog.set_package_size("b", None)
+    assert catalog.has_package_size("b") and not catalog.has_package_size("c")
+    # Known sizes first, materials without packages or unknown sizes after them in title order.
+    assert ids(catalog.get_sort_order("size")) == ["a", "d", "c", "b"]
+
+    catalog.set_package_size("c", 50)
+    assert ids(catalog.get_sort_order("size")) == ["c", "a", "d", "b"]
+
+
+def test_get_sorted_picks_the_result_set():
+    catalog = make_sort_catalog()
+    category = catalog.materialByCategory["c2"]
+    sortedSet = catalog.get_sorted(category, "title", ("category", "c2"))
+    assert ids(sortedSet) == ["d", "c"]
+    assert catalog.get_sorted(category, "title", ("category", "c2")) is sortedSet
+    assert ids(catalog.get_sorted(category, "title", ("category", "c2"), reverse=True)) == ["c", "d"]
+
+    # A permutation sorted by size is recomputed once more sizes are known.
+    assert ids(catalog.get_sorted(category, "size", ("category", "c2"))) == ["d", "c"]
+    catalog.set_package_size("c", 10)
+    assert ids(catalog.get_sorted(category, "size", ("category", "c2"))) == ["c", "d"]
+
+
+def test_reversed_view():
+    view = catalogService.ReversedView([1, 2, 3, 4])
+    assert len(view) == 4
+    assert list(view) == [4, 3, 2, 1]
+    assert view[0] == 4 and view[-1] == 1
+    assert view[1:3] == [3, 2]
+    assert view[::2] == [4, 2]
+    assert view.copy() == [4, 3, 2, 1]
+    assert 3 in view and view.index(3) == 1
+    with pytest.raises(IndexError):
+        view[4]
@@ -0,0 +1,144 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import os
+import pathlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from client import MatlibClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Serves every path from `routes` as JSON: {path: record}.
+
+    With `chunked` set, bodies use HTTP/1.1 chunked transfer encoding, optionally gzip-compressed.
+    """
+
+    protocol_version = "HTTP/1.1"
+    routes = dict()
+    chunked = False
+    gzipped = False
+
+    def do_GET(self):
+        record = self.routes.get(self.path.split('?')[0])
+        if record is None:
+            self.send_error(404)
+            return
+        body = json.dumps(record).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.gzipped:
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        if not self.chunked:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for offset in range(0, len(body), 5):
+            chunk = body[offset:offset + 5]
+            self.wfile.write("{:x}\r\n".format(len(chunk)).encode("ascii") + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_mirror_first_with_upstream_fallback(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(Handler, "routes", {"/api/materials/abc/": {"id": "abc", "source": "upstream"},
+                                            "/api/materials/def/": {"id": "def", "source": "upstream"}})
+    client = MatlibClient(server, mirror=pathlib.Path(str(tmp_path)).as_uri())
+
+    url = client.materials._get_by_id_url("abc")
+    mirrorPath = os.path.join(str(tmp_path), *client.session.get_mirror_path(url).split('/'))
+    os.makedirs(os.path.dirname(mirrorPath))
+    with open(mirrorPath, 'w') as file:
+        json.dump({"id": "abc", "source": "mirror"}, file)
+
+    assert client.materials.get("abc")["source"] == "mirror"
+    assert client.materials.get("def")["source"] == "upstream"
+    assert (client.session.mirror_hits, client.session.mirror_misses) == (1, 1)
+
+    with client.session.open_upstream(url) as response:
+        assert json.loads(response.read())["source"] == "upstream"
+
+
+def test_mirror_downloads_are_not_metered(server, tmp_path, monkeypatch):
+    record = {"data": "x" * (512 * 1024)}
+    monkeypatch.setattr(Handler, "routes", {"/api/packages/abc/download/": record,
+                                            "/api/packages/def/download/": record})
+    mirrorDir = tmp_path / "mirror"
+    client = MatlibClient(server, mirror=pathlib.Path(str(mirrorDir)).as_uri())
+
+    mirrorPath = os.path.join(str(mirrorDir), *client.session.get_mirror_path(client.packages.download_url("abc")).split('/'))
+    os.makedirs(os.path.dirname(mirrorPath))
+    with open(mirrorPath, 'w') as file:
+        json.dump(record, file)
+
+    client.packages.download("abc", target_dir=str(tmp_path), filename="abc.zip")
+    assert client.session.mirror_hits == 1
+    assert client.session.throughput.get_bytes_per_second() is None
+
+    client.packages.download("def", target_dir=str(tmp_path), filename="def.zip")
+    assert client.session.throughput.get_bytes_per_second() is not None
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+@pytest.mark.parametrize("gzipped", [False, True])
+def test_get_by_id_reads_the_whole_body(server, monkeypatch, chunked, gzipped):
+    record = {"id": "abc", "title": "Oak " * 100}
+    monkeypatch.setattr(Handler, "routes", {"/api/materials/abc/": record})
+    monkeypatch.setattr(Handler, "chunked", chunked)
+    monkeypatch.setattr(Handler, "gzipped", gzipped)
+
+    assert MatlibClient(server).materials.get("abc") == record
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_read_all_variants(server, monkeypatch, chunked):
+    record = {"id": "abc", "title": "Walnut"}
+    monkeypatch.setattr(Handler, "routes", {"/api/materials/abc/": record})
+    monkeypatch.setattr(Handler, "chunked", chunked)
+    client = MatlibClient(server)
+    url = client.materials._get_by_id_url("abc")
+
+    for args in ((), (-1,), (None,)):
+        with client.session.open(url) as response:
+            assert json.loads(response.read(*args)) == record
+            assert response.read() == b''
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_listing(server, monkeypatch, chunked):
+    records = [{"id": str(i)} for i in range(100)]
+    monkeypatch.setattr(Handler, "routes", {"/api/materials/": {"count": 100, "results": records}})
+    monkeypatch.setattr(Handler, "chunked", chunked)
+
+    assert MatlibClient(server).materials.get_list(100, 0) == records
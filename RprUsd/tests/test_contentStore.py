@@ -0,0 +1,74 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+import zipfile
+
+import contentStore
+from contentStore import ContentStore
+
+
+def make_zip(members):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    data.seek(0)
+    return zipfile.ZipFile(data)
+
+
+def age(path, seconds):
+    old = os.stat(path).st_mtime - seconds
+    os.utime(path, (old, old))
+
+
+def test_identical_files_are_stored_once(tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    for name in ("a", "b"):
+        store.extract_zip(make_zip({"tex/base.png": b"same", name + ".mtlx": name.encode()}),
+                          str(tmp_path / name), name)
+
+    assert (tmp_path / "a" / "tex" / "base.png").read_bytes() == b"same"
+    stats = store.get_stats()
+    assert stats['packages'] == 2 and stats['blobs'] == 3
+
+
+def test_reused_blob_survives_collection(tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    digest, isNew = store.add_stream(io.BytesIO(b"orphan"))
+    assert isNew
+    objectPath = store.get_object_path(digest)
+    age(objectPath, 2 * contentStore.GC_GRACE_PERIOD)
+
+    # Reused by an extraction whose manifest isn't written yet.
+    assert store.add_stream(io.BytesIO(b"orphan")) == (digest, False)
+    assert store.garbage_collect()['blobs_removed'] == 0
+    assert os.path.exists(objectPath)
+
+    age(objectPath, 2 * contentStore.GC_GRACE_PERIOD)
+    assert store.garbage_collect()['blobs_removed'] == 1
+    assert not os.path.exists(objectPath)
+
+
+def test_collection_drops_manifests_of_deleted_packages(tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    store.extract_zip(make_zip({"a.png": b"a"}), str(tmp_path / "pkg"), "pkg")
+    with open(store.get_manifest_path(str(tmp_path / "pkg"))) as file:
+        digest = json.load(file)['files']['a.png']
+
+    os.remove(str(tmp_path / "pkg" / "a.png"))
+    os.rmdir(str(tmp_path / "pkg"))
+    age(store.get_object_path(digest), 2 * contentStore.GC_GRACE_PERIOD)
+    stats = store.garbage_collect()
+    assert stats['manifests_removed'] == 1 and stats['blobs_removed'] == 1
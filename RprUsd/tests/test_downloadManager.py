@@ -0,0 +1,142 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import threading
+import time
+import zipfile
+
+import downloadManager
+from downloadManager import DownloadManager
+
+BLOCK_SIZE = 1024
+
+
+def make_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr("Oak.mtlx", "<materialx/>")
+        archive.writestr("textures/oak.png", os.urandom(16 * BLOCK_SIZE))
+    return buffer.getvalue()
+
+
+class FakePackages:
+    """ Streams a package archive block by block, `gate` holds the download after its first block. """
+
+    def __init__(self):
+        self.packages = self
+        self.data = make_zip()
+        self.starts = 0
+        self.gate = threading.Event()
+        self.first_block = threading.Event()
+
+    def download(self, item_id, callback=None, target_dir=None, filename=None):
+        self.starts += 1
+        length = len(self.data)
+        with open(os.path.join(target_dir, filename), 'wb') as file:
+            for offset in range(0, length, BLOCK_SIZE):
+                file.write(self.data[offset:offset + BLOCK_SIZE])
+                if callback and not callback(min(offset + BLOCK_SIZE, length), length):
+                    # Like MatlibEntityClient._download: a short download of known length is removed.
+                    file.close()
+                    os.remove(os.path.join(target_dir, filename))
+                    raise EOFError
+                if offset == 0:
+                    self.first_block.set()
+                    self.gate.wait(5)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_pause_abandons_the_connection_and_resume_starts_over(tmp_path):
+    client = FakePackages()
+    manager = DownloadManager(client, max_workers=1)
+    try:
+        job = manager.enqueue({"id": "p1", "file": "Oak_1k.zip"}, str(tmp_path))
+        assert client.first_block.wait(5)
+
+        manager.set_paused(True)
+        client.gate.set()
+        wait_for(lambda: job.state == downloadManager.STATE_PAUSED)
+        assert job.received == 0
+        assert not os.path.exists(os.path.join(str(tmp_path), "Oak_1k.zip"))
+
+        manager.set_paused(False)
+        wait_for(lambda: job.state == downloadManager.STATE_DONE)
+        assert client.starts == 2
+        assert os.path.isfile(os.path.join(job.path, "Oak.mtlx"))
+    finally:
+        manager.shutdown()
+
+
+def test_job_pause_requeues_only_that_job(tmp_path):
+    client = FakePackages()
+    manager = DownloadManager(client, max_workers=1)
+    try:
+        job = manager.enqueue({"id": "p1", "file": "Oak_1k.zip"}, str(tmp_path))
+        assert client.first_block.wait(5)
+
+        manager.set_job_paused(job, True)
+        client.gate.set()
+        wait_for(lambda: job.state == downloadManager.STATE_PAUSED)
+        assert manager.get_jobs() == [job]
+
+        manager.set_job_paused(job, False)
+        wait_for(lambda: job.state == downloadManager.STATE_DONE)
+    finally:
+        manager.shutdown()
+
+
+def test_cancel_while_paused(tmp_path):
+    client = FakePackages()
+    manager = DownloadManager(client, max_workers=1)
+    try:
+        job = manager.enqueue({"id": "p1", "file": "Oak_1k.zip"}, str(tmp_path))
+        assert client.first_block.wait(5)
+
+        manager.set_paused(True)
+        client.gate.set()
+        wait_for(lambda: job.state == downloadManager.STATE_PAUSED)
+
+        manager.cancel(job)
+        manager.set_paused(False)
+        time.sleep(0.1)
+        assert job.state == downloadManager.STATE_CANCELLED
+        assert client.starts == 1
+    finally:
+        manager.shutdown()
+
+
+def test_enqueue_returns_the_pending_job_of_the_same_package(tmp_path):
+    client = FakePackages()
+    manager = DownloadManager(client, max_workers=1)
+    try:
+        package = {"id": "p1", "file": "Oak_1k.zip"}
+        job = manager.enqueue(package, str(tmp_path))
+        assert client.first_block.wait(5)
+        assert manager.enqueue(dict(package), str(tmp_path) + os.sep) is job
+        other = manager.enqueue(package, str(tmp_path / "other"))
+        assert other is not job
+
+        client.gate.set()
+        wait_for(lambda: job.state == downloadManager.STATE_DONE and other.state == downloadManager.STATE_DONE)
+        assert client.starts == 2
+        # A finished download can be queued again.
+        assert manager.enqueue(package, str(tmp_path)) is not job
+    finally:
+        manager.shutdown()
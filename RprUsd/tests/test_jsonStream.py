@@ -0,0 +1,80 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+
+import pytest
+
+import jsonStream
+
+BACKENDS = [False] + ([True] if jsonStream._get_ijson() is not None else [])
+
+
+def items(document, key='results', use_backend=False, chunk_size=7):
+    stream = io.BytesIO(json.dumps(document).encode("utf-8"))
+    return list(jsonStream.iter_array_items(stream, key, chunk_size=chunk_size, use_backend=use_backend))
+
+
+@pytest.mark.parametrize("use_backend", BACKENDS)
+def test_yields_records_across_chunks(use_backend):
+    records = [{"id": str(i), "title": "Émail {}".format(i), "value": i * 0.5, "tags": [i]} for i in range(50)]
+    document = {"count": 50, "next": None, "results": records, "after": {"x": [1, 2]}}
+    assert items(document, use_backend=use_backend) == records
+
+
+@pytest.mark.parametrize("use_backend", BACKENDS)
+def test_other_key(use_backend):
+    assert items({"results": [1], "lights": [{"id": "a"}]}, 'lights', use_backend) == [{"id": "a"}]
+
+
+@pytest.mark.parametrize("use_backend", BACKENDS)
+def test_empty_and_null_listings(use_backend):
+    assert items({"count": 0, "results": []}, use_backend=use_backend) == []
+    assert items({"count": 0, "results": None}, use_backend=use_backend) == []
+
+
+@pytest.mark.parametrize("use_backend", BACKENDS)
+def test_missing_key_raises(use_backend):
+    # An API error payload must not look like an empty catalog.
+    with pytest.raises(KeyError):
+        items({"detail": "Not found."}, use_backend=use_backend)
+    with pytest.raises(KeyError):
+        items({"results_count": 3, "nested": {"results": [1]}}, use_backend=use_backend)
+
+
+def test_truncated_document_raises():
+    stream = io.BytesIO(b'{"results": [{"id": 1}, {"id": ')
+    with pytest.raises(json.JSONDecodeError):
+        list(jsonStream.iter_array_items(stream, use_backend=False))
+
+
+def test_loads():
+    assert jsonStream.loads(b'{"a": [1, 2.5]}') == {"a": [1, 2.5]}
+
+
+@pytest.mark.parametrize("use_backend", BACKENDS)
+def test_read_arrays_in_one_pass(use_backend):
+    document = {"version": 2, "tags": [{"id": "t"}], "skipped": [[1], {"a": None}],
+                "categories": None, "materials": [{"id": str(i)} for i in range(20)]}
+    stream = io.BytesIO(json.dumps(document).encode("utf-8"))
+    result = jsonStream.read_arrays(stream, ('categories', 'tags', 'materials'), chunk_size=5,
+                                    use_backend=use_backend)
+    assert list(result) == ['categories', 'tags', 'materials']
+    assert result == {"categories": [], "tags": document["tags"], "materials": document["materials"]}
+
+
+@pytest.mark.parametrize("use_backend", BACKENDS)
+def test_read_arrays_missing_key_raises(use_backend):
+    stream = io.BytesIO(b'{"tags": [], "detail": "x"}')
+    with pytest.raises(KeyError):
+        jsonStream.read_arrays(stream, ('tags', 'materials'), use_backend=use_backend)
@@ -0,0 +1,98 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from lightPrewarm import LightPrewarmer
+
+
+class FakePrewarmer(LightPrewarmer):
+
+    def __init__(self, fail=(), gate=None, **kwargs):
+        super().__init__(**kwargs)
+        self.loads = []
+        self.fail = set(fail)
+        self.gate = gate
+
+    def _load(self, name):
+        self.loads.append(name)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if name in self.fail:
+            raise OSError("not found")
+        return [name + ".usda"], 100
+
+
+def test_lru_keeps_last_entries():
+    prewarmer = FakePrewarmer(max_entries=2)
+    try:
+        for name in ["a", "b"]:
+            prewarmer.request(name).result(5)
+        assert prewarmer.is_warm("a")
+
+        prewarmer.request("c").result(5)
+        assert prewarmer.is_warm("a")
+        assert not prewarmer.is_warm("b")
+        assert prewarmer.is_warm("c")
+        assert prewarmer.stats['warmed'] == 3
+        assert prewarmer.stats['bytes'] == 300
+    finally:
+        prewarmer.shutdown()
+
+
+def test_warm_light_is_not_loaded_again():
+    prewarmer = FakePrewarmer()
+    try:
+        prewarmer.request("a").result(5)
+        prewarmer.request("a").result(5)
+        assert prewarmer.loads == ["a"]
+        assert prewarmer.stats['hits'] == 1
+    finally:
+        prewarmer.shutdown()
+
+
+def test_requests_in_flight_are_shared():
+    gate = threading.Event()
+    prewarmer = FakePrewarmer(gate=gate)
+    try:
+        received = []
+        first = prewarmer.request("a", lambda name, ok: received.append((name, ok)))
+        second = prewarmer.request("a", lambda name, ok: received.append((name, ok)))
+        assert first is second
+
+        gate.set()
+        first.result(5)
+        assert prewarmer.loads == ["a"]
+        assert received == [("a", True), ("a", True)]
+    finally:
+        prewarmer.shutdown()
+
+
+def test_failed_warm_is_reported_and_retried():
+    prewarmer = FakePrewarmer(fail=["a"])
+    try:
+        received = []
+        future = prewarmer.request("a", lambda name, ok: received.append((name, ok)))
+        with pytest.raises(OSError):
+            future.result(5)
+        assert received == [("a", False)]
+        assert not prewarmer.is_warm("a")
+        assert prewarmer.stats['failed'] == 1
+
+        prewarmer.fail.clear()
+        prewarmer.request("a").result(5)
+        assert prewarmer.is_warm("a")
+        assert prewarmer.loads == ["a", "a"]
+    finally:
+        prewarmer.shutdown()
@@ -0,0 +1,151 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import types
+import zipfile
+
+import pytest
+
+import matlibBundle
+
+DOCUMENT = b"""<?xml version="1.0"?>
+<materialx version="1.38">
+  <surfacematerial name="Oak_Material" type="material" />
+</materialx>
+"""
+
+
+class FakeClient:
+    """ materials, packages and session of a MatlibClient serving one package per material. """
+
+    host = "https://api.matlib.gpuopen.com"
+
+    def __init__(self, missing=()):
+        self.materials = types.SimpleNamespace(get=self.get_material)
+        self.packages = types.SimpleNamespace(get_list=self.get_packages, download=self.download)
+        self.session = types.SimpleNamespace(throughput=types.SimpleNamespace(get_bytes_per_second=lambda: None))
+        self.missing = set(missing)
+        self.downloads = []
+
+    def get_material(self, material_id):
+        if material_id in self.missing:
+            raise OSError("not found")
+        return {"id": material_id, "title": "Oak " + material_id, "mtlx_material_name": "Oak_" + material_id}
+
+    def get_packages(self, limit=None, offset=None, params=None):
+        materialId = params['material']
+        return [{"id": materialId + "_1k", "file": materialId + "_1k.zip", "label": "1k", "size": "1 MB"},
+                {"id": materialId + "_2k", "file": materialId + "_2k.zip", "label": "2k", "size": "4 MB"}]
+
+    def download(self, item_id, callback=None, target_dir=None, filename=None):
+        self.downloads.append(item_id)
+        with zipfile.ZipFile(os.path.join(target_dir, filename), 'w') as archive:
+            archive.writestr("Oak/Oak.mtlx", DOCUMENT)
+
+
+class FakeStage:
+    """ The part of Usd.Stage scan_stage reads: prims under /RenderStudioMaterials and their references. """
+
+    def __init__(self, references):
+        self.prims = [self._prim(name, assetPath) for name, assetPath in references.items()]
+
+    def GetPrimAtPath(self, path):
+        return types.SimpleNamespace(GetChildren=lambda: self.prims) if path == matlibBundle.MATERIALS_ROOT else None
+
+    @staticmethod
+    def _prim(name, assetPath):
+        items = [types.SimpleNamespace(assetPath=assetPath)]
+        references = types.SimpleNamespace(GetAddedOrExplicitItems=lambda: items)
+        return types.SimpleNamespace(GetMetadata=lambda key: references,
+                                     GetPath=lambda: matlibBundle.MATERIALS_ROOT + "/" + name)
+
+
+def test_scan_stage_finds_gpuopen_references():
+    stage = FakeStage({"a": "gpuopen://m1", "b": "./local.mtlx"})
+    assert matlibBundle.scan_stage(stage) == {"/RenderStudioMaterials/a": "m1"}
+
+
+def test_export_writes_manifest(tmp_path, monkeypatch):
+    client = FakeClient(missing=["m3"])
+    exporter = matlibBundle.MatlibBundleExporter(client, str(tmp_path))
+    written = []
+    monkeypatch.setattr(exporter, '_write_override_layer', lambda primIds, manifest: written.append(primIds))
+
+    stage = FakeStage({"a": "gpuopen://m1", "b": "gpuopen://m2", "c": "gpuopen://m1", "d": "gpuopen://m3"})
+    manifest = exporter.export(stage)
+
+    assert sorted(manifest['materials']) == ["m1", "m2"]
+    entry = manifest['materials']["m1"]
+    assert entry['name'] == "Oak_m1" and entry['package'] == "m1_2k" and entry['label'] == "2k"
+    assert entry['mtlx'] == "packages/m1_2k/Oak/Oak.mtlx"
+    assert (tmp_path / entry['mtlx']).is_file()
+    assert len(written[0]) == 4
+
+    with open(tmp_path / matlibBundle.MANIFEST_FILE, 'r') as file:
+        assert json.load(file)['materials'] == manifest['materials']
+    assert sorted(client.downloads) == ["m1_2k", "m2_2k"]
+    assert exporter.stats['materials'] == 2 and exporter.stats['failed'] == 1
+
+    # A second export reuses the installed packages.
+    exporter = matlibBundle.MatlibBundleExporter(client, str(tmp_path), rule="2k")
+    monkeypatch.setattr(exporter, '_write_override_layer', lambda primIds, manifest: None)
+    exporter.export(FakeStage({"a": "gpuopen://m1"}))
+    assert exporter.stats['reused'] == 1 and len(client.downloads) == 2
+
+
+def test_lookup_material_reads_configured_manifests(tmp_path, monkeypatch):
+    first = tmp_path / "first"
+    first.mkdir()
+    with open(first / matlibBundle.MANIFEST_FILE, 'w') as file:
+        json.dump({'materials': {"m1": {'name': "First"}}}, file)
+    second = tmp_path / "second.json"
+    with open(second, 'w') as file:
+        json.dump({'materials': {"m1": {'name': "Second"}, "m2": {'name': "Other"}}}, file)
+
+    monkeypatch.delenv("RPRUSD_MATLIB_MANIFEST", raising=False)
+    assert matlibBundle.lookup_material("m1") is None
+
+    monkeypatch.setenv("RPRUSD_MATLIB_MANIFEST", os.pathsep.join([str(first), str(tmp_path / "missing.json"),
+                                                                  str(second)]))
+    assert matlibBundle.lookup_material("m1") == {'name': "First"}
+    assert matlibBundle.lookup_material("m2") == {'name': "Other"}
+    assert matlibBundle.lookup_material("m3") is None
+
+    # A rewritten manifest is read again.
+    with open(second, 'w') as file:
+        json.dump({'materials': {"m2": {'name': "Renamed"}}}, file)
+    os.utime(second, (0, 0))
+    assert matlibBundle.lookup_material("m2") == {'name': "Renamed"}
+
+
+def test_export_authors_and_inserts_override_layer(tmp_path):
+    pytest.importorskip("pxr")
+    from pxr import Sdf, Usd
+
+    stagePath = str(tmp_path / "shot.usda")
+    stage = Usd.Stage.CreateNew(stagePath)
+    prim = stage.DefinePrim("/RenderStudioMaterials/Oak")
+    prim.GetReferences().AddReference("gpuopen://m1", "/MaterialX")
+
+    bundleDir = tmp_path / "bundle"
+    matlibBundle.MatlibBundleExporter(FakeClient(), str(bundleDir)).export(stage, insert_override=True)
+
+    rootLayer = stage.GetRootLayer()
+    assert rootLayer.subLayerPaths[0] == "bundle/" + matlibBundle.OVERRIDE_LAYER_FILE
+
+    layer = Sdf.Layer.FindOrOpen(str(bundleDir / matlibBundle.OVERRIDE_LAYER_FILE))
+    spec = layer.GetPrimAtPath("/RenderStudioMaterials/Oak")
+    assert spec.specifier == Sdf.SpecifierOver
+    assert [(r.assetPath, str(r.primPath)) for r in spec.referenceList.explicitItems] == [
+        ("./packages/m1_2k/Oak/Oak.mtlx", "/MaterialX")]
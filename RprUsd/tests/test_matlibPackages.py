@@ -0,0 +1,118 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import zipfile
+
+import pytest
+
+import matlibPackages
+
+DOCUMENT = b"""<?xml version="1.0"?>
+<materialx version="1.38" fileprefix="textures/">
+  <nodegraph name="NG">
+    <image name="base" type="color3">
+      <input name="file" type="filename" value="Oak_BaseColor.png" />
+    </image>
+    <image name="normal" type="vector3" fileprefix="">
+      <input name="file" type="filename" value="tiles/Oak_Normal.&lt;UDIM&gt;.png" />
+    </image>
+    <image name="remote" type="float">
+      <input name="file" type="filename" value="https://example.com/a.png" />
+    </image>
+  </nodegraph>
+</materialx>
+"""
+
+
+def make_zip(members):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    data.seek(0)
+    return zipfile.ZipFile(data)
+
+
+def make_package():
+    return make_zip({
+        "Oak/Oak.mtlx": DOCUMENT,
+        "Oak/textures/OAK_basecolor.png": b"base",
+        "Oak/tiles/Oak_Normal.1001.png": b"n1",
+        "Oak/tiles/Oak_Normal.1002.png": b"n2",
+        "Oak/preview.jpg": b"preview" * 100,
+    })
+
+
+def test_package_size_bytes():
+    assert matlibPackages.package_size_bytes({"size": "850 KB"}) == 850 * 1024
+    assert matlibPackages.package_size_bytes({"size": "12.5 mb"}) == int(12.5 * 1024 * 1024)
+    assert matlibPackages.package_size_bytes({"size": "1GB"}) == 1024 ** 3
+    assert matlibPackages.package_size_bytes({"size": "300"}) == 300
+    assert matlibPackages.package_size_bytes({"size": "unknown"}) is None
+    assert matlibPackages.package_size_bytes({"size": "1.2.3 MB"}) is None
+    assert matlibPackages.package_size_bytes({}) is None
+
+
+def test_get_mtlx_references():
+    assert sorted(matlibPackages.get_mtlx_references(DOCUMENT, "Oak/Oak.mtlx")) == [
+        "Oak/textures/Oak_BaseColor.png", "Oak/tiles/Oak_Normal.<UDIM>.png"]
+
+
+def test_select_members():
+    members, skipped = matlibPackages.select_members(make_package())
+    assert sorted(info.filename for info in members) == [
+        "Oak/Oak.mtlx", "Oak/textures/OAK_basecolor.png", "Oak/tiles/Oak_Normal.1001.png",
+        "Oak/tiles/Oak_Normal.1002.png"]
+    assert [info.filename for info in skipped] == ["Oak/preview.jpg"]
+
+
+def test_select_members_keeps_everything_without_a_readable_document():
+    members, skipped = matlibPackages.select_members(make_zip({"a.png": b"a", "b.mtlx": b"<broken"}))
+    assert len(members) == 2 and skipped == []
+
+
+def test_extract_package_defaults_to_all(tmp_path):
+    stats = matlibPackages.extract_package(make_package(), str(tmp_path))
+    assert stats['files'] == 5 and stats['skipped_files'] == 0
+    assert (tmp_path / "Oak" / "preview.jpg").exists()
+
+
+def test_extract_package_referenced(tmp_path):
+    stats = matlibPackages.extract_package(make_package(), str(tmp_path), matlibPackages.EXTRACT_REFERENCED)
+    assert stats['files'] == 4 and stats['skipped_files'] == 1
+    assert not (tmp_path / "Oak" / "preview.jpg").exists()
+    assert (tmp_path / "Oak" / "tiles" / "Oak_Normal.1002.png").read_bytes() == b"n2"
+
+    with pytest.raises(ValueError):
+        matlibPackages.extract_package(make_package(), str(tmp_path), "some")
+
+
+@pytest.mark.parametrize("name", ["../escape/a.png", "/abs/b.png", "./dot/./c.png", "back\\slash\\d.png",
+                                  "C:/drive/e.png", "nested//f.png"])
+def test_member_paths_match_zipfile(tmp_path, name):
+    archive = make_zip({name: b"x"})
+    info = archive.infolist()[0]
+    target = str(tmp_path / "package")
+
+    expected = matlibPackages.get_member_path(info, target)
+    assert archive.extract(info, target) == expected
+    assert expected.startswith(target + os.sep)
+
+    # Only directories zipfile itself creates are made up front.
+    other = str(tmp_path / "other")
+    matlibPackages.extract_package(make_zip({name: b"x"}), other)
+    created = sorted(os.path.relpath(os.path.join(root, entry), other)
+                     for root, dirs, files in os.walk(other) for entry in dirs + files)
+    assert os.path.relpath(matlibPackages.get_member_path(info, other), other) in created
+    assert len(created) == len(os.path.relpath(expected, target).split(os.sep))
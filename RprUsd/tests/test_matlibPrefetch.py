@@ -0,0 +1,64 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import types
+
+from matlibPrefetch import MatlibPrefetcher
+
+
+class Listing:
+    """ Entity client of a server ignoring every query parameter. """
+
+    def __init__(self, records):
+        self.records = records
+
+    def get_list(self, limit, offset, params=None):
+        return list(self.records)
+
+    def get(self, record_id):
+        return next(record for record in self.records if record["id"] == record_id)
+
+
+MATERIALS = [
+    {"id": "m1", "title": "Oak", "category": "wood", "tags": ["t1"], "collections": ["c1"]},
+    {"id": "m2", "title": "Steel", "category": "metal", "tags": ["t2"], "collections": []},
+    {"id": "m3", "title": "Brick", "category": "stone", "tags": ["t1", "t3"]},
+    {"id": "m4", "title": "Gold", "category": "metal", "tags": []},
+]
+
+
+def make_prefetcher(tmp_path):
+    client = types.SimpleNamespace(
+        categories=Listing([{"id": "wood", "title": "Wood"}, {"id": "metal", "title": "Metal"}]),
+        tags=Listing([{"id": "t1", "title": "rough"}, {"id": "t2", "title": "shiny"}]),
+        collections=Listing([{"id": "c1", "title": "Interior"}]),
+        materials=Listing(MATERIALS),
+    )
+    return MatlibPrefetcher(client, str(tmp_path))
+
+
+def ids(materials):
+    return sorted(material["id"] for material in materials)
+
+
+def test_filters_on_the_client(tmp_path):
+    prefetcher = make_prefetcher(tmp_path)
+    assert ids(prefetcher.resolve_materials(categories=["Wood"])) == ["m1"]
+    assert ids(prefetcher.resolve_materials(tags=["rough"])) == ["m1", "m3"]
+    assert ids(prefetcher.resolve_materials(categories=["metal"], tags=["t1"])) == ["m1", "m2", "m3", "m4"]
+    assert ids(prefetcher.resolve_materials(collections=["Interior"])) == ["m1"]
+
+
+def test_unknown_names_and_ids(tmp_path):
+    prefetcher = make_prefetcher(tmp_path)
+    assert prefetcher.resolve_materials(categories=["Glass"], collections=["Outdoor"]) == []
+    assert ids(prefetcher.resolve_materials(ids=["m4", "m4"])) == ["m4"]
@@ -0,0 +1,106 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+import catalogService
+import memoryReport
+
+
+def no_client():
+    raise AssertionError("measuring must not create a client")
+
+
+def make_catalog():
+    categories = [{"id": "c1", "title": "Wood"}]
+    materials = [{"id": "m%d" % i, "title": "Material %d" % i, "category": "c1"} for i in range(3)]
+    return catalogService.MatlibCatalog(categories, [{"id": "t1", "title": "oak"}], materials)
+
+
+def test_deep_size_counts_shared_objects_once():
+    shared = ["x" * 100]
+    seen = set()
+    first = memoryReport.deep_size({"a": shared}, seen)
+    assert first >= sys.getsizeof(shared) + sys.getsizeof("x" * 100)
+
+    # Everything reachable was counted, only the new containers are.
+    second = memoryReport.deep_size([shared], seen)
+    assert second == sys.getsizeof([shared])
+    assert memoryReport.deep_size(shared, seen) == 0
+
+
+def test_measure_catalog_counts_records_under_materials():
+    catalog = make_catalog()
+    catalog.get_sort_order("title")
+    result = memoryReport.measure_catalog(catalog)
+
+    assert result['materials']['count'] == 3
+    assert result['materialDict']['count'] == 3
+    assert result['sortOrders']['count'] == 1
+    assert result['sortPermutations']['count'] == 0
+    # The index holds the records already counted, only its own table is added.
+    assert result['materialDict']['bytes'] < result['materials']['bytes']
+
+
+def test_measure_caches_creates_nothing(tmp_path):
+    service = catalogService.CatalogService(no_client, str(tmp_path))
+    (tmp_path / "r1.png").write_bytes(b"12345")
+
+    result = memoryReport.measure_caches(service)
+    assert result['thumbnails'] == {'files': 1, 'bytes': 5}
+    assert 'atlases' not in result and 'packageLists' not in result
+    assert service.get_atlas_store() is None and service.get_package_cache() is None
+    assert not os.path.exists(tmp_path / "Atlases")
+
+
+def test_measure_caches_reports_used_caches(tmp_path):
+    service = catalogService.CatalogService(no_client, str(tmp_path))
+    service._atlasStore = type("Store", (), {'atlas_dir': str(tmp_path / "atlases"), 'tile_dir': str(tmp_path)})()
+    service._packageCache = type("Cache", (), {'get_all_cached': lambda self: {"m1": [{"id": "p1"}]}})()
+
+    result = memoryReport.measure_caches(service)
+    assert result['atlases'] == {'files': 0, 'bytes': 0}
+    assert result['packageLists']['count'] == 1 and result['packageLists']['bytes'] > 0
+
+
+def test_format_bytes():
+    assert memoryReport.format_bytes(512) == "512 B"
+    assert memoryReport.format_bytes(1536) == "1.5 KB"
+    assert memoryReport.format_bytes(3 * 1024 ** 3) == "3.0 GB"
+
+
+def test_format_report():
+    report = {
+        'time': 0,
+        'tracing': True,
+        'traced': 2048,
+        'tracedPeak': 4096,
+        'phases': [{'phase': 'browser.show', 'current': 1024, 'top': [("rprMaterialXBrowser.py:10", 512, 1024)]}],
+        'catalog': {'materials': {'count': 3, 'bytes': 1024}},
+        'caches': {'thumbnails': {'files': 2, 'bytes': 10}},
+        'widgets': {'gridCells': 4, 'decodedThumbnailBytes': 2048},
+        'liveObjects': {'MatlibCatalog': 1},
+    }
+    lines = memoryReport.format_report(report).splitlines()
+
+    assert lines[1] == "traced: 2.0 KB (peak 4.0 KB)"
+    assert lines[2].split() == ["browser.show", "1.0", "KB"]
+    assert lines[3].split() == ["rprMaterialXBrowser.py:10", "+512", "->", "1.0", "KB"]
+    assert lines[4:6] == ["catalog:", "  {:<20} {:>8} {:>12}".format("materials", 3, "1.0 KB")]
+    assert lines[6:8] == ["caches:", "  {:<20} {:>8} {:>12}".format("thumbnails", 2, "10 B")]
+    assert [line.split() for line in lines[8:11]] == [["widgets:"], ["gridCells", "4"],
+                                                    ["decodedThumbnailBytes", "2.0", "KB"]]
+    assert [line.split() for line in lines[11:]] == [["live", "objects:"], ["MatlibCatalog", "1"]]
+
+    report.update(tracing=False, phases=[])
+    assert memoryReport.format_report(report).splitlines()[1].startswith("tracing off")
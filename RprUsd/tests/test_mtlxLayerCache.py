@@ -0,0 +1,141 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import pytest
+
+import mtlxLayerCache
+
+DOCUMENT = """<?xml version="1.0"?>
+<materialx version="1.38">
+  <standard_surface name="Zebra_SS" type="surfaceshader" />
+  <surfacematerial name="Zebra" type="material">
+    <input name="surfaceshader" type="surfaceshader" nodename="Zebra_SS" />
+  </surfacematerial>
+  <surfacematerial name="Apple" type="material" />
+  <nodegraph name="NG">
+    <surfacematerial name="Nested" type="material" />
+  </nodegraph>
+</materialx>
+"""
+
+
+def usda(material):
+    return '#usda 1.0\ndef "MaterialX"\n{\n    def "Materials"\n    {\n        def "%s"\n        {\n        }\n    }\n}\n' % material
+
+
+def test_material_names_follow_document_order(tmp_path):
+    path = tmp_path / "Zebra.mtlx"
+    path.write_text(DOCUMENT)
+    # Top-level materials in the order the document lists them, like getMaterialNodes().
+    assert mtlxLayerCache.get_material_names(str(path)) == ["Zebra", "Apple"]
+
+
+def test_prepare_bind_falls_back_to_the_document(tmp_path, monkeypatch):
+    path = tmp_path / "Zebra.mtlx"
+    path.write_text(DOCUMENT)
+    cache = mtlxLayerCache.MtlxLayerCache(str(tmp_path / "cache"))
+
+    def fail(mtlx_path):
+        raise RuntimeError("no USD here")
+    monkeypatch.setattr(cache, "get", fail)
+    assert cache.prepare_bind(str(path)) == "Zebra"
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = mtlxLayerCache.MtlxLayerCache(str(tmp_path))
+    paths = []
+    for index, key in enumerate(("aa01", "bb02", "cc03")):
+        layerPath = cache.get_layer_path(key)
+        os.makedirs(os.path.dirname(layerPath), exist_ok=True)
+        with open(layerPath, 'wb') as file:
+            file.write(b'x' * 1000)
+        with open(layerPath + ".json", 'w') as file:
+            json.dump({'materials': ['M']}, file)
+        os.utime(layerPath, (1000 + index, 1000 + index))
+        paths.append(layerPath)
+
+    cache.evict(2500, keep=paths[0])
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+    assert not os.path.exists(paths[1] + ".json")
+
+
+def test_load_layer_serves_the_document_path(tmp_path):
+    pytest.importorskip("pxr")
+    from pxr import Usd
+
+    # A .usda document stands in for a .mtlx one, usd-core ships no MaterialX file format plugin.
+    document = tmp_path / "doc.usda"
+    document.write_text(usda("FromDocument"))
+    translated = tmp_path / "cache" / "key1.usda"
+    translated.parent.mkdir()
+    translated.write_text(usda("FromCache"))
+
+    cache = mtlxLayerCache.MtlxLayerCache(str(tmp_path / "cache"))
+    layer = cache.load_layer(str(document), str(translated))
+    assert not layer.permissionToSave
+
+    stage = Usd.Stage.CreateInMemory()
+    prim = stage.DefinePrim("/Mesh")
+    prim.GetReferences().AddReference(str(document), mtlxLayerCache.MATERIALX_ROOT)
+    assert stage.GetPrimAtPath("/Mesh/Materials/FromCache")
+    assert not stage.GetPrimAtPath("/Mesh/Materials/FromDocument")
+    # The authored reference is the document, nothing points into the cache.
+    exported = stage.GetRootLayer().ExportToString()
+    assert str(document) in exported and str(translated) not in exported
+
+    # A new translation of a changed document replaces the registered content.
+    changed = tmp_path / "cache" / "key2.usda"
+    changed.write_text(usda("Changed"))
+    assert cache.load_layer(str(document), str(changed)) is layer
+    assert layer.GetPrimAtPath("/MaterialX/Materials/Changed")
+
+
+def test_register_documents_before_the_stage_opens(tmp_path):
+    pytest.importorskip("pxr")
+    from pxr import Sdf, Usd
+
+    # .usda documents stand in for .mtlx ones, see test_load_layer_serves_the_document_path.
+    cached = tmp_path / "cached.usda"
+    cached.write_text(usda("FromDocument"))
+    uncached = tmp_path / "uncached.usda"
+    uncached.write_text(usda("Uncached"))
+
+    cache = mtlxLayerCache.MtlxLayerCache(str(tmp_path / "cache"))
+    layerPath = cache.get_layer_path(cache.get_key(str(cached)))
+    os.makedirs(os.path.dirname(layerPath))
+    translated = Sdf.Layer.CreateAnonymous(".usda")
+    translated.ImportFromString(usda("FromCache"))
+    translated.Export(layerPath)
+    with open(layerPath + ".json", 'w') as file:
+        json.dump({'materials': ["FromCache"]}, file)
+
+    # The scene as Maya would read it: a root layer whose sublayer binds the documents.
+    (tmp_path / "scene.usd").write_text('#usda 1.0\n(\n    subLayers = [@./bindings.usd@]\n)\n')
+    (tmp_path / "bindings.usd").write_text(
+        '#usda 1.0\n'
+        'def "Cached" (references = @./cached.usda@</MaterialX>)\n{\n}\n'
+        'def "Uncached" (references = @./uncached.usda@</MaterialX>)\n{\n}\n')
+
+    rootLayer = Sdf.Layer.FindOrOpen(str(tmp_path / "scene.usd"))
+    registered = cache.register_documents([rootLayer], extensions=(".usda",))
+    assert [os.path.normcase(path) for path in registered] == [os.path.normcase(str(cached))]
+
+    stage = Usd.Stage.Open(rootLayer)
+    assert stage.GetPrimAtPath("/Cached/Materials/FromCache")
+    assert not stage.GetPrimAtPath("/Cached/Materials/FromDocument")
+    assert stage.GetPrimAtPath("/Uncached/Materials/Uncached")
+
+    # Registering the layers of a scene read again finds the layer already served.
+    assert cache.register_documents([rootLayer], extensions=(".usda",)) == registered
@@ -0,0 +1,108 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from packageListCache import PackageListCache
+
+
+class FakeClient:
+
+    def __init__(self, fail=()):
+        self.packages = self
+        self.calls = []
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def get_list(self, limit=None, offset=None, params=None):
+        materialId = params['material']
+        with self.lock:
+            self.calls.append(materialId)
+        if materialId in self.fail:
+            raise OSError("server error")
+        return [{"id": materialId + "_4k", "size": "16 MB"}, {"id": materialId + "_1k", "size": "900 KB"}]
+
+
+def test_fetch_sorts_by_size_and_caches():
+    client = FakeClient()
+    cache = PackageListCache(client)
+    try:
+        packages = cache.fetch("a").result(5)
+        assert [p["id"] for p in packages] == ["a_1k", "a_4k"]
+        assert cache.get_cached("a") is packages
+
+        received = []
+        cache.fetch("a", lambda materialId, result: received.append((materialId, result))).result(5)
+        assert received == [("a", packages)]
+        assert client.calls == ["a"]
+    finally:
+        cache.shutdown()
+
+
+def test_failed_fetch_is_not_cached():
+    client = FakeClient(fail=["a"])
+    cache = PackageListCache(client)
+    try:
+        received = []
+        done = threading.Event()
+
+        def callback(materialId, result):
+            received.append(result)
+            done.set()
+
+        cache.fetch("a", callback)
+        assert done.wait(5)
+        assert received == [None]
+        assert cache.get_cached("a") is None
+    finally:
+        cache.shutdown()
+
+
+def test_prefetch_fills_the_cache():
+    cache = PackageListCache(FakeClient())
+    try:
+        cache.prefetch(["a", "b", "a"])
+        assert cache.fetch("b").result(5)[0]["id"] == "b_1k"
+        assert cache.fetch("a").result(5)[0]["id"] == "a_1k"
+        assert set(cache.get_all_cached()) == {"a", "b"}
+
+        cache.clear()
+        assert cache.get_cached("a") is None
+    finally:
+        cache.shutdown()
+
+
+def test_least_recently_used_lists_are_dropped():
+    cache = PackageListCache(FakeClient(), max_entries=2)
+    try:
+        cache.fetch("a").result(5)
+        cache.fetch("b").result(5)
+        assert cache.get_cached("a") is not None
+        cache.fetch("c").result(5)
+        assert set(cache.get_all_cached()) == {"a", "c"}
+    finally:
+        cache.shutdown()
+
+
+def test_clear_stops_the_workers_and_restarts_them_on_demand():
+    client = FakeClient()
+    cache = PackageListCache(client)
+    try:
+        cache.fetch("a").result(5)
+        cache.prefetch(["b"])
+        cache.clear()
+        assert cache._executor is None and cache._prefetch_executor is None
+
+        assert cache.fetch("a").result(5)[0]["id"] == "a_1k"
+        assert client.calls.count("a") == 2
+    finally:
+        cache.shutdown()
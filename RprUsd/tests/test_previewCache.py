@@ -0,0 +1,69 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import previewCache
+from previewCache import PreviewCache
+
+
+class FakeRenders:
+
+    def __init__(self, content_type, url="https://image.invalid/render/download/"):
+        self.renders = self
+        self.content_type = content_type
+        self.url = url
+        self.calls = 0
+
+    def download(self, item_id, callback=None, target_dir=None, filename=None):
+        self.calls += 1
+        path = os.path.join(target_dir, filename)
+        with open(path, 'wb') as file:
+            file.write(b"image")
+        return {'path': path, 'content_type': self.content_type, 'url': self.url}
+
+
+def test_get_extension():
+    assert previewCache.get_extension("image/jpeg") == ".jpg"
+    assert previewCache.get_extension("image/png; charset=binary") == ".png"
+    assert previewCache.get_extension("application/octet-stream", "https://x/r/render.webp?sig=1") == ".webp"
+    assert previewCache.get_extension(None, "https://x/r/download/") == ".png"
+    assert previewCache.get_extension("text/html") == ".png"
+
+
+def test_render_keeps_the_served_format(tmp_path):
+    client = FakeRenders("image/jpeg")
+    cache = PreviewCache(client, str(tmp_path))
+    try:
+        path = cache.request("r1").result(5)
+        assert path == os.path.join(str(tmp_path), "r1.jpg")
+        assert cache.get_cached("r1") == path
+        assert cache.request("r1").result(5) == path
+        assert client.calls == 1
+        assert sorted(os.listdir(str(tmp_path))) == [".locks", "r1.jpg"]
+    finally:
+        cache.shutdown()
+
+
+def test_eviction_counts_every_image_format(tmp_path):
+    cache = PreviewCache(FakeRenders("image/png"), str(tmp_path), max_entries=2)
+    try:
+        for index, extension in enumerate((".jpg", ".png")):
+            path = os.path.join(str(tmp_path), "old{}{}".format(index, extension))
+            with open(path, 'wb') as file:
+                file.write(b"image")
+            os.utime(path, (index, index))
+
+        cache.request("new").result(5)
+        assert sorted(name for name in os.listdir(str(tmp_path)) if not name.startswith('.')) == ["new.png", "old1.png"]
+    finally:
+        cache.shutdown()
@@ -0,0 +1,88 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+import resolutionPolicy
+from resolutionPolicy import ResolutionPolicy
+
+MB = 1024 * 1024
+
+PACKAGES = [
+    {"id": "1k", "label": "1k", "size": "10 MB"},
+    {"id": "2k", "label": "2k", "size": "40 MB"},
+    {"id": "4k", "label": "4k", "size": "160 MB"},
+]
+
+
+def choose(policy, packages=PACKAGES, bytes_per_second=None):
+    return policy.choose(packages, bytes_per_second)["id"]
+
+
+def test_time_budget():
+    policy = ResolutionPolicy(time_budget=60)
+    assert choose(policy, bytes_per_second=1 * MB) == "2k"
+    assert choose(policy, bytes_per_second=10 * MB) == "4k"
+    # Without a throughput only the byte budget applies.
+    assert choose(policy) == "4k"
+
+
+def test_byte_budget_and_max_resolution():
+    assert choose(ResolutionPolicy(time_budget=None, byte_budget=50 * MB)) == "2k"
+    assert choose(ResolutionPolicy(time_budget=None, max_resolution=1024)) == "1k"
+    # Nothing fits: the smallest package.
+    assert choose(ResolutionPolicy(time_budget=None, byte_budget=MB)) == "1k"
+
+
+def test_unknown_size_does_not_fit_a_budget():
+    unknown = {"id": "8k", "label": "8k", "size": None}
+    packages = PACKAGES + [unknown]
+
+    assert not ResolutionPolicy(time_budget=None, byte_budget=50 * MB).fits(unknown)
+    assert not ResolutionPolicy(time_budget=60).fits(unknown, 1 * MB)
+    assert choose(ResolutionPolicy(time_budget=60), packages, 1 * MB) == "2k"
+    assert choose(ResolutionPolicy(time_budget=None, byte_budget=MB), packages) == "1k"
+
+    # Without a budget in effect the size doesn't matter.
+    assert ResolutionPolicy(time_budget=None).fits(unknown)
+    assert ResolutionPolicy(time_budget=60).fits(unknown)
+    assert choose(ResolutionPolicy(time_budget=None), packages) == "8k"
+
+
+def test_unknown_sizes_rank_last():
+    packages = [{"id": "a", "size": "?"}, {"id": "b", "size": "3 MB"}, {"id": "c", "size": "1 MB"}]
+    assert [p["id"] for p in sorted(packages, key=resolutionPolicy.size_rank)] == ["c", "b", "a"]
+    only_unknown = [{"id": "a", "label": "1k"}]
+    assert choose(ResolutionPolicy(time_budget=None, byte_budget=MB), only_unknown) == "a"
+
+
+def test_parse():
+    assert resolutionPolicy.parse_size("200 MB") == 200 * MB
+    assert resolutionPolicy.parse_size(1000) == 1000
+    assert resolutionPolicy.parse_resolution("4k") == 4096
+    with pytest.raises(ValueError):
+        resolutionPolicy.parse_size("lots")
+
+
+def test_project_settings(tmp_path):
+    settings = {resolutionPolicy.PROJECT_SECTION: {"byteBudget": "20 MB", "maxResolution": "2k"}}
+    (tmp_path / resolutionPolicy.PROJECT_FILE).write_text(json.dumps(settings))
+
+    policy = resolutionPolicy.load_policy(str(tmp_path))
+    assert policy.to_dict() == {"timeBudget": resolutionPolicy.DEFAULT_TIME_BUDGET, "byteBudget": 20 * MB,
+                                "maxResolution": 2048}
+    assert resolutionPolicy.load_policy(str(tmp_path / "missing")).byte_budget is None
+
+    (tmp_path / resolutionPolicy.PROJECT_FILE).write_text("{broken")
+    assert resolutionPolicy.load_policy(str(tmp_path)).byte_budget is None
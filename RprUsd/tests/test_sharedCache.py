@@ -0,0 +1,55 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+
+import pytest
+
+import sharedCache
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    sections = {'categories': [{'id': 'c'}], 'tags': [], 'materials': [{'id': str(i)} for i in range(100)]}
+    sharedCache.write_snapshot(path, sections, {'host': 'https://example.com'})
+
+    assert sharedCache.read_snapshot(path, ('categories', 'tags', 'materials')) == sections
+    with pytest.raises(KeyError):
+        sharedCache.read_snapshot(path, ('lights',))
+
+
+def test_single_flight_fetches_once(tmp_path):
+    path = str(tmp_path / "file.bin")
+    fetches = []
+
+    def fetch(part_path):
+        fetches.append(part_path)
+        with open(part_path, 'wb') as file:
+            file.write(b'data')
+
+    threads = [threading.Thread(target=sharedCache.single_flight, args=(path, fetch)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fetches) == 1
+    assert not os.path.exists(fetches[0])
+    with open(path, 'rb') as file:
+        assert file.read() == b'data'
+
+    # A fresh file is not fetched again, a stale one is.
+    sharedCache.single_flight(path, fetch, max_age=60)
+    assert len(fetches) == 1
+    sharedCache.single_flight(path, fetch, max_age=0)
+    assert len(fetches) == 2
@@ -0,0 +1,30 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import pytest
+
+from conftest import BENCHMARKS_DIR
+
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import startupBenchmark
+
+
+@pytest.mark.parametrize('batch', [True, False], ids=['batch', 'interactive'])
+def test_menu_registration_leaves_catalog_alone(batch):
+    result = startupBenchmark.check_menu_registration(batch)
+    assert 'error' not in result, result
+    assert 'catalogService' not in result['imported']
+    # The catalog warm-up is deferred to the first idle of interactive sessions only.
+    assert result['deferred'] == (0 if batch else 1)
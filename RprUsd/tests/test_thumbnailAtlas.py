@@ -0,0 +1,66 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+import thumbnailAtlas
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "c.atlas")
+    tiles = {"r1": b"\x89PNG one", "r2": b"", "r3": b"\x89PNG three" * 10}
+    thumbnailAtlas.write_atlas(path, tiles)
+    assert {key: bytes(value) for key, value in thumbnailAtlas.read_atlas(path).items()} == tiles
+    assert [p.name for p in tmp_path.iterdir()] == ["c.atlas"]
+
+
+def test_damaged_atlas_raises(tmp_path):
+    path = tmp_path / "c.atlas"
+    thumbnailAtlas.write_atlas(str(path), {"r1": b"x" * 100})
+
+    path.write_bytes(path.read_bytes()[:-10])
+    with pytest.raises(ValueError):
+        thumbnailAtlas.read_atlas(str(path))
+
+    path.write_bytes(b"NOTATLAS" + bytes(20))
+    with pytest.raises(ValueError):
+        thumbnailAtlas.read_atlas(str(path))
+
+
+def test_store_builds_and_materializes(tmp_path):
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    (cache / "r1.png").write_bytes(b"one")
+    store = thumbnailAtlas.AtlasStore(str(cache), str(tmp_path / "tiles"))
+
+    assert store.materialize("c") == {}
+    assert store.build_async("c", ["r1", "r2"]).result() is True
+    paths = store.materialize("c")
+    assert list(paths) == ["r1"]
+    with open(paths["r1"], 'rb') as file:
+        assert file.read() == b"one"
+    assert os.listdir(store.tile_dir) == ["r1.png"]
+
+    # Nothing new: the atlas stays, a new thumbnail rebuilds it.
+    assert store.build_async("c", ["r1", "r2"]).result() is False
+    (cache / "r2.png").write_bytes(b"two")
+    assert store.build_async("c", ["r1", "r2"]).result() is True
+    assert sorted(store.materialize("c")) == ["r1", "r2"]
+
+
+def test_store_ignores_damaged_atlas(tmp_path):
+    store = thumbnailAtlas.AtlasStore(str(tmp_path), str(tmp_path / "tiles"))
+    with open(store.get_atlas_path("c"), 'wb') as file:
+        file.write(b"garbage")
+    assert store.materialize("c") == {}
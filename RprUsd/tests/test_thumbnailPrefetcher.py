@@ -0,0 +1,169 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import threading
+import time
+
+from conftest import BENCHMARKS_DIR
+
+sys.path.insert(0, BENCHMARKS_DIR)
+
+try:
+    import maya.utils
+except ImportError:
+    import mayaStandIn
+    mayaStandIn.install()
+    import maya.utils
+
+import catalogService
+import sharedCache
+import thumbnailPrefetcher
+from thumbnailPrefetcher import ThumbnailPrefetcher
+
+
+class FakeClient:
+
+    def __init__(self, before_progress=None):
+        self.renders = self
+        self.calls = []
+        self.lock = threading.Lock()
+        self.before_progress = before_progress
+
+    def download_thumbnail(self, item_id, callback=None, target_dir=None, filename=None):
+        with self.lock:
+            self.calls.append(item_id)
+        if self.before_progress:
+            self.before_progress(item_id)
+        if callback and not callback(100, 100):
+            return None
+        with open(os.path.join(target_dir, filename), 'wb') as file:
+            file.write(b'png' * 33 + b'!')
+        return filename
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_order_categories_puts_recent_first():
+    categories = [{"id": "c1", "title": "Wood"}, {"id": "c2", "title": "Metal"}, {"id": "c3", "title": "Fabric"}]
+    materials = [{"id": "m1", "category": "c1"}] + [{"id": "m%d" % i, "category": "c2"} for i in range(2, 5)]
+    catalog = catalogService.MatlibCatalog(categories, [], materials)
+
+    assert thumbnailPrefetcher.order_categories(catalog) == ["c2", "c1", "c3"]
+    assert thumbnailPrefetcher.order_categories(catalog, ["c3", "gone"]) == ["c3", "c2", "c1"]
+
+
+def test_queue_is_fetched_in_order_once(tmp_path):
+    client = FakeClient()
+    prefetcher = ThumbnailPrefetcher(client, str(tmp_path), max_workers=1, bandwidth_limit=0, idle_lease=60)
+    try:
+        prefetcher.enqueue(["a", "b", "a"])
+        prefetcher.enqueue(["c", "b"])
+        prefetcher.notify_idle()
+        wait_until(prefetcher.is_empty)
+
+        assert client.calls == ["a", "b", "c"]
+        assert prefetcher.stats['downloaded'] == 3
+        assert os.path.isfile(prefetcher.get_path("c"))
+    finally:
+        prefetcher.stop()
+
+
+def test_nothing_starts_without_idle_lease(tmp_path):
+    client = FakeClient()
+    prefetcher = ThumbnailPrefetcher(client, str(tmp_path), max_workers=1, idle_lease=0.05)
+    try:
+        prefetcher.enqueue(["a"])
+        time.sleep(0.2)
+        assert client.calls == []
+        assert not prefetcher.is_empty()
+    finally:
+        prefetcher.stop()
+
+
+def test_throttle_delays_beyond_bandwidth(tmp_path):
+    prefetcher = ThumbnailPrefetcher(FakeClient(), str(tmp_path), max_workers=0, bandwidth_limit=1000)
+    with prefetcher._condition:
+        assert prefetcher._throttle(500) == 0.0
+        assert 0.9 < prefetcher._throttle(1500) <= 1.0
+
+    prefetcher.bandwidth_limit = 0
+    with prefetcher._condition:
+        assert prefetcher._throttle(10 ** 9) == 0.0
+
+
+def test_interrupted_download_is_queued_first(tmp_path):
+    prefetcher = None
+
+    def revoke_once(item_id):
+        if item_id == "a" and prefetcher.stats['interrupted'] == 0:
+            prefetcher.notify_activity()
+
+    client = FakeClient(revoke_once)
+    prefetcher = ThumbnailPrefetcher(client, str(tmp_path), max_workers=1, bandwidth_limit=0, idle_lease=60)
+    try:
+        prefetcher.enqueue(["a", "b"])
+        prefetcher.notify_idle()
+        wait_until(lambda: prefetcher.stats['interrupted'] == 1)
+        assert not os.path.exists(prefetcher.get_path("a"))
+        assert prefetcher.stats['failed'] == 0
+
+        prefetcher.notify_idle()
+        wait_until(prefetcher.is_empty)
+        assert client.calls == ["a", "a", "b"]
+        assert prefetcher.stats['downloaded'] == 2
+    finally:
+        prefetcher.stop()
+
+
+def test_busy_lock_stripe_requeues(tmp_path):
+    client = FakeClient()
+    prefetcher = ThumbnailPrefetcher(client, str(tmp_path), max_workers=1, bandwidth_limit=0, idle_lease=60)
+    lock = sharedCache.FileLock(sharedCache.get_lock_path(prefetcher.get_path("a")))
+    assert sharedCache.get_lock_path(prefetcher.get_path("b")) != lock.path
+    assert lock.acquire(0)
+    try:
+        prefetcher.enqueue(["a", "b"])
+        prefetcher.notify_idle()
+        wait_until(lambda: prefetcher.stats['downloaded'] == 1 and prefetcher.stats['busy'] >= 2)
+        assert client.calls == ["b"]
+        assert prefetcher.stats['present'] == 0
+
+        lock.release()
+        wait_until(prefetcher.is_empty)
+        assert client.calls == ["b", "a"]
+        assert os.path.isfile(prefetcher.get_path("a"))
+    finally:
+        lock.release()
+        prefetcher.stop()
+
+
+def test_idle_job_is_stopped_outside_its_callback(monkeypatch):
+    deferred = []
+    stopped = []
+    monkeypatch.setattr(maya.utils, 'executeDeferred', deferred.append)
+    monkeypatch.setattr(thumbnailPrefetcher, 'stop', lambda: stopped.append(True))
+    monkeypatch.setattr(thumbnailPrefetcher, 'g_Prefetcher', None)
+
+    thumbnailPrefetcher._onIdle()
+    thumbnailPrefetcher._onIdle()
+    assert stopped == []
+
+    for callback in deferred:
+        callback()
+    assert stopped == [True, True]
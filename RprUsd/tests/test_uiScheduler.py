@@ -0,0 +1,88 @@
+#
+# Copyright 2023 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from conftest import BENCHMARKS_DIR
+
+sys.path.insert(0, BENCHMARKS_DIR)
+
+try:
+    import maya.utils
+except ImportError:
+    import mayaStandIn
+    mayaStandIn.install()
+
+import uiScheduler
+
+
+class Passes:
+
+    def __init__(self, alive=True):
+        self.deferred = []
+        self.ran = []
+        self.alive = alive
+        self.results = dict()
+        self.scheduler = uiScheduler.UiScheduler(lambda: self.alive, self.deferred.append)
+        for name, covers in (("rebuild", ("layout", "resize")), ("layout", ("resize",)), ("resize", ())):
+            self.scheduler.addPass(name, lambda name=name: self.run(name), covers)
+
+    def run(self, name):
+        self.ran.append(name)
+        return self.results.get(name)
+
+    def idle(self):
+        deferred, self.deferred[:] = list(self.deferred), []
+        for callback in deferred:
+            callback()
+
+
+def test_requests_coalesce_into_one_flush():
+    passes = Passes()
+    for _ in range(10):
+        passes.scheduler.request("resize", 0.5)
+    assert len(passes.deferred) == 1
+    passes.idle()
+    assert passes.ran == ["resize"]
+    assert passes.scheduler.stats == {"requested": 10, "run": 1}
+
+    # The next request schedules a new flush.
+    passes.scheduler.request("layout")
+    passes.idle()
+    assert passes.ran == ["resize", "layout"]
+
+
+def test_expensive_pass_covers_cheaper_ones():
+    passes = Passes()
+    passes.scheduler.request("resize")
+    passes.scheduler.request("rebuild")
+    passes.scheduler.request("layout")
+    passes.idle()
+    assert passes.ran == ["rebuild"]
+
+
+def test_pass_returning_false_covers_nothing():
+    passes = Passes()
+    passes.results["layout"] = False
+    passes.scheduler.request("resize")
+    passes.scheduler.request("layout")
+    passes.idle()
+    assert passes.ran == ["layout", "resize"]
+
+
+def test_closed_window_drops_pending_passes():
+    passes = Passes()
+    passes.scheduler.request("rebuild")
+    passes.alive = False
+    passes.idle()
+    assert passes.ran == []
+    assert not passes.scheduler.pending